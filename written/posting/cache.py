@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from posting.models import Posting
+from posting.serializers import PostingRetrieveSerializer
+from written.conditional import etag
+
+# Read-through cache of GET /postings/{posting_id}/ payloads.
+# Writers drop the entry right away and again on commit, so a reader that
+# refilled it from the old row in between cannot keep it alive.
+# Each payload's ETag is cached under a key of its own, checking it loads no payload.
+# A write drops the entries only in the cache its worker sees, so without CACHE_SHARED
+# nothing is cached and every read builds the payload and its ETag from the row.
+
+HITS_KEY = 'posting:detail:hits'
+MISSES_KEY = 'posting:detail:misses'
+
+
+def posting_key(posting_id):
+    return f'posting:detail:{posting_id}'
+
+
+def count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def etag_key(posting_id):
+    return f'posting:etag:{posting_id}'
+
+
+def posting_etag(posting):
+    # the payload changes with the posting's row and its writer's nickname
+    nickname = posting.writer.userprofile.nickname if posting.writer_id else None
+    return etag('posting', posting.id, posting.updated_at, nickname)
+
+
+def get_posting_etag(posting_id):
+    # None when the payload is not cached
+    if not settings.CACHE_SHARED:
+        return None
+    return cache.get(etag_key(posting_id))
+
+
+def get_posting_data(posting_id):
+    # (ETag, payload), (None, None) when there is no such posting
+    key = posting_key(posting_id)
+    if settings.CACHE_SHARED:
+        entries = cache.get_many([key, etag_key(posting_id)])
+        if key in entries and etag_key(posting_id) in entries:
+            count(HITS_KEY)
+            return entries[etag_key(posting_id)], entries[key]
+        count(MISSES_KEY)
+    try:
+        posting = Posting.objects.select_related('title', 'writer__userprofile').get(pk=posting_id)
+    except (Posting.DoesNotExist, ValueError):
+        return None, None
+    data = dict(PostingRetrieveSerializer(posting).data)
+    tag = posting_etag(posting)
+    if settings.CACHE_SHARED:
+        cache.set_many({key: data, etag_key(posting_id): tag}, settings.POSTING_CACHE_TIMEOUT)
+    return tag, data
+
+
+def invalidate(*posting_ids):
+    keys = [key for posting_id in posting_ids for key in (posting_key(posting_id), etag_key(posting_id))]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / lookups if lookups else None,
+    }
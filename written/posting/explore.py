@@ -0,0 +1,92 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from written import projection
+from written.conditional import bump, generations
+from written.pagination import Page
+
+# GET /postings/: every public posting, newest first. The newest EXPLORE_BUFFER_SIZE of
+# them are held projected in a per-process buffer, so the pages nearly every request asks
+# for are served without a query. posting.hooks bump a generation in the shared cache on
+# every change to a public posting, and a buffer filled at an older generation, or more
+# than EXPLORE_BUFFER_MAX_AGE seconds ago, is refilled by the next reader in whichever
+# process holds it. The age bounds what the hooks never see (admin edits, postings going
+# with their writer). Only a shared cache carries a generation to every worker, so without
+# CACHE_SHARED the buffer is off and every page is read from the index.
+
+GENERATION_KEY = 'posting:explore:generation'
+
+
+def changed():
+    bump(GENERATION_KEY)
+
+
+def public_postings(page):
+    # the page straight from the (is_public, id) index
+    seek, params = page.seek()
+    raw_query = f'''
+        SELECT {projection.POSTING_COLUMNS}
+        FROM posting_posting AS posting
+        INNER JOIN title_title AS title ON posting.title_id = title.id
+        LEFT JOIN user_userprofile AS profile ON posting.writer_id = profile.user_id
+        WHERE posting.is_public = 1 AND {seek}
+        ORDER BY {page.order_by()}
+        LIMIT %s;
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(raw_query, params + [page.limit])
+        return projection.dict_fetch_all(cursor)
+
+
+class ExploreBuffer:
+    def __init__(self, size, max_age):
+        self.size = size
+        self.max_age = max_age
+        self.generation = None
+        self.filled_at = None
+        # projected postings, newest first; complete when there are no older public postings
+        self.postings = []
+        self.complete = False
+        self.lock = threading.Lock()
+
+    def page(self, page):
+        # the rows of a keyset page on posting id (one surplus row included), None when
+        # they are not all in the buffer or the buffer is off
+        if not settings.CACHE_SHARED:
+            return None
+        generation = generations(GENERATION_KEY)
+        with self.lock:
+            if generation != self.generation or time.monotonic() - self.filled_at >= self.max_age:
+                postings, complete = self.fill(page.keyset, generation)
+            else:
+                postings, complete = self.postings, self.complete
+
+        after = page.after[0] if page.after is not None else None
+        rows = [posting for posting in postings if after is None or posting['id'] < after][:page.limit]
+        if len(rows) < page.limit and not complete:
+            return None
+        return rows
+
+    def fill(self, keyset, generation):
+        # under the lock: one reader refills, the others wait for its rows
+        first = Page(keyset, None, self.size, descending=True)
+        rows = public_postings(first)
+        complete = len(rows) <= self.size
+        self.postings = projection.project(rows[:self.size], projection.posting)
+        self.complete = complete
+        self.generation = generation
+        self.filled_at = time.monotonic()
+        return self.postings, self.complete
+
+    def clear(self):
+        with self.lock:
+            self.generation = None
+            self.filled_at = None
+            self.postings = []
+            self.complete = False
+
+
+explore_buffer = ExploreBuffer(settings.EXPLORE_BUFFER_SIZE, settings.EXPLORE_BUFFER_MAX_AGE)
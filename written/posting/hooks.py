@@ -0,0 +1,59 @@
+from posting import cache, explore
+from posting.models import Posting
+from scrap.models import Scrap
+from subscription import timeline
+from title import activity
+from title.counters import adjust_postings_count, touch_titles
+from user import counters as user_counters
+
+
+# Bookkeeping that has to follow every posting write.
+# PostingViewSet calls these inside the transaction of the write itself,
+# posting_deleted right before the row goes, while the posting still has its id.
+
+def posting_created(posting):
+    adjust_postings_count(posting.title_id, all_delta=1, public_delta=int(posting.is_public))
+    user_counters.adjust_postings_count(posting.writer_id, all_delta=1, public_delta=int(posting.is_public))
+    if posting.is_public:
+        timeline.publish(posting)
+        explore.changed()
+        activity.published(posting.title_id)
+
+
+def posting_updated(posting, was_public):
+    cache.invalidate(posting.id)
+    timeline.changed()
+    if posting.is_public or was_public:
+        explore.changed()
+    if posting.is_public == was_public:
+        adjust_postings_count(posting.title_id)
+    else:
+        adjust_postings_count(posting.title_id, public_delta=1 if posting.is_public else -1)
+        user_counters.adjust_postings_count(posting.writer_id, public_delta=1 if posting.is_public else -1)
+        activity.published(posting.title_id, 1 if posting.is_public else -1)
+        if posting.is_public:
+            timeline.publish(posting)
+        else:
+            timeline.retract(posting)
+
+
+def posting_deleted(posting):
+    cache.invalidate(posting.id)
+    timeline.changed()
+    if posting.is_public:
+        explore.changed()
+        activity.published(posting.title_id, -1)
+        # only public postings have scraps, and they go with it through their foreign key
+        activity.scraps_removed(posting.title_id, Scrap.objects.filter(posting_id=posting.id).count())
+    # timeline entries go with the posting through their foreign key
+    adjust_postings_count(posting.title_id, all_delta=-1, public_delta=-int(posting.is_public))
+    user_counters.adjust_postings_count(posting.writer_id, all_delta=-1, public_delta=-int(posting.is_public))
+
+
+def writer_renamed(writer_id):
+    # the nickname is part of every payload with the writer's postings
+    postings = list(Posting.objects.filter(writer_id=writer_id).values_list('id', 'title_id'))
+    cache.invalidate(*[posting_id for posting_id, _ in postings])
+    touch_titles({title_id for _, title_id in postings})
+    timeline.changed()
+    explore.changed()
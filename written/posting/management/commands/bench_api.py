@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from written import bench
+from written.backends.pooling import pool_stats
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic dataset into a throwaway database and report per-endpoint latency and query counts'
+
+    def add_arguments(self, parser):
+        bench.add_dataset_arguments(parser)
+        parser.add_argument('--iterations', type=int, default=200, help='measured calls per scenario')
+        parser.add_argument('--warmup', type=int, default=20, help='unmeasured calls per scenario')
+        parser.add_argument('--only', action='append', help='run scenarios whose name contains this, repeatable')
+
+    def handle(self, *args, **options):
+        with bench.seeded_database(options) as rng:
+            runner = bench.Bench(iterations=options['iterations'], warmup=options['warmup'],
+                                 exponent=options['skew'], rng=rng)
+            pool_stats.reset()
+            endpoints = runner.run(only=options['only'])
+            report = {
+                'vendor': connection.vendor,
+                'dataset': bench.dataset(),
+                'iterations': options['iterations'],
+                'endpoints': endpoints,
+                'connections': pool_stats.snapshot(),
+            }
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
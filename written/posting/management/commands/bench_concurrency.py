@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from written import bench
+from written.backends.pooling import pool_stats
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic dataset into a throwaway database and compare WSGI and ASGI throughput ' \
+           'on the feeds and login under concurrent load'
+
+    def add_arguments(self, parser):
+        bench.add_dataset_arguments(parser)
+        parser.add_argument('--requests', type=int, default=2000, help='requests per mode and concurrency')
+        parser.add_argument('--concurrency', type=int, action='append',
+                            help='requests in flight at a time, repeatable (default 8 and 64)')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='threads of the WSGI server, and of the ASGI worker (ASGI_THREADS)')
+        parser.add_argument('--mode', action='append', choices=sorted(bench.HANDLERS),
+                            help='modes to run, repeatable (default all)')
+        parser.add_argument('--facebook-latency-ms', type=float, default=0,
+                            help='how long the stubbed Graph API takes to answer')
+
+    def handle(self, *args, **options):
+        with bench.seeded_database(options) as rng:
+            bench.stub_facebook(bench.StubGraphTransport(latency=options['facebook_latency_ms'] / 1000))
+            runner = bench.Bench(exponent=options['skew'], rng=rng)
+            requests = bench.concurrent_requests(runner, options['requests'])
+            runs = []
+            for concurrency in options['concurrency'] or [8, 64]:
+                for mode in options['mode'] or sorted(bench.HANDLERS):
+                    pool_stats.reset()
+                    run = bench.concurrency_report(mode, requests, concurrency, options['threads'])
+                    run['connections'] = pool_stats.snapshot()
+                    runs.append(run)
+            report = {
+                'vendor': connection.vendor,
+                'dataset': bench.dataset(),
+                'facebook_latency_ms': options['facebook_latency_ms'],
+                'runs': runs,
+            }
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
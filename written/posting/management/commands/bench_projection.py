@@ -0,0 +1,17 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from written import bench
+
+
+class Command(BaseCommand):
+    help = 'Time the row projections of the list endpoints against the DRF serializers they replaced'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='rows per run')
+        parser.add_argument('--repeat', type=int, default=5, help='runs, the fastest one counts')
+
+    def handle(self, *args, **options):
+        report = bench.projection_report(rows=options['rows'], repeat=options['repeat'])
+        self.stdout.write(json.dumps(report, indent=2))
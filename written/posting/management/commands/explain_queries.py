@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from written import bench
+from written.explain import explain_queries
+from written.queries import QueryRecorder
+
+
+class Command(BaseCommand):
+    help = 'Run every endpoint against a seeded dataset and EXPLAIN the SELECTs they issue, ' \
+           'failing on full scans and sorts'
+
+    def add_arguments(self, parser):
+        bench.add_dataset_arguments(parser)
+        parser.add_argument('--iterations', type=int, default=3,
+                            help='calls per scenario, more reach more branches (pull writers, empty pages)')
+
+    def handle(self, *args, **options):
+        with bench.seeded_database(options) as rng:
+            if connection.vendor == 'mysql':
+                # fresh statistics, or the optimizer plans for the empty tables it last saw
+                tables = connection.introspection.django_table_names(only_existing=True)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE TABLE ' + ', '.join(map(connection.ops.quote_name, tables)))
+                    cursor.fetchall()
+            runner = bench.Bench(iterations=options['iterations'], warmup=0, exponent=options['skew'], rng=rng)
+            with QueryRecorder() as recorder:
+                runner.run()
+            # the scenarios' own bookkeeping queries are not the endpoints'
+            queries = [query for query in recorder.queries if not (query.origin or '').startswith('written/bench.py')]
+            results = explain_queries(queries)
+
+        failed = [result for result in results if result['problems']]
+        for result in results:
+            self.stdout.write(f'{"FAIL" if result["problems"] else "ok"} {result["origin"]}\n  {result["shape"]}')
+            for line in result['plan']:
+                self.stdout.write(f'    {line}')
+            for problem in result['problems']:
+                self.stdout.write(self.style.ERROR(f'  {problem}'))
+        if failed:
+            raise CommandError(f'{len(failed)} of {len(results)} queries scan or sort')
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} queries use their indexes'))
@@ -0,0 +1,14 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posting import cache
+
+
+class Command(BaseCommand):
+    help = 'Print hit/miss counters of the GET /postings/{posting_id}/ cache'
+
+    # counters live in the cache itself, so this only sees the serving
+    # processes' numbers when CACHES points at a shared backend
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(cache.stats()))
@@ -0,0 +1,21 @@
+# Generated by Django 3.1 on 2021-01-24 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posting', '0004_auto_20210108_0600'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='posting',
+            index=models.Index(fields=['title', 'is_public', 'id'], name='posting_title_public_id'),
+        ),
+        migrations.AddIndex(
+            model_name='posting',
+            index=models.Index(fields=['writer', 'is_public', 'id'], name='posting_writer_public_id'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.1 on 2021-01-26 14:37
+
+from django.db import migrations, models
+
+EXCERPT_LENGTH = 100
+BATCH_SIZE = 1000
+
+
+def summarize_postings(apps, schema_editor):
+    Posting = apps.get_model('posting', 'Posting')
+    batch = []
+    for posting in Posting.objects.only('id', 'content').iterator(chunk_size=BATCH_SIZE):
+        posting.excerpt = posting.content[:EXCERPT_LENGTH]
+        posting.content_length = len(posting.content)
+        batch.append(posting)
+        if len(batch) == BATCH_SIZE:
+            Posting.objects.bulk_update(batch, ['excerpt', 'content_length'])
+            batch = []
+    Posting.objects.bulk_update(batch, ['excerpt', 'content_length'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posting', '0005_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='posting',
+            name='content_length',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='posting',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(summarize_postings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.1 on 2021-01-27 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posting', '0006_posting_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='posting',
+            index=models.Index(fields=['is_public', 'id'], name='posting_public_id'),
+        ),
+        migrations.AlterField(
+            model_name='posting',
+            name='is_public',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -9,11 +9,35 @@ class Posting(models.Model):
         (CENTER, CENTER),
     ]
     ALIGNMENTS = (LEFT, CENTER)
+    EXCERPT_LENGTH = 100
 
     title = models.ForeignKey(Title, related_name="postings", on_delete=models.CASCADE)
     writer = models.ForeignKey(User, related_name="postings", on_delete=models.CASCADE, null=True)
     content = models.TextField()
+    # card previews for the feeds (?fields=excerpt), kept in step with content by save()
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, default='')
+    content_length = models.PositiveIntegerField(default=0)
     alignment = models.CharField(choices=ALIGNMENT_CHOICES, default=LEFT, max_length=7)
-    is_public = models.BooleanField(default=False, db_index=True)
+    is_public = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # public postings of a title / writer newest first: GET /titles/{title_id}/postings/,
+            # GET /users/{user_id}/postings/ (see written.explain)
+            models.Index(fields=['title', 'is_public', 'id'], name='posting_title_public_id'),
+            models.Index(fields=['writer', 'is_public', 'id'], name='posting_writer_public_id'),
+            # every public posting newest first: GET /postings/ (see posting.explore), replaces
+            # the index on is_public alone
+            models.Index(fields=['is_public', 'id'], name='posting_public_id'),
+        ]
+
+    def summarize(self):
+        # bulk_create skips save(), call it on postings created that way
+        self.excerpt = self.content[:self.EXCERPT_LENGTH]
+        self.content_length = len(self.content)
+
+    def save(self, *args, **kwargs):
+        self.summarize()
+        super().save(*args, **kwargs)
@@ -103,16 +103,24 @@ class PostingDictSerializer(serializers.ModelSerializer):
             'created_at',
         )
 
+    # rows are expected to carry the title's name and writer_nickname joined in by the query
+    # (see written.projection.POSTING_COLUMNS), the lookups are only a fallback
     def get_writer(self, posting):
         if type(posting) == dict:
+            if posting.get('writer_id') is None:
+                return None
+            if 'writer_nickname' in posting:
+                return {'id': posting['writer_id'], 'nickname': posting['writer_nickname']}
             try:
-                writer = User.objects.get(pk=posting['writer_id'])
+                writer = User.objects.select_related('userprofile').get(pk=posting['writer_id'])
             except User.DoesNotExist:
                 return None
         return SmallUserSerializer(writer, context=self.context).data
     
     def get_title(self, posting):
         if type(posting) == dict:
+            if 'title' in posting:
+                return posting['title']
             try:
                 title = Title.objects.get(pk=posting['title_id'])
             except Title.DoesNotExist:
@@ -1,5 +1,9 @@
 from django.contrib.auth.models import User
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+from django.test import Client, TestCase, override_settings
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 import json
@@ -7,7 +11,12 @@ from unittest.mock import patch
 from user.token import mocked_check_token
 from user.models import UserProfile
 from title.models import Title
+from posting import cache as posting_cache
+from posting import explore
 from posting.models import Posting
+from scrap.models import Scrap
+from subscription.models import PullWriter, TimelineEntry
+from written.queries import QueryBudgetMixin
 
 class PostPostingTestCase(TestCase):
     client = Client()
@@ -247,4 +256,829 @@ class PutPostingTest(TestCase):
             HTTP_AUTHORIZATION=self.token_1
         )
         data = response.data
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class GetSubscribedPostingsTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        self.token = {}
+        self.id = {}
+        for i in range(1, 4):
+            response = self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": f"{i}",
+                    "access_token": f"{i}",
+                    "nickname": f"{i}",
+                }),
+                content_type='application/json'
+            )
+            data = response.json()
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.token[i] = "Token " + data["access_token"]
+            self.id[i] = data["user"]["id"]
+
+    def write(self, writer, is_public=True):
+        response = self.client.post(
+            '/postings/',
+            json.dumps({
+                "title": "title1",
+                "content": "This is content of posting",
+                "alignment": "LEFT",
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token[writer]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        posting_id = response.json()['id']
+        if is_public:
+            self.set_public(writer, posting_id, True)
+        return posting_id
+
+    def set_public(self, writer, posting_id, is_public):
+        response = self.client.put(
+            f'/postings/{posting_id}/',
+            json.dumps({
+                "is_public": is_public
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token[writer]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def subscribe(self, subscriber, writer, action='subscribe'):
+        response = self.client.post(
+            f'/users/{self.id[writer]}/{action}/',
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token[subscriber]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def feed(self, subscriber, page_size=3):
+        ids = []
+        cursor = ''
+        while True:
+            response = self.client.get(
+                f'/postings/subscribed/?page_size={page_size}&cursor={cursor}',
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.token[subscriber]
+            )
+            data = response.json()
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [posting['id'] for posting in data['stored_postings']]
+            if not data['has_next']:
+                return ids
+            cursor = data['cursor']
+
+    def test_valid_get_subscribed(self):
+        before = [self.write(2), self.write(3)]
+        self.write(2, is_public=False)
+        self.subscribe(1, 2)
+        self.subscribe(1, 3)
+        self.assertEqual(self.feed(1), sorted(before, reverse=True))
+
+        after = [self.write(2) for _ in range(4)]
+        self.assertEqual(self.feed(1), sorted(before + after, reverse=True))
+
+        self.set_public(2, after[0], False)
+        response = self.client.delete(
+            f'/postings/{after[1]}/',
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token[2]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.feed(1), sorted(before + after[2:], reverse=True))
+
+        self.subscribe(1, 2, action='unsubscribe')
+        self.assertEqual(self.feed(1), [before[1]])
+        self.assertEqual(self.feed(2), [])
+
+    def test_pull_writers_are_joined_at_read_time(self):
+        fanned_out = self.write(2)
+        self.subscribe(1, 2)
+        with self.settings(TIMELINE_FANOUT_MAX_SUBSCRIBERS=1):
+            self.subscribe(3, 2)
+            pulled = [self.write(2), self.write(2)]
+            self.assertFalse(TimelineEntry.objects.filter(posting_id__in=pulled).exists())
+            self.assertEqual(self.feed(1), sorted(pulled + [fanned_out], reverse=True))
+            self.assertEqual(self.feed(3, page_size=1), sorted(pulled + [fanned_out], reverse=True))
+
+        self.subscribe(3, 2, action='unsubscribe')
+        # still joined in until the rebuild sends the writer back to fan-out
+        self.assertEqual(set(TimelineEntry.objects.values_list('posting_id', flat=True)), {fanned_out})
+        self.assertEqual(self.feed(1), sorted(pulled + [fanned_out], reverse=True))
+
+        # even one that rebuilds only another timeline copies the pulled postings
+        call_command('rebuild_timeline', subscriber=[self.id[3]], stdout=StringIO())
+        self.assertFalse(PullWriter.objects.exists())
+        self.assertEqual(set(TimelineEntry.objects.values_list('posting_id', flat=True)),
+                         set(pulled + [fanned_out]))
+        self.assertEqual(self.feed(1), sorted(pulled + [fanned_out], reverse=True))
+
+    def test_follow_backfill_is_bounded(self):
+        postings = [self.write(2) for _ in range(3)]
+        with self.settings(TIMELINE_FOLLOW_BACKFILL=2):
+            self.subscribe(1, 2)
+        self.assertEqual(self.feed(1), sorted(postings[1:], reverse=True))
+        call_command('rebuild_timeline', stdout=StringIO())
+        self.assertEqual(self.feed(1), sorted(postings, reverse=True))
+
+    def bulk_subscribe(self, subscriber, writers, action='subscribe'):
+        response = self.client.post(
+            f'/users/{action}/',
+            json.dumps({"writer_ids": [self.id[writer] for writer in writers]}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token[subscriber]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_subscribe(self):
+        postings = [self.write(2), self.write(3)]
+        self.bulk_subscribe(1, [2, 3])
+        self.assertEqual(self.feed(1), sorted(postings, reverse=True))
+
+        with self.settings(TIMELINE_FANOUT_MAX_SUBSCRIBERS=1):
+            self.bulk_subscribe(3, [2])
+            pulled = self.write(2)
+            self.assertFalse(TimelineEntry.objects.filter(posting_id=pulled).exists())
+            self.assertEqual(self.feed(1), sorted(postings + [pulled], reverse=True))
+
+        self.bulk_subscribe(1, [2, 3], action='unsubscribe')
+        self.assertEqual(self.feed(1), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(3), [pulled, postings[0]])
+
+    def test_rebuild_timeline(self):
+        postings = [self.write(2), self.write(3)]
+        self.subscribe(1, 2)
+        self.subscribe(1, 3)
+        TimelineEntry.objects.all().delete()
+        self.assertEqual(self.feed(1), [])
+
+        call_command('rebuild_timeline', stdout=StringIO())
+        self.assertEqual(self.feed(1), sorted(postings, reverse=True))
+
+
+@override_settings(CACHE_SHARED=True)
+class PostingCacheTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        response = self.client.post(
+            '/users/',
+            json.dumps({
+                "facebookid": "1",
+                "access_token": "1",
+                "nickname": "1",
+            }),
+            content_type='application/json'
+        )
+        data = response.json()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token_1 = "Token " + data["access_token"]
+
+        response = self.client.post(
+            '/postings/',
+            json.dumps({
+                "title": "title1",
+                "content": "This is content of posting1",
+                "alignment": "LEFT",
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token_1
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.posting_id = response.json()['id']
+
+    def get_posting(self):
+        response = self.client.get(f'/postings/{self.posting_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_cached_get_posting(self):
+        self.get_posting()
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get_posting()
+        self.assertEqual(len(queries.captured_queries), 0)
+        self.assertEqual(data['title'], 'title1')
+        self.assertEqual(data['writer']['nickname'], '1')
+        self.assertEqual(posting_cache.stats()['hits'], 1)
+        self.assertEqual(posting_cache.stats()['misses'], 1)
+
+    def test_not_cached_without_shared_cache(self):
+        with override_settings(CACHE_SHARED=False):
+            self.get_posting()
+            with CaptureQueriesContext(connection) as queries:
+                self.get_posting()
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertEqual(posting_cache.stats()['hits'], 0)
+        self.assertEqual(posting_cache.stats()['misses'], 0)
+
+    def test_cache_invalidated_by_writes(self):
+        self.get_posting()
+        response = self.client.put(
+            f'/postings/{self.posting_id}/',
+            json.dumps({
+                "content": "Changed content",
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token_1
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_posting()['content'], 'Changed content')
+
+        response = self.client.put(
+            '/users/me/',
+            json.dumps({
+                "nickname": "renamed"
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token_1
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_posting()['writer']['nickname'], 'renamed')
+
+        response = self.client.delete(
+            f'/postings/{self.posting_id}/',
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token_1
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f'/postings/{self.posting_id}/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostingQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        # one reader subscribed to three writers, with pages full of their postings
+        self.tokens = []
+        for i in range(4):
+            response = self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": str(i),
+                    "access_token": str(i),
+                    "nickname": str(i),
+                }),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.tokens.append(("Token " + response.json()["access_token"], response.json()["user"]["id"]))
+        self.token, _ = self.tokens[0]
+
+        self.posting_ids = []
+        for writer_token, writer_id in self.tokens[1:]:
+            self.client.post(f'/users/{writer_id}/subscribe/', HTTP_AUTHORIZATION=self.token)
+            for i in range(3):
+                response = self.client.post(
+                    '/postings/',
+                    json.dumps({
+                        "title": f"title{i}",
+                        "content": "content",
+                        "alignment": "LEFT",
+                        "is_public": True
+                    }),
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=writer_token
+                )
+                self.posting_ids.append(response.json()['id'])
+                self.client.put(
+                    f'/postings/{self.posting_ids[-1]}/',
+                    json.dumps({"is_public": True}),
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=writer_token
+                )
+        for posting_id in self.posting_ids:
+            self.client.post(f'/postings/{posting_id}/scrap/', HTTP_AUTHORIZATION=self.token)
+
+    def test_read_endpoints(self):
+        response = self.assertQueryBudget(self.client.get, '/postings/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertQueryBudget(self.client.get, f'/postings/{self.posting_ids[0]}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertQueryBudget(self.client.get, '/postings/', {'ids': ','.join(map(str, self.posting_ids))},
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual([item['status_code'] for item in response.json()['results']], [200] * 9)
+        response = self.assertQueryBudget(self.client.get, '/postings/scrapped/', {'page_size': 10},
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(len(response.json()['stored_postings']), 9)
+        response = self.assertQueryBudget(self.client.get, '/postings/subscribed/', {'page_size': 10},
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(len(response.json()['stored_postings']), 9)
+
+    def test_write_endpoints(self):
+        writer_token, _ = self.tokens[1]
+        response = self.assertQueryBudget(
+            self.client.post, '/postings/',
+            json.dumps({
+                "title": "title0",
+                "content": "content",
+                "alignment": "LEFT",
+                "is_public": True
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=writer_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        posting_id = response.json()['id']
+
+        response = self.assertQueryBudget(
+            self.client.put, f'/postings/{posting_id}/',
+            json.dumps({
+                "content": "changed",
+                "is_public": True
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=writer_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertQueryBudget(self.client.post, f'/postings/{posting_id}/scrap/',
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertQueryBudget(self.client.post, f'/postings/{posting_id}/unscrap/',
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertQueryBudget(self.client.post, '/postings/unscrap/',
+                                          json.dumps({"posting_ids": self.posting_ids}),
+                                          content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual([item['status_code'] for item in response.json()['results']], [200] * 9)
+        response = self.assertQueryBudget(self.client.post, '/postings/scrap/',
+                                          json.dumps({"posting_ids": self.posting_ids}),
+                                          content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual([item['status_code'] for item in response.json()['results']], [200] * 9)
+        response = self.assertQueryBudget(self.client.delete, f'/postings/{posting_id}/',
+                                          HTTP_AUTHORIZATION=writer_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ScrapTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        response = self.client.post(
+            '/users/',
+            json.dumps({
+                "facebookid": "1",
+                "access_token": "1",
+                "nickname": "1",
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = "Token " + response.json()["access_token"]
+        self.id = response.json()["user"]["id"]
+        title = Title.objects.create(name='title1')
+        self.public_id = Posting.objects.create(title=title, writer_id=self.id, content='a', is_public=True).id
+        self.private_id = Posting.objects.create(title=title, writer_id=self.id, content='b').id
+
+    def post(self, posting_id, action):
+        return self.client.post(f'/postings/{posting_id}/{action}/', HTTP_AUTHORIZATION=self.token)
+
+    def statements(self, queries):
+        # (scrap statements, title activity upserts), transaction control left out
+        statements = [query['sql'] for query in queries.captured_queries
+                      if query['sql'].split()[0] not in ('SAVEPOINT', 'RELEASE')]
+        return ([sql.split()[0] for sql in statements if 'title_titleactivity' not in sql],
+                [sql.split()[0] for sql in statements if 'title_titleactivity' in sql])
+
+    def test_scrap_is_one_statement(self):
+        self.post(self.public_id, 'unscrap')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(self.public_id, 'scrap')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.statements(queries), (['INSERT'], ['INSERT']))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(self.public_id, 'unscrap')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.statements(queries), (['DELETE'], ['INSERT']))
+        self.assertFalse(Scrap.objects.exists())
+
+    def test_scrap_twice(self):
+        self.assertTrue(Scrap.add(self.id, self.public_id))
+        self.assertFalse(Scrap.add(self.id, self.public_id))
+
+        response = self.post(self.public_id, 'scrap')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['errorcode'], 40001)
+        self.assertEqual(Scrap.objects.count(), 1)
+
+    def test_unscrap_twice(self):
+        self.assertEqual(self.post(self.public_id, 'scrap').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post(self.public_id, 'unscrap').status_code, status.HTTP_200_OK)
+
+        response = self.post(self.public_id, 'unscrap')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['errorcode'], 40002)
+
+    def test_scrap_missing_or_private_posting(self):
+        for posting_id in (self.private_id, self.private_id + 100, 'abc'):
+            response = self.post(posting_id, 'scrap')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.json()['errorcode'], 20003)
+        response = self.post(self.private_id + 100, 'unscrap')
+        self.assertEqual(response.json()['errorcode'], 20003)
+        response = self.post(self.private_id, 'unscrap')
+        self.assertEqual(response.json()['errorcode'], 40002)
+        self.assertFalse(Scrap.objects.exists())
+
+    def bulk(self, action, posting_ids):
+        return self.client.post(
+            f'/postings/{action}/',
+            json.dumps({"posting_ids": posting_ids}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+
+    def test_bulk_scrap(self):
+        self.post(self.public_id, 'scrap')
+        other_id = Posting.objects.create(title_id=Title.objects.get().id, writer_id=self.id, is_public=True).id
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bulk('scrap', [self.public_id, other_id, self.private_id, 0, other_id])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(item['id'], item['status_code'], item.get('errorcode')) for item in response.json()['results']],
+                         [(self.public_id, 400, 40001), (other_id, 200, None), (self.private_id, 400, 20003),
+                          (0, 400, 20003)])
+        self.assertEqual(response.json()['results'][0]['message'], 'Posting is already scrapped')
+        self.assertEqual(self.statements(queries), (['SELECT', 'INSERT'], ['INSERT']))
+        self.assertEqual(set(Scrap.objects.values_list('posting_id', flat=True)), {self.public_id, other_id})
+
+        response = self.bulk('unscrap', [other_id, self.private_id, 0])
+        self.assertEqual([(item['id'], item['status_code'], item.get('errorcode')) for item in response.json()['results']],
+                         [(other_id, 200, None), (self.private_id, 400, 40002), (0, 400, 20003)])
+        self.assertEqual(list(Scrap.objects.values_list('posting_id', flat=True)), [self.public_id])
+
+    def test_bulk_invalid_ids(self):
+        for posting_ids in (None, [], 'abc', [1, 'x'], [True], list(range(101))):
+            response = self.bulk('scrap', posting_ids)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.json()['errorcode'], 60001)
+
+
+class PostingETagTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        self.token = {}
+        self.id = {}
+        for i in range(1, 3):
+            response = self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": f"{i}",
+                    "access_token": f"{i}",
+                    "nickname": f"{i}",
+                }),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.token[i] = "Token " + response.json()["access_token"]
+            self.id[i] = response.json()["user"]["id"]
+        self.posting_id = self.write()
+        response = self.client.post(f'/users/{self.id[1]}/subscribe/', HTTP_AUTHORIZATION=self.token[2])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def write(self):
+        response = self.client.post(
+            '/postings/',
+            json.dumps({"title": "title1", "content": "content", "alignment": "LEFT"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token[1]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        posting_id = response.json()['id']
+        self.update(posting_id, is_public=True)
+        return posting_id
+
+    def update(self, posting_id, **data):
+        response = self.client.put(f'/postings/{posting_id}/', json.dumps(data), content_type='application/json',
+                                   HTTP_AUTHORIZATION=self.token[1])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def get(self, path, etag=None):
+        headers = {'HTTP_AUTHORIZATION': self.token[2]}
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get(path, **headers)
+
+    def assertNotModified(self, path, etag, if_none_match=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(path, if_none_match or etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        return queries
+
+    def assertModified(self, path, etag):
+        response = self.get(path, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    @override_settings(CACHE_SHARED=True)
+    def test_posting_detail(self):
+        path = f'/postings/{self.posting_id}/'
+        etag = self.get(path)['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        queries = self.assertNotModified(path, etag)
+        self.assertEqual(len(queries.captured_queries), 0)
+        # compared weakly, in a list
+        self.assertNotModified(path, etag, etag[2:])
+        self.assertNotModified(path, etag, f'W/"other", {etag}')
+
+        self.update(self.posting_id, content='changed')
+        etag = self.assertModified(path, etag)
+        response = self.client.put('/users/me/', json.dumps({"nickname": "renamed"}),
+                                   content_type='application/json', HTTP_AUTHORIZATION=self.token[1])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = self.assertModified(path, etag)
+        self.assertNotModified(path, etag)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_subscribed_feed(self):
+        path = '/postings/subscribed/?page_size=2'
+        etag = self.get(path)['ETag']
+        self.assertNotModified(path, etag)
+        self.assertEqual(self.get('/postings/subscribed/?page_size=3', etag).status_code, status.HTTP_200_OK)
+
+        # a new posting, an edit, a removal and an unsubscribe all change the feed
+        posting_id = self.write()
+        etag = self.assertModified(path, etag)
+        self.update(self.posting_id, content='changed')
+        etag = self.assertModified(path, etag)
+        response = self.client.delete(f'/postings/{posting_id}/', HTTP_AUTHORIZATION=self.token[1])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = self.assertModified(path, etag)
+        response = self.client.post(f'/users/{self.id[1]}/unsubscribe/', HTTP_AUTHORIZATION=self.token[2])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = self.assertModified(path, etag)
+        self.assertEqual(self.get(path).json()['stored_postings'], [])
+        self.assertNotModified(path, etag)
+
+    def test_subscribed_feed_untagged_without_shared_cache(self):
+        # another worker's edit would never change a locmem generation
+        response = self.get('/postings/subscribed/?page_size=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class FeedFieldsTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        self.token = {}
+        self.id = {}
+        for i in range(1, 3):
+            response = self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": f"{i}",
+                    "access_token": f"{i}",
+                    "nickname": f"{i}",
+                }),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.token[i] = "Token " + response.json()["access_token"]
+            self.id[i] = response.json()["user"]["id"]
+        response = self.client.post(f'/users/{self.id[1]}/subscribe/', HTTP_AUTHORIZATION=self.token[2])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.content = ("눈이 온다 " * 30).strip()
+        response = self.client.post(
+            '/postings/',
+            json.dumps({"title": "title1", "content": self.content, "alignment": "LEFT"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token[1]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.posting_id = response.json()['id']
+        response = self.client.put(f'/postings/{self.posting_id}/', json.dumps({"is_public": True}),
+                                   content_type='application/json', HTTP_AUTHORIZATION=self.token[1])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(f'/postings/{self.posting_id}/scrap/', HTTP_AUTHORIZATION=self.token[2])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.title_id = Title.objects.get(name="title1").id
+
+    def feeds(self):
+        return (
+            ('/postings/scrapped/', 'stored_postings'),
+            ('/postings/subscribed/', 'stored_postings'),
+            (f'/users/{self.id[1]}/postings/', 'postings'),
+            (f'/titles/{self.title_id}/postings/', 'postings'),
+        )
+
+    def test_excerpt_kept_with_content(self):
+        posting = Posting.objects.get(pk=self.posting_id)
+        self.assertEqual(posting.excerpt, self.content[:Posting.EXCERPT_LENGTH])
+        self.assertEqual(posting.content_length, len(self.content))
+
+        response = self.client.put(f'/postings/{self.posting_id}/', json.dumps({"content": "짧은 글"}),
+                                   content_type='application/json', HTTP_AUTHORIZATION=self.token[1])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        posting = Posting.objects.get(pk=self.posting_id)
+        self.assertEqual((posting.excerpt, posting.content_length), ("짧은 글", 4))
+
+    def test_fields(self):
+        for path, key in self.feeds():
+            response = self.client.get(path, {'fields': 'excerpt,writer'}, HTTP_AUTHORIZATION=self.token[2])
+            self.assertEqual(response.status_code, status.HTTP_200_OK, path)
+            self.assertEqual(response.json()[key], [{
+                'id': self.posting_id,
+                'writer': {'id': self.id[1], 'nickname': '1'},
+                'excerpt': self.content[:Posting.EXCERPT_LENGTH],
+                'content_length': len(self.content),
+            }], path)
+
+            # the TEXT column is left out of the query
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(path, {'fields': 'title'}, HTTP_AUTHORIZATION=self.token[2])
+            self.assertFalse(any('posting.content,' in query['sql'] or 'posting.content ' in query['sql']
+                                 for query in queries.captured_queries), path)
+
+            # without the parameter nothing changes
+            response = self.client.get(path, HTTP_AUTHORIZATION=self.token[2])
+            self.assertEqual(set(response.json()[key][0]),
+                             {'id', 'title', 'writer', 'content', 'alignment', 'is_public', 'created_at'}, path)
+
+    def test_invalid_fields(self):
+        for path, _ in self.feeds():
+            response = self.client.get(path, {'fields': 'title,password'}, HTTP_AUTHORIZATION=self.token[2])
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, path)
+            self.assertEqual(response.json()['errorcode'], 70001, path)
+
+
+class MultiGetPostingsTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        self.token = {}
+        for i in range(1, 3):
+            response = self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": f"{i}",
+                    "access_token": f"{i}",
+                    "nickname": f"{i}",
+                }),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.token[i] = "Token " + response.json()["access_token"]
+        self.public_id = self.write("public", True)
+        self.private_id = self.write("private", False)
+
+    def write(self, content, is_public):
+        response = self.client.post(
+            '/postings/',
+            json.dumps({"title": "title1", "content": content, "alignment": "LEFT"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token[1]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        posting_id = response.json()['id']
+        if is_public:
+            response = self.client.put(f'/postings/{posting_id}/', json.dumps({"is_public": True}),
+                                       content_type='application/json', HTTP_AUTHORIZATION=self.token[1])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return posting_id
+
+    def get_ids(self, ids, **headers):
+        response = self.client.get('/postings/', {'ids': ids}, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()['results']
+
+    def test_results_in_request_order(self):
+        results = self.get_ids(f'{self.private_id},0,{self.public_id},{self.public_id}')
+
+        self.assertEqual([item['id'] for item in results], [self.private_id, 0, self.public_id])
+        # the private posting is a miss for everyone but its writer
+        self.assertEqual([item['status_code'] for item in results], [400, 400, 200])
+        self.assertEqual(results[0]['errorcode'], 20003)
+        detail = self.client.get(f'/postings/{self.public_id}/').json()
+        self.assertEqual(results[2]['posting'], detail)
+
+        results = self.get_ids(f'{self.private_id},{self.public_id}', HTTP_AUTHORIZATION=self.token[2])
+        self.assertEqual([item['status_code'] for item in results], [400, 200])
+        results = self.get_ids(f'{self.private_id},{self.public_id}', HTTP_AUTHORIZATION=self.token[1])
+        self.assertEqual([item['status_code'] for item in results], [200, 200])
+        self.assertEqual(results[0]['posting']['content'], 'private')
+
+    def test_invalid_ids(self):
+        for ids in ('', 'one', ','.join(map(str, range(1, 102)))):
+            response = self.client.get('/postings/', {'ids': ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, ids)
+            self.assertEqual(response.json()['errorcode'], 60001)
+
+
+@override_settings(CACHE_SHARED=True)
+class ExploreTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        response = self.client.post(
+            '/users/',
+            json.dumps({
+                "facebookid": "1",
+                "access_token": "1",
+                "nickname": "1",
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = "Token " + response.json()["access_token"]
+        self.public_ids = [self.write(f"public {i}", True) for i in range(5)]
+        self.private_id = self.write("private", False)
+
+    def write(self, content, is_public):
+        response = self.client.post(
+            '/postings/',
+            json.dumps({"title": "title1", "content": content, "alignment": "LEFT"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        posting_id = response.json()['id']
+        if is_public:
+            self.update(posting_id, is_public=True)
+        return posting_id
+
+    def update(self, posting_id, **data):
+        response = self.client.put(f'/postings/{posting_id}/', json.dumps(data), content_type='application/json',
+                                   HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def explore(self, page_size=2):
+        # every page, with the queries each took
+        ids, queries, cursor = [], [], None
+        while True:
+            params = {'page_size': page_size}
+            if cursor:
+                params['cursor'] = cursor
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get('/postings/', params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [posting['id'] for posting in response.json()['postings']]
+            queries.append(len(captured.captured_queries))
+            cursor = response.json()['cursor']
+            if not response.json()['has_next']:
+                return ids, queries
+
+    def test_pages_from_the_buffer(self):
+        ids, queries = self.explore()
+        self.assertEqual(ids, self.public_ids[::-1])
+        # the first page fills the buffer, which holds every public posting
+        self.assertEqual(queries, [1, 0, 0])
+
+        response = self.client.get('/postings/')
+        self.assertEqual(response.json()['postings'][0], self.client.get(f'/postings/{self.public_ids[-1]}/').json())
+
+    def test_changes_refill_the_buffer(self):
+        self.explore()
+        new_id = self.write("new", True)
+        self.update(self.public_ids[0], is_public=False)
+        response = self.client.delete(f'/postings/{self.public_ids[1]}/', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        ids, queries = self.explore()
+        self.assertEqual(ids, [new_id] + self.public_ids[:1:-1])
+        self.assertEqual(queries[0], 1)
+
+        response = self.client.put('/users/me/', json.dumps({"nickname": "renamed"}),
+                                   content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get('/postings/')
+        self.assertEqual(response.json()['postings'][0]['writer']['nickname'], 'renamed')
+
+    def test_pages_past_the_buffer(self):
+        with patch.object(explore.explore_buffer, 'size', 3):
+            ids, queries = self.explore()
+        self.assertEqual(ids, self.public_ids[::-1])
+        # the buffer holds 3 of 5: the last page is read from the index
+        self.assertEqual(queries, [1, 1, 1])
+
+    def test_buffer_expires(self):
+        self.explore()
+        # an edit no hook sees
+        Posting.objects.filter(id=self.public_ids[-1]).update(content='edited')
+        self.assertEqual(self.client.get('/postings/').json()['postings'][0]['content'], 'public 4')
+        with patch.object(explore.explore_buffer, 'max_age', 0):
+            self.assertEqual(self.client.get('/postings/').json()['postings'][0]['content'], 'edited')
+
+    def test_buffer_off_without_shared_cache(self):
+        with override_settings(CACHE_SHARED=False):
+            ids, queries = self.explore()
+        self.assertEqual(ids, self.public_ids[::-1])
+        self.assertEqual(queries, [1, 1, 1])
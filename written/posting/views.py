@@ -3,39 +3,67 @@ from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from posting import cache as posting_cache
+from posting import explore
+from posting import hooks
 from posting.models import Posting
-from posting.serializers import PostingSerializer, PostingRetrieveSerializer, PostingUpdateSerializer
+from posting.serializers import PostingSerializer, PostingUpdateSerializer
 from scrap.models import Scrap
+from subscription import timeline
 from subscription.models import Subscription
+from title import activity as title_activity
 from title.models import Title
+from written import projection
+from written.bulk import failed, parse_ids, succeeded
+from written.conditional import etag, is_fresh, not_modified, page_parts
 from written.error_codes import *
+from written.pagination import Keyset
 from django.utils import timezone
 
 
-from django.db import connection
-
-
-def dict_fetch_all(cursor):
-    # Return all rows from a cursor as a dict
-    columns = [col[0] for col in cursor.description]
-    return [
-        dict(zip(columns, row))
-        for row in cursor.fetchall()
-    ]
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
 
 
 def get_posting(posting_id):
     try:
-        return Posting.objects.get(pk=posting_id)
-    except Posting.DoesNotExist:
+        # update() serializes title and writer, delete() and scrap() compare the writer
+        return Posting.objects.select_related('title', 'writer__userprofile').get(pk=posting_id)
+    except (Posting.DoesNotExist, ValueError):
         return None
 
 
+def get_posting_id(posting_id):
+    try:
+        return int(posting_id)
+    except ValueError:
+        raise PostingDoesNotExistException()
+
+
 class PostingViewSet(viewsets.GenericViewSet):
     queryset = Posting.objects.all()
     serializer_class = PostingSerializer
     permission_classes = (IsAuthenticated(), )
+    SCRAPPED_KEYSET = Keyset(('scrap.id', 'scrap_id'), default_page_size=5)
+    SUBSCRIBED_KEYSET = Keyset(('timeline.posting_id', 'id'), default_page_size=5)
+    PULL_KEYSET = Keyset(('posting.id', 'id'))
+    EXPLORE_KEYSET = Keyset(('posting.id', 'id'), default_page_size=10)
+    # most queries an action may run, whatever the page size (see written.queries)
+    QUERY_BUDGETS = {
+        'list': 2,
+        'create': 8,
+        'retrieve': 1,
+        'update': 7,
+        'delete': 8,
+        'scrap': 3,
+        'unscrap': 3,
+        'bulk_scrap': 4,
+        'bulk_unscrap': 4,
+        'scrapped': 2,
+        'subscribed': 5,
+    }
 
     def get_permissions(self):
         if self.action in ('list', 'retrieve'):
@@ -45,8 +73,42 @@ class PostingViewSet(viewsets.GenericViewSet):
     def get_serializer_class(self):
         return self.serializer_class
 
+    # GET /postings/  GET /postings/?ids=
     def list(self, request):
-        return Response(status=status.HTTP_200_OK)
+        if 'ids' in request.query_params:
+            return self.multi_get(request)
+
+        # the newest pages come from the in-process buffer (see posting.explore)
+        page = self.EXPLORE_KEYSET.page(request)
+        postings = explore.explore_buffer.page(page)
+        if postings is None:
+            postings = projection.project(explore.public_postings(page), projection.posting)
+        postings, has_next, next_cursor = page.paginate(postings)
+        return Response({'postings': postings, 'has_next': has_next, 'cursor': next_cursor}, status=status.HTTP_200_OK)
+
+    def multi_get(self, request):
+        posting_ids = parse_ids(request.query_params.get('ids'))
+
+        # private postings only for their writer, like every other read
+        placeholders = ', '.join(['%s'] * len(posting_ids))
+        raw_query = f'''
+            SELECT {projection.POSTING_COLUMNS}
+            FROM posting_posting AS posting
+            INNER JOIN title_title AS title ON posting.title_id = title.id
+            LEFT JOIN user_userprofile AS profile ON posting.writer_id = profile.user_id
+            WHERE posting.id IN ({placeholders})
+            AND (posting.is_public = 1 OR posting.writer_id = %s);
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(raw_query, posting_ids + [request.user.id])
+            rows = {row['id']: row for row in projection.dict_fetch_all(cursor)}
+
+        results = [
+            succeeded(posting_id, posting=projection.posting(rows[posting_id])) if posting_id in rows
+            else failed(posting_id, PostingDoesNotExistException())
+            for posting_id in posting_ids
+        ]
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
     # POST /postings/
     def create(self, request):
@@ -55,48 +117,51 @@ class PostingViewSet(viewsets.GenericViewSet):
         titlename = data.get('title')
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        posting = serializer.save(writer=user)
+        with transaction.atomic():
+            posting = serializer.save(writer=user)
+            hooks.posting_created(posting)
         data_to_show = serializer.data
         data_to_show['title'] = titlename
 
         if user.userprofile.first_posted_at is None:
             user.userprofile.first_posted_at = posting.created_at
-            user.userprofile.save()
+            user.userprofile.save(update_fields=['first_posted_at'])
 
         return Response(data_to_show, status=status.HTTP_201_CREATED)
 
     # GET /postings/{posting_id}/
     def retrieve(self, request, pk=None):
-        posting = get_posting(pk)
-        if not posting:
+        tag = posting_cache.get_posting_etag(pk)
+        if tag is not None and is_fresh(request, tag):
+            return not_modified(tag)
+        tag, data = posting_cache.get_posting_data(pk)
+        if data is None:
             raise PostingDoesNotExistException()
-        serializer = PostingRetrieveSerializer(posting)
-        return Response(serializer.data)
+        if is_fresh(request, tag):
+            return not_modified(tag)
+        return Response(data, headers={'ETag': tag})
 
     # PUT /postings/{posting_id}/
     def update(self, request, pk=None):
         user = request.user
-        data = request.data
 
-        try:
-            posting = get_posting(pk)
-        except Posting.DoesNotExist:
+        posting = get_posting(pk)
+        if not posting:
             raise PostingDoesNotExistException()
 
-        if data.get('is_public') is not None and not bool(data.get('is_public')) and posting.is_public:
-            make_private = True
-        else:
-            make_private = False
-
         if posting.writer != user:
             raise UserNotAuthorizedException()
 
+        was_public = posting.is_public
         serializer = PostingUpdateSerializer(posting, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.update(posting, serializer.validated_data)
-
-        if make_private:
-            Scrap.objects.filter(posting_id=posting.id).delete()
+        with transaction.atomic():
+            serializer.update(posting, serializer.validated_data)
+            make_private = was_public and not posting.is_public
+            if make_private:
+                removed, _ = Scrap.objects.filter(posting_id=posting.id).delete()
+                title_activity.scraps_removed(posting.title_id, removed)
+            hooks.posting_updated(posting, was_public)
 
         data_to_show = serializer.data
         data_to_show['title'] = posting.title.name
@@ -109,12 +174,16 @@ class PostingViewSet(viewsets.GenericViewSet):
             raise PostingDoesNotExistException()
         if request.user != posting.writer:
             raise UserNotAuthorizedException()
-        posting.delete()
+        with transaction.atomic():
+            hooks.posting_deleted(posting)
+            posting.delete()
         return Response(status=status.HTTP_200_OK)
 
     # ==API Scrap===============================================================================
     # POST postings/{posting_id}/scrap/
     # POST postings/{posting_id}/unscrap/
+    # POST postings/scrap/
+    # POST postings/unscrap/
     # GET postings/scrapped/
     # ==API Subscription========================================================================
     # GET postings/subscribed/
@@ -123,134 +192,168 @@ class PostingViewSet(viewsets.GenericViewSet):
     @action(detail=True, methods=['POST'], url_path='scrap')
     def scrap(self, request, pk):
         user_id = request.user.id
-        try:
-            posting = Posting.objects.get(pk=pk)
-        except Posting.DoesNotExist:
-            raise PostingDoesNotExistException()
-        if not posting.is_public:
-            raise PostingDoesNotExistException()
-        try:
-            Scrap.objects.get(user_id=user_id, posting_id=posting.id)
-            raise AlreadyScrappedException()
-        except Scrap.DoesNotExist:
-            Scrap.objects.create(user_id=user_id, posting_id=posting.id)
+        posting_id = get_posting_id(pk)
+        with transaction.atomic():
+            if not Scrap.add(user_id, posting_id):
+                # only a failed write pays for finding out why
+                if not Posting.objects.filter(pk=posting_id, is_public=True).exists():
+                    raise PostingDoesNotExistException()
+                raise AlreadyScrappedException()
+            title_activity.scrapped([posting_id])
+        posting_cache.invalidate(posting_id)
         return Response(status=status.HTTP_200_OK)
 
     # POST postings/{posting_id}/unscrap
     @action(detail=True, methods=['POST'], url_path='unscrap')
     def unscrap(self, request, pk):
         user_id = request.user.id
-        try:
-            posting = Posting.objects.get(pk=pk)
-        except Posting.DoesNotExist:
-            raise PostingDoesNotExistException()
-        try:
-            scrap = Scrap.objects.get(user_id=user_id, posting_id=posting.id)
-            scrap.delete()
-        except Scrap.DoesNotExist:
-            raise AlreadyUnscrappedException()
+        posting_id = get_posting_id(pk)
+        with transaction.atomic():
+            if not Scrap.remove(user_id, posting_id):
+                if not Posting.objects.filter(pk=posting_id).exists():
+                    raise PostingDoesNotExistException()
+                raise AlreadyUnscrappedException()
+            title_activity.scrapped([posting_id], -1)
+        posting_cache.invalidate(posting_id)
         return Response(status=status.HTTP_200_OK)
 
+    def scrap_states(self, user_id, posting_ids):
+        # {posting_id: (is_public, scrapped)} of the postings that exist, in one query.
+        # The posting rows stay locked until the caller's transaction ends, so neither a posting
+        # made private nor a concurrent scrap of the same posting can slip in before the write.
+        scrapped = Scrap.objects.filter(user_id=user_id, posting_id=OuterRef('id'))
+        rows = Posting.objects.select_for_update().filter(id__in=posting_ids).annotate(scrapped=Exists(scrapped))
+        return {posting_id: (is_public, is_scrapped)
+                for posting_id, is_public, is_scrapped in rows.values_list('id', 'is_public', 'scrapped')}
+
+    # POST postings/scrap/ {"posting_ids": [...]}
+    @action(detail=False, methods=['POST'], url_path='scrap', url_name='bulk-scrap')
+    def bulk_scrap(self, request):
+        user_id = request.user.id
+        posting_ids = parse_ids(request.data.get('posting_ids'))
+        with transaction.atomic():
+            states = self.scrap_states(user_id, posting_ids)
+            results, scraps = [], []
+            for posting_id in posting_ids:
+                is_public, scrapped = states.get(posting_id, (False, False))
+                if not is_public:
+                    results.append(failed(posting_id, PostingDoesNotExistException))
+                elif scrapped:
+                    results.append(failed(posting_id, AlreadyScrappedException))
+                else:
+                    results.append(succeeded(posting_id))
+                    scraps.append(posting_id)
+            if scraps:
+                Scrap.add_many(user_id, scraps)
+                title_activity.scrapped(scraps)
+                posting_cache.invalidate(*scraps)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    # POST postings/unscrap/ {"posting_ids": [...]}
+    @action(detail=False, methods=['POST'], url_path='unscrap', url_name='bulk-unscrap')
+    def bulk_unscrap(self, request):
+        user_id = request.user.id
+        posting_ids = parse_ids(request.data.get('posting_ids'))
+        with transaction.atomic():
+            states = self.scrap_states(user_id, posting_ids)
+            results, scraps = [], []
+            for posting_id in posting_ids:
+                if posting_id not in states:
+                    results.append(failed(posting_id, PostingDoesNotExistException))
+                elif not states[posting_id][1]:
+                    results.append(failed(posting_id, AlreadyUnscrappedException))
+                else:
+                    results.append(succeeded(posting_id))
+                    scraps.append(posting_id)
+            if scraps:
+                Scrap.remove_many(user_id, scraps)
+                title_activity.scrapped(scraps, -1)
+                posting_cache.invalidate(*scraps)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
     # GET postings/scrapped/
     @action(detail=False, methods=['GET'], url_path='scrapped')
     def scrapped(self, request):
-        try:
-            DEFAULT_CURSOR = Scrap.objects.last().id + 1
-        except AttributeError:
-            DEFAULT_CURSOR = 0
-        DEFAULT_PAGE_SIZE = 5
-
         user_id = request.user.id
-        my_cursor = int(request.query_params.get('cursor')) if request.query_params.get(
-            'cursor') else DEFAULT_CURSOR
-        page_size = int(request.query_params.get('page_size')) if request.query_params.get(
-            'page_size') else DEFAULT_PAGE_SIZE
+        page = self.SCRAPPED_KEYSET.page(request)
+        fields = projection.PostingFields.from_request(request)
+        seek, params = page.seek()
 
         # PAGINATION QUERY
         pagination_query = f'''
-                    SELECT posting.id, posting.writer_id as 'writer', title.name as 'title',posting.content, 
-                    posting.alignment, posting.created_at, posting.is_public, scrap.id as 'scrap_id', userprofile.nickname as 'nickname'
+                    SELECT {fields.columns}, scrap.id as 'scrap_id'
                     FROM  posting_posting AS posting
-                    INNER JOIN user_userprofile userprofile on posting.writer_id = userprofile.user_id
+                    INNER JOIN user_userprofile profile on posting.writer_id = profile.user_id
                     INNER JOIN title_title title on posting.title_id = title.id
                     INNER JOIN scrap_scrap scrap on posting.id = scrap.posting_id
-                    WHERE scrap.id < {my_cursor} AND scrap.user_id = {user_id}
-                    ORDER BY scrap.id DESC
-                    LIMIT {page_size + 1};
+                    WHERE {seek} AND scrap.user_id = %s
+                    ORDER BY {page.order_by()}
+                    LIMIT %s;
                     '''
         with connection.cursor() as cursor:
-            cursor.execute(pagination_query)
-            rows = dict_fetch_all(cursor)
-
-        # set 'has_next', delete surplus row
-        if len(rows) == page_size + 1:
-            has_next = True
-            del rows[-1]
-        else:
-            has_next = False
-
-        # set 'cursor', delete field 'scrap_id'
-        if has_next:
-            next_cursor = rows[-1]['scrap_id']
-        else:
-            next_cursor = None
-        for i in range(len(rows)):
-            rows[i]['writer'] = {'id': rows[i]['writer'], 'nickname': rows[i]['nickname']}
-            rows[i]['is_public'] =bool(rows[i]['is_public'])
-            del rows[i]['scrap_id']
-            del rows[i]['nickname']
-
-        data = {'stored_postings': rows, 'has_next': has_next, 'cursor': next_cursor}
+            cursor.execute(pagination_query, params + [user_id, page.limit])
+            rows = projection.dict_fetch_all(cursor)
+
+        # set 'has_next' and 'cursor', delete surplus row
+        rows, has_next, next_cursor = page.paginate(rows)
+
+        data = {'stored_postings': fields.project(rows), 'has_next': has_next, 'cursor': next_cursor}
         return Response(data, status=status.HTTP_200_OK)
 
     # GET postings/subscribed/
     @action(detail=False, methods=['GET'], url_path='subscribed')
     def subscribed(self, request):
-        try:
-            DEFAULT_CURSOR = Posting.objects.last().id + 1
-        except AttributeError:
-            DEFAULT_CURSOR = 0
-        DEFAULT_PAGE_SIZE = 5
-
         user_id = request.user.id
-        my_cursor = int(request.query_params.get('cursor')) if request.query_params.get(
-            'cursor') else DEFAULT_CURSOR
-        page_size = int(request.query_params.get('page_size')) if request.query_params.get(
-            'page_size') else DEFAULT_PAGE_SIZE
-
-        # PAGINATION QUERY
+        page = self.SUBSCRIBED_KEYSET.page(request)
+        fields = projection.PostingFields.from_request(request)
+        seek, params = page.seek()
+
+        # writers too popular to fan out are joined in at read time
+        pull_writer_ids = timeline.pull_writer_ids(user_id)
+        # edits and removals reach the tag only through generations: untagged without a shared cache
+        tag = None
+        if settings.CACHE_SHARED:
+            newest_id, generations = timeline.feed_version(user_id, pull_writer_ids)
+            tag = etag('subscribed', user_id, newest_id, generations, page_parts(request))
+            if is_fresh(request, tag):
+                return not_modified(tag)
+
+        # PAGINATION QUERY: postings fanned out to the subscriber's timeline
         pagination_query = f'''
-                        SELECT posting.id, posting.writer_id as 'writer', title.name as 'title',posting.content, 
-                        posting.alignment, posting.created_at, posting.is_public, userprofile.nickname as 'nickname'
-                        FROM  posting_posting AS posting
-                        INNER JOIN subscription_subscription subscription on subscription.subscriber_id = {user_id} and subscription.writer_id = posting.writer_id
-                        INNER JOIN user_userprofile userprofile on posting.writer_id = userprofile.user_id
+                        SELECT {fields.columns}
+                        FROM  subscription_timelineentry AS timeline
+                        INNER JOIN posting_posting posting on posting.id = timeline.posting_id
+                        INNER JOIN user_userprofile profile on posting.writer_id = profile.user_id
                         INNER JOIN title_title title on posting.title_id = title.id
-                        WHERE posting.id < {my_cursor} and posting.is_public = True 
-                        ORDER BY posting.id DESC
-                        LIMIT {page_size + 1};
+                        WHERE timeline.subscriber_id = %s and {seek} and posting.is_public = True 
+                        ORDER BY {page.order_by()}
+                        LIMIT %s;
                         '''
         with connection.cursor() as cursor:
-            cursor.execute(pagination_query)
-            rows = dict_fetch_all(cursor)
-
-        # set 'has_next', delete surplus row
-        if len(rows) == page_size + 1:
-            has_next = True
-            del rows[-1]
-        else:
-            has_next = False
-
-        # set 'cursor', delete field 'scrap_id'
-        if has_next:
-            next_cursor = rows[-1]['id']
-        else:
-            next_cursor = None
-        for i in range(len(rows)):
-            rows[i]['writer'] = {'id': rows[i]['writer'], 'nickname': rows[i]['nickname']}
-            rows[i]['is_public'] =bool(rows[i]['is_public'])
-            del rows[i]['nickname']
-
-        data = {'stored_postings': rows, 'has_next': has_next, 'cursor': next_cursor}
-        return Response(data, status=status.HTTP_200_OK)
+            cursor.execute(pagination_query, [user_id] + params + [page.limit])
+            rows = projection.dict_fetch_all(cursor)
+
+        if pull_writer_ids:
+            pull_page = page.on(self.PULL_KEYSET)
+            seek, params = pull_page.seek()
+            placeholders = ', '.join(['%s'] * len(pull_writer_ids))
+            pull_query = f'''
+                        SELECT {fields.columns}
+                        FROM  posting_posting AS posting
+                        INNER JOIN user_userprofile profile on posting.writer_id = profile.user_id
+                        INNER JOIN title_title title on posting.title_id = title.id
+                        WHERE posting.writer_id IN ({placeholders}) and {seek} and posting.is_public = True 
+                        ORDER BY {pull_page.order_by()}
+                        LIMIT %s;
+                        '''
+            with connection.cursor() as cursor:
+                cursor.execute(pull_query, pull_writer_ids + params + [pull_page.limit])
+                rows += projection.dict_fetch_all(cursor)
+            # a writer may have postings in both sources from before they became a pull writer
+            rows = sorted({row['id']: row for row in rows}.values(), key=lambda row: row['id'], reverse=True)
+
+        # set 'has_next' and 'cursor', delete surplus row
+        rows, has_next, next_cursor = page.paginate(rows)
 
+        data = {'stored_postings': fields.project(rows), 'has_next': has_next, 'cursor': next_cursor}
+        return Response(data, status=status.HTTP_200_OK, headers={'ETag': tag} if tag else None)
@@ -0,0 +1,17 @@
+# Generated by Django 3.1 on 2021-01-24 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrap', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scrap',
+            index=models.Index(fields=['user', 'id'], name='scrap_user_id'),
+        ),
+    ]
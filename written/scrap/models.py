@@ -1,7 +1,9 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import connection, models
+from django.utils import timezone
 
 from posting.models import Posting
+from written.upsert import insert_select_ignore
 
 
 class Scrap(models.Model):
@@ -13,3 +15,35 @@ class Scrap(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'posting'], name='unique_scrap')
         ]
+        indexes = [
+            # GET /postings/scrapped/ pages a user's scraps by scrap id
+            models.Index(fields=['user', 'id'], name='scrap_user_id'),
+        ]
+
+    # One statement each, safe against double taps. False when nothing changed:
+    # the scrap was already there / not there, or add() found no public posting.
+
+    @classmethod
+    def add(cls, user_id, posting_id):
+        created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        return insert_select_ignore(
+            cls._meta.db_table, ['user_id', 'posting_id', 'created_at'],
+            'SELECT %s, id, %s FROM posting_posting WHERE id = %s AND is_public = %s',
+            [user_id, created_at, posting_id, True],
+        ) == 1
+
+    @classmethod
+    def remove(cls, user_id, posting_id):
+        deleted, _ = cls.objects.filter(user_id=user_id, posting_id=posting_id).delete()
+        return deleted == 1
+
+    # for already validated ids of the bulk endpoints, one statement each
+
+    @classmethod
+    def add_many(cls, user_id, posting_ids):
+        cls.objects.bulk_create([cls(user_id=user_id, posting_id=posting_id) for posting_id in posting_ids],
+                                ignore_conflicts=True)
+
+    @classmethod
+    def remove_many(cls, user_id, posting_ids):
+        cls.objects.filter(user_id=user_id, posting_id__in=posting_ids).delete()
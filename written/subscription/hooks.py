@@ -0,0 +1,18 @@
+from subscription import timeline
+from user.counters import adjust_subscriptions_count
+
+
+# Bookkeeping that has to follow every subscription write.
+# UserViewSet calls these inside the transaction of the write itself.
+
+def subscribed(subscriber_id, *writer_ids):
+    # counted first: timeline reads the writers' subscribers off their profiles
+    adjust_subscriptions_count(subscriber_id, writer_ids, 1)
+    timeline.follow(subscriber_id, *writer_ids)
+    timeline.changed(subscriber_id)
+
+
+def unsubscribed(subscriber_id, *writer_ids):
+    adjust_subscriptions_count(subscriber_id, writer_ids, -1)
+    timeline.unfollow(subscriber_id, *writer_ids)
+    timeline.changed(subscriber_id)
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from subscription import timeline
+from subscription.models import PullWriter, Subscription
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the fan-out timelines behind GET /postings/subscribed/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscriber', type=int, action='append',
+                            help='only rebuild the timeline of this user id (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='number of subscribers rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        self.update_pull_writers()
+
+        if options['subscriber']:
+            subscriber_ids = options['subscriber']
+            for subscriber_id in subscriber_ids:
+                with transaction.atomic():
+                    timeline.rebuild(subscriber_id)
+            self.stdout.write(f'rebuilt {len(subscriber_ids)} timelines')
+            return
+
+        chunk_size = options['chunk_size']
+        last_id = 0
+        rebuilt = 0
+        while True:
+            # every user, so timelines of users who unsubscribed from everyone are emptied too
+            subscriber_ids = list(
+                User.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+            )
+            if not subscriber_ids:
+                break
+            with transaction.atomic():
+                for subscriber_id in subscriber_ids:
+                    timeline.rebuild(subscriber_id)
+            rebuilt += len(subscriber_ids)
+            last_id = subscriber_ids[-1]
+
+        self.stdout.write(f'rebuilt {rebuilt} timelines')
+
+    def update_pull_writers(self):
+        pull_writer_ids = set(
+            Subscription.objects.values('writer_id')
+            .annotate(subscribers=Count('id'))
+            .filter(subscribers__gt=settings.TIMELINE_FANOUT_MAX_SUBSCRIBERS)
+            .values_list('writer_id', flat=True)
+        )
+        existing = set(PullWriter.objects.values_list('writer_id', flat=True))
+        PullWriter.objects.bulk_create(
+            [PullWriter(writer_id=writer_id) for writer_id in pull_writer_ids - existing], ignore_conflicts=True
+        )
+        # the timelines a --subscriber run leaves alone get the demoted writers' postings too
+        for writer_id in existing - pull_writer_ids:
+            with transaction.atomic():
+                timeline.demote(writer_id)
+        self.stdout.write(f'{len(pull_writer_ids)} pull writers')
@@ -0,0 +1,21 @@
+# Generated by Django 3.1 on 2021-01-24 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscription', '0003_timeline'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['subscriber', 'id'], name='subscription_subscriber_id'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['writer', 'id'], name='subscription_writer_id'),
+        ),
+    ]
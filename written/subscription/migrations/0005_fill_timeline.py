@@ -0,0 +1,55 @@
+# Generated by Django 3.1 on 2021-01-29 13:40
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+from written.upsert import insert_select_ignore
+
+CHUNK_SIZE = 500
+
+# subscription.timeline's COPY_POSTINGS_QUERY as of this migration
+COPY_POSTINGS_QUERY = '''
+    SELECT subscription.subscriber_id, posting.id, posting.writer_id
+    FROM subscription_subscription AS subscription
+    INNER JOIN posting_posting AS posting ON posting.writer_id = subscription.writer_id
+    WHERE posting.is_public = 1
+    AND subscription.subscriber_id > %s AND subscription.subscriber_id <= %s
+    AND subscription.writer_id NOT IN (SELECT writer_id FROM subscription_pullwriter)
+'''
+
+
+def fill_timeline(apps, schema_editor):
+    # what `manage.py rebuild_timeline` does, so GET /postings/subscribed/ is not empty after deploy
+    Subscription = apps.get_model('subscription', 'Subscription')
+    PullWriter = apps.get_model('subscription', 'PullWriter')
+    pull_writer_ids = (
+        Subscription.objects.values('writer_id')
+        .annotate(subscribers=Count('id'))
+        .filter(subscribers__gt=settings.TIMELINE_FANOUT_MAX_SUBSCRIBERS)
+        .values_list('writer_id', flat=True)
+    )
+    PullWriter.objects.bulk_create([PullWriter(writer_id=writer_id) for writer_id in pull_writer_ids],
+                                   ignore_conflicts=True)
+
+    subscriber_ids = Subscription.objects.order_by('subscriber_id').values_list('subscriber_id', flat=True).distinct()
+    last_id = 0
+    while True:
+        chunk = list(subscriber_ids.filter(subscriber_id__gt=last_id)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        insert_select_ignore('subscription_timelineentry', ['subscriber_id', 'posting_id', 'writer_id'],
+                             COPY_POSTINGS_QUERY, [last_id, chunk[-1]], using=schema_editor.connection.alias)
+        last_id = chunk[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posting', '0004_auto_20210108_0600'),
+        ('subscription', '0004_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_timeline, migrations.RunPython.noop),
+    ]
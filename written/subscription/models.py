@@ -1,5 +1,9 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import connection, models
+from django.utils import timezone
+
+from posting.models import Posting
+from written.upsert import insert_select_ignore
 
 
 class Subscription(models.Model):
@@ -11,3 +15,57 @@ class Subscription(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['subscriber', 'writer'], name='unique_subscription')
         ]
+        indexes = [
+            # GET /users/subscribed/ and /users/subscriber/ page by subscription id
+            models.Index(fields=['subscriber', 'id'], name='subscription_subscriber_id'),
+            models.Index(fields=['writer', 'id'], name='subscription_writer_id'),
+        ]
+
+    # One statement each, safe against double taps. False when nothing changed:
+    # the subscription was already there / not there, or add() found no writer.
+
+    @classmethod
+    def add(cls, subscriber_id, writer_id):
+        created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        return insert_select_ignore(
+            cls._meta.db_table, ['subscriber_id', 'writer_id', 'created_at'],
+            f'SELECT %s, id, %s FROM {User._meta.db_table} WHERE id = %s',
+            [subscriber_id, created_at, writer_id],
+        ) == 1
+
+    @classmethod
+    def remove(cls, subscriber_id, writer_id):
+        deleted, _ = cls.objects.filter(subscriber_id=subscriber_id, writer_id=writer_id).delete()
+        return deleted == 1
+
+    # for already validated ids of the bulk endpoints, one statement each
+
+    @classmethod
+    def add_many(cls, subscriber_id, writer_ids):
+        cls.objects.bulk_create([cls(subscriber_id=subscriber_id, writer_id=writer_id) for writer_id in writer_ids],
+                                ignore_conflicts=True)
+
+    @classmethod
+    def remove_many(cls, subscriber_id, writer_ids):
+        cls.objects.filter(subscriber_id=subscriber_id, writer_id__in=writer_ids).delete()
+
+
+class TimelineEntry(models.Model):
+    # fan-out-on-write copy of a public posting for one subscriber, see subscription.timeline
+    subscriber = models.ForeignKey(User, related_name='timeline', on_delete=models.CASCADE)
+    posting = models.ForeignKey(Posting, related_name='timeline_entries', on_delete=models.CASCADE)
+    writer = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            # also the (subscriber_id, posting_id) index GET /postings/subscribed/ range-scans
+            models.UniqueConstraint(fields=['subscriber', 'posting'], name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['subscriber', 'writer'], name='timeline_subscriber_writer'),
+        ]
+
+
+class PullWriter(models.Model):
+    # writer with too many subscribers to fan out to, read with a join instead
+    writer = models.OneToOneField(User, related_name='+', on_delete=models.CASCADE)
@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.db import connection
+
+from subscription.models import PullWriter, Subscription, TimelineEntry
+from user.models import UserProfile
+from written.conditional import bump, generations
+from written.upsert import insert_select_ignore
+
+# Fan-out-on-write for GET /postings/subscribed/.
+#
+# A posting that becomes public is copied into a TimelineEntry row for every
+# subscriber of its writer, so reading the feed is one range scan over
+# (subscriber_id, posting_id). Writers with more than
+# TIMELINE_FANOUT_MAX_SUBSCRIBERS subscribers become PullWriters instead:
+# their postings are not copied and the feed joins them in at read time.
+# Going back to fan-out copies the writer's postings into every subscriber's
+# timeline, so it is left to `manage.py rebuild_timeline`: until then a writer
+# who lost subscribers is still joined in. A new subscription copies only the
+# newest TIMELINE_FOLLOW_BACKFILL postings of the writers followed; older ones
+# reach the timeline with the next rebuild.
+
+# entries a timeline already holds are skipped by its unique (subscriber, posting) constraint
+COPY_POSTINGS_QUERY = '''
+    SELECT subscription.subscriber_id, posting.id, posting.writer_id
+    FROM subscription_subscription AS subscription
+    INNER JOIN posting_posting AS posting ON posting.writer_id = subscription.writer_id
+    WHERE posting.is_public = 1 AND {condition}
+'''
+
+
+def copy_postings(condition, params, limit=None):
+    # the newest `limit` postings matched when one is given
+    select = COPY_POSTINGS_QUERY.format(condition=condition)
+    if limit is not None:
+        select += ' ORDER BY posting.id DESC LIMIT %s'
+        params = params + [limit]
+    insert_select_ignore(TimelineEntry._meta.db_table, ['subscriber_id', 'posting_id', 'writer_id'], select, params)
+
+
+def is_pull_writer(writer_id):
+    return PullWriter.objects.filter(writer_id=writer_id).exists()
+
+
+def publish(posting):
+    # a posting became public: copy it to the writer's subscribers
+    if is_pull_writer(posting.writer_id):
+        return
+    copy_postings('posting.id = %s', [posting.id])
+
+
+def retract(posting):
+    # a posting became private
+    TimelineEntry.objects.filter(posting_id=posting.id).delete()
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def subscriber_counts(writer_ids):
+    # kept on the profiles by subscription.hooks, counted before the timeline is touched
+    return dict(
+        UserProfile.objects.filter(user_id__in=writer_ids).values_list('user_id', 'subscribers_count')
+    )
+
+
+def follow(subscriber_id, *writer_ids):
+    # new subscriptions: backfill the writers' public postings
+    counts = subscriber_counts(writer_ids)
+    crowded = [writer_id for writer_id in writer_ids
+               if counts.get(writer_id, 0) > settings.TIMELINE_FANOUT_MAX_SUBSCRIBERS]
+    if crowded:
+        PullWriter.objects.bulk_create([PullWriter(writer_id=writer_id) for writer_id in crowded], ignore_conflicts=True)
+    pull_writers = set(PullWriter.objects.filter(writer_id__in=writer_ids).values_list('writer_id', flat=True))
+    fanned_out = [writer_id for writer_id in writer_ids if writer_id not in pull_writers]
+    if fanned_out:
+        copy_postings(f'subscription.subscriber_id = %s AND subscription.writer_id IN ({placeholders(fanned_out)})',
+                      [subscriber_id] + fanned_out, limit=settings.TIMELINE_FOLLOW_BACKFILL)
+
+
+def unfollow(subscriber_id, *writer_ids):
+    # pull writers among them stay so until `manage.py rebuild_timeline`, see demote()
+    TimelineEntry.objects.filter(subscriber_id=subscriber_id, writer_id__in=writer_ids).delete()
+
+
+def demote(writer_id):
+    # a pull writer goes back to fan-out: copy its postings to all its subscribers
+    PullWriter.objects.filter(writer_id=writer_id).delete()
+    copy_postings('subscription.writer_id = %s', [writer_id])
+
+
+def pull_writer_ids(subscriber_id):
+    # writers the subscriber follows whose postings are not in the timeline table
+    return list(
+        Subscription.objects.filter(
+            subscriber_id=subscriber_id,
+            writer_id__in=PullWriter.objects.values('writer_id'),
+        ).values_list('writer_id', flat=True)
+    )
+
+
+# What the newest posting id of a feed cannot tell: edits and removals of postings
+# anywhere, and a subscriber's own follows and unfollows.
+FEED_GENERATION_KEY = 'timeline:generation'
+
+
+def subscriber_generation_key(subscriber_id):
+    return f'timeline:generation:{subscriber_id}'
+
+
+def changed(*subscriber_ids):
+    # every feed when called without subscribers
+    bump(*[subscriber_generation_key(subscriber_id) for subscriber_id in subscriber_ids] or [FEED_GENERATION_KEY])
+
+
+def feed_version(subscriber_id, pull_writer_ids):
+    # (newest posting id, generations) of the subscriber's feed, in one query
+    newest = ['(SELECT MAX(posting_id) FROM subscription_timelineentry WHERE subscriber_id = %s)']
+    params = [subscriber_id]
+    if pull_writer_ids:
+        newest.append(f'(SELECT MAX(id) FROM posting_posting '
+                      f'WHERE writer_id IN ({placeholders(pull_writer_ids)}) AND is_public = 1)')
+        params += pull_writer_ids
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(newest), params)
+        newest_id = max((posting_id for posting_id in cursor.fetchone() if posting_id is not None), default=None)
+    return newest_id, generations(FEED_GENERATION_KEY, subscriber_generation_key(subscriber_id))
+
+
+def rebuild(subscriber_id):
+    # recompute one subscriber's timeline from subscriptions and postings
+    TimelineEntry.objects.filter(subscriber_id=subscriber_id).delete()
+    copy_postings(
+        'subscription.subscriber_id = %s AND subscription.writer_id NOT IN (SELECT writer_id FROM subscription_pullwriter)',
+        [subscriber_id],
+    )
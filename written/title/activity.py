@@ -0,0 +1,156 @@
+import heapq
+import threading
+import time as clock
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from title import cache
+from title.models import TitleActivity
+from written.upsert import insert_select_add
+
+# Hourly rollup of what happens under each title, for GET /titles/?order=popular.
+# Every publication or scrap adds one to its title's bucket for the current hour and
+# taking one back subtracts it there, so a window sums what a title gained within it.
+# Scraps that go with a posting made private or deleted are taken back the same way.
+# Each process keeps the windows it merged for TITLE_ACTIVITY_WINDOW_TIMEOUT seconds, its own
+# changes drop them at once. Buckets older than the longest window are dropped by the first
+# publication of every hour in each process; `manage.py rebuild_title_activity` rebuilds
+# them from creation times, or with --prune only drops the old ones.
+
+WINDOWS = {
+    'day': timezone.timedelta(days=1),
+    'week': timezone.timedelta(weeks=1),
+    'month': timezone.timedelta(days=30),
+}
+# time=all ranks over the longest window kept
+KEPT = WINDOWS['month']
+
+COLUMNS = ['title_id', 'hour', 'postings', 'scraps']
+
+
+def current_hour():
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+def hour_param():
+    return connection.ops.adapt_datetimefield_value(current_hour())
+
+
+def published(title_id, delta=1):
+    # a posting of the title became public (delta=1) or stopped being public (delta=-1)
+    insert_select_add(
+        TitleActivity._meta.db_table, COLUMNS[:2], COLUMNS[2:],
+        'SELECT id, %s, %s, 0 FROM title_title WHERE id = %s',
+        [hour_param(), delta, title_id],
+    )
+    windows.changed()
+    if delta > 0:
+        windows.prune_hourly()
+
+
+def scrapped(posting_ids, delta=1):
+    # the postings were scrapped (delta=1) or unscrapped (delta=-1), counted per title
+    if not posting_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(posting_ids))
+    insert_select_add(
+        TitleActivity._meta.db_table, COLUMNS[:2], COLUMNS[2:],
+        f'SELECT title_id, %s, 0, COUNT(*) * %s FROM posting_posting WHERE id IN ({placeholders}) GROUP BY title_id',
+        [hour_param(), delta] + list(posting_ids),
+    )
+    windows.changed()
+    # a scrap moves no count, so nothing else drops the cached lists (see title.cache)
+    cache.changed()
+
+
+def scraps_removed(title_id, count):
+    # `count` scraps of the title's postings went with a posting made private or deleted
+    if not count:
+        return
+    insert_select_add(
+        TitleActivity._meta.db_table, COLUMNS[:2], COLUMNS[2:],
+        'SELECT id, %s, 0, %s FROM title_title WHERE id = %s',
+        [hour_param(), -count, title_id],
+    )
+    windows.changed()
+    cache.changed()
+
+
+def prune():
+    # drops the buckets no window reaches any more, returns how many
+    deleted, _ = TitleActivity.objects.filter(hour__lte=current_hour() - KEPT).delete()
+    return deleted
+
+
+def read_window(time):
+    # {title_id: activity} over the window, merged from its buckets
+    since = current_hour() - WINDOWS.get(time, KEPT)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT title_id, postings, scraps FROM title_titleactivity WHERE hour > %s',
+            [connection.ops.adapt_datetimefield_value(since)],
+        )
+        activity = Counter()
+        for title_id, postings, scraps in cursor.fetchall():
+            activity[title_id] += postings + scraps
+    return activity
+
+
+class Windows:
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.merged = {}
+        # moved by every change, so a window merged across one is not kept
+        self.version = 0
+        self.pruned_hour = None
+        self.lock = threading.Lock()
+
+    def get(self, time):
+        with self.lock:
+            entry = self.merged.get(time)
+            version = self.version
+        if entry is not None and clock.monotonic() - entry[0] < self.timeout:
+            return entry[1]
+        # merged outside the lock, callers only read the counter
+        activity = read_window(time)
+        with self.lock:
+            if version == self.version:
+                self.merged[time] = (clock.monotonic(), activity)
+        return activity
+
+    def changed(self):
+        with self.lock:
+            self.merged = {}
+            self.version += 1
+
+    def prune_hourly(self):
+        hour = current_hour()
+        with self.lock:
+            if self.pruned_hour == hour:
+                return
+            self.pruned_hour = hour
+        prune()
+
+    def clear(self):
+        with self.lock:
+            self.merged = {}
+            self.version += 1
+            self.pruned_hour = None
+
+
+windows = Windows(settings.TITLE_ACTIVITY_WINDOW_TIMEOUT)
+
+
+def activity_in(time):
+    return windows.get(time)
+
+
+def top(activity, k, after=None):
+    # the k most active (activity, title_id) pairs ranked after `after`, busiest first
+    candidates = ((count, title_id) for title_id, count in activity.items() if count > 0)
+    if after is not None:
+        candidates = (candidate for candidate in candidates if candidate < tuple(after))
+    return heapq.nlargest(k, candidates)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from title.models import Title
+from title.models import DailyTitle, Title
 
 # Register your models here.
-admin.site.register(Title)
\ No newline at end of file
+admin.site.register(Title)
+admin.site.register(DailyTitle)
\ No newline at end of file
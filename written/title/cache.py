@@ -0,0 +1,101 @@
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from written.conditional import bump, generations, is_fresh, not_modified, opaque
+
+# Shared cache of the title browsing responses. GET /titles/ and GET /titles/{title_id}/postings/
+# show only titles and public postings, nothing in them depends on who asks, so one cached
+# response serves every caller the permissions let through (they still run first).
+# Entries are keyed on the query parameters the view reads, normalized, and on generations
+# (see written.conditional) bumped wherever a title or its postings change (see title.counters),
+# so a write is seen at once and the TTL only bounds what no write records (time=day/week/month).
+
+LIST_GENERATION_KEY = 'title:list:generation'
+
+
+def postings_generation_key(title_id):
+    return f'title:{title_id}:postings:generation'
+
+
+def changed(*title_ids):
+    # every list page counts postings, only the given titles' feeds change
+    bump(LIST_GENERATION_KEY, *[postings_generation_key(title_id) for title_id in title_ids])
+
+
+def list_params(request, kwargs):
+    # the defaults TitleViewSet.list() applies, so /titles/ and /titles/?order=recent share an entry
+    params = request.query_params
+    return (
+        params.get('time', 'all'),
+        (params.get('only_official') or '').lower(),
+        params.get('query', ''),
+        params.get('order', 'recent'),
+        params.get('cursor'),
+        params.get('page_size'),
+    )
+
+
+def list_generations(kwargs):
+    return (LIST_GENERATION_KEY, )
+
+
+def postings_params(request, kwargs):
+    params = request.query_params
+    return (str(kwargs.get('pk')), params.get('cursor'), params.get('page_size'), params.get('fields'))
+
+
+def postings_generations(kwargs):
+    return (postings_generation_key(kwargs.get('pk')), )
+
+
+def response_key(name, params, generation):
+    # query strings are user input: hashed into a key any backend takes
+    digest = hashlib.sha1(repr((params, generation)).encode()).hexdigest()
+    return f'title:response:{name}:{digest}'
+
+
+def shared_response(name, timeout_setting, key_params, generation_keys):
+    # caches the 200 responses of a viewset action, with their ETag; off while the setting is 0
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            timeout = getattr(settings, timeout_setting)
+            if not timeout:
+                return handler(self, request, *args, **kwargs)
+
+            key = response_key(name, key_params(request, kwargs), generations(*generation_keys(kwargs)))
+            entry = cache.get(key)
+            if entry is not None:
+                data, tag = entry
+                if tag and is_fresh(request, tag):
+                    return not_modified(tag)
+                return Response(data, headers={'ETag': tag} if tag else None)
+
+            response = handler(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, (response.data, response.get('ETag')), timeout)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+# First pages of title feeds kept under their ETag (see TitleViewSet.public_postings_response).
+# The ETag is read from the title row, so unlike the responses above they are safe on any cache.
+
+def first_page_key(tag):
+    return f'title:first_page:{opaque(tag)}'
+
+
+def get_first_page(tag):
+    return cache.get(first_page_key(tag))
+
+
+def set_first_page(tag, data, timeout):
+    cache.set(first_page_key(tag), data, timeout)
@@ -0,0 +1,44 @@
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from title import cache
+from title.models import Title
+
+
+def count_postings_by_title(title_ids):
+    # Return {title_id: (public postings, all postings)} for the given titles
+    if not title_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(title_ids))
+    raw_query = f'''
+        SELECT title_id, SUM(CASE WHEN is_public THEN 1 ELSE 0 END), COUNT(*)
+        FROM posting_posting
+        WHERE title_id IN ({placeholders})
+        GROUP BY title_id
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(raw_query, title_ids)
+        return {
+            title_id: (int(count_public), count_all)
+            for title_id, count_public, count_all in cursor.fetchall()
+        }
+
+
+def adjust_postings_count(title_id, all_delta=0, public_delta=0):
+    # single UPDATE with F expressions, so concurrent writers never lose an increment;
+    # it moves updated_at even without a delta, any change to the postings is one of the title
+    changes = {'updated_at': timezone.now()}
+    if all_delta:
+        changes['all_postings_count'] = F('all_postings_count') + all_delta
+    if public_delta:
+        changes['public_postings_count'] = F('public_postings_count') + public_delta
+    Title.objects.filter(pk=title_id).update(**changes)
+    cache.changed(title_id)
+
+
+def touch_titles(title_ids):
+    # for changes to postings of the titles that touch no count
+    if title_ids:
+        Title.objects.filter(pk__in=title_ids).update(updated_at=timezone.now())
+        cache.changed(*title_ids)
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+from posting.models import Posting
+from scrap.models import Scrap
+from title.activity import KEPT, current_hour, prune, windows
+from title.models import TitleActivity
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly TitleActivity buckets of the longest window from posting and scrap creation times'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true',
+                            help='only drop the buckets older than the longest window')
+
+    def handle(self, *args, **options):
+        since = current_hour() - KEPT
+        if options['prune']:
+            self.stdout.write(f'pruned {prune()} buckets')
+            return
+
+        # rebuilt, public postings count in the hour they were written rather than published
+        buckets = {}
+        postings = (Posting.objects.filter(is_public=True, created_at__gt=since)
+                    .annotate(hour=TruncHour('created_at')).values('title_id', 'hour').annotate(count=Count('id')))
+        for row in postings:
+            buckets.setdefault((row['title_id'], row['hour']), [0, 0])[0] += row['count']
+        scraps = (Scrap.objects.filter(posting__is_public=True, created_at__gt=since)
+                  .annotate(hour=TruncHour('created_at')).values('posting__title_id', 'hour')
+                  .annotate(count=Count('id')))
+        for row in scraps:
+            buckets.setdefault((row['posting__title_id'], row['hour']), [0, 0])[1] += row['count']
+
+        with transaction.atomic():
+            TitleActivity.objects.all().delete()
+            TitleActivity.objects.bulk_create(
+                [TitleActivity(title_id=title_id, hour=hour, postings=counts[0], scraps=counts[1])
+                 for (title_id, hour), counts in buckets.items()],
+                batch_size=1000)
+        windows.changed()
+        self.stdout.write(f'rebuilt {len(buckets)} buckets')
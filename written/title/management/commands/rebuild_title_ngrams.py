@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from title.models import Title, TitleNgram
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the TitleNgram search index from title names'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='number of titles reindexed per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        indexed = 0
+        while True:
+            titles = list(Title.objects.filter(id__gt=last_id).order_by('id').only('id', 'name')[:chunk_size])
+            if not titles:
+                break
+            with transaction.atomic():
+                TitleNgram.index_titles(titles)
+            indexed += len(titles)
+            last_id = titles[-1].id
+
+        self.stdout.write(f'indexed {indexed} titles')
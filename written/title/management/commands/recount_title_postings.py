@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from title.counters import count_postings_by_title
+from title.models import Title
+
+
+class Command(BaseCommand):
+    help = 'Recompute Title.public_postings_count / all_postings_count from posting_posting'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='number of titles recounted per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        checked = 0
+        repaired = 0
+        while True:
+            # walk titles by primary key so every chunk is an index range scan
+            with transaction.atomic():
+                titles = list(
+                    Title.objects.select_for_update()
+                    .filter(id__gt=last_id)
+                    .order_by('id')
+                    .values_list('id', 'public_postings_count', 'all_postings_count')[:chunk_size]
+                )
+                if not titles:
+                    break
+                counts = count_postings_by_title([title[0] for title in titles])
+                for title_id, count_public, count_all in titles:
+                    actual = counts.get(title_id, (0, 0))
+                    if actual != (count_public, count_all):
+                        Title.objects.filter(pk=title_id).update(
+                            public_postings_count=actual[0],
+                            all_postings_count=actual[1],
+                        )
+                        repaired += 1
+            checked += len(titles)
+            last_id = titles[-1][0]
+
+        self.stdout.write(f'checked {checked} titles, repaired {repaired}')
@@ -0,0 +1,40 @@
+# Generated by Django 3.1 on 2021-01-10 09:12
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_postings_count(apps, schema_editor):
+    Title = apps.get_model('title', 'Title')
+    Posting = apps.get_model('posting', 'Posting')
+    counts = Posting.objects.values('title_id').annotate(
+        count_all=Count('id'),
+        count_public=Count('id', filter=Q(is_public=True)),
+    )
+    for row in counts.iterator():
+        Title.objects.filter(pk=row['title_id']).update(
+            all_postings_count=row['count_all'],
+            public_postings_count=row['count_public'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0001_initial'),
+        ('posting', '0004_auto_20210108_0600'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='all_postings_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='public_postings_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_postings_count, migrations.RunPython.noop),
+    ]
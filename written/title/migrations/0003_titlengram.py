@@ -0,0 +1,39 @@
+# Generated by Django 3.1 on 2021-01-10 10:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from title.search import name_grams
+
+
+def index_titles(apps, schema_editor):
+    Title = apps.get_model('title', 'Title')
+    TitleNgram = apps.get_model('title', 'TitleNgram')
+    for title in Title.objects.only('id', 'name').iterator():
+        TitleNgram.objects.bulk_create(
+            [TitleNgram(title_id=title.id, gram=gram) for gram in name_grams(title.name)],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0002_title_postings_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleNgram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=2)),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ngrams', to='title.title')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='titlengram',
+            constraint=models.UniqueConstraint(fields=('gram', 'title'), name='unique_title_ngram'),
+        ),
+        migrations.RunPython(index_titles, migrations.RunPython.noop),
+    ]
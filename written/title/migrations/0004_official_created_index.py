@@ -0,0 +1,17 @@
+# Generated by Django 3.1 on 2021-01-24 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0003_titlengram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['is_official', 'created_at', 'id'], name='title_official_created_id'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.1 on 2021-01-25 11:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0004_official_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTitle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='days', to='title.title')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.1 on 2021-01-28 16:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0005_dailytitle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('postings', models.IntegerField(default=0)),
+                ('scraps', models.IntegerField(default=0)),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='title.title')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='titleactivity',
+            index=models.Index(fields=['hour', 'title'], name='title_activity_hour_title'),
+        ),
+        migrations.AddConstraint(
+            model_name='titleactivity',
+            constraint=models.UniqueConstraint(fields=('title', 'hour'), name='unique_title_activity'),
+        ),
+    ]
@@ -1,9 +1,85 @@
 from django.contrib.auth.models import User
 from django.db import models
 
+from title.search import name_grams
+
 class Title(models.Model):
     name = models.CharField(max_length=100, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
-    updated_at = models.DateTimeField(auto_now=True)    
+    # also moved by posting.hooks whenever the title's postings change, it validates their feed
+    updated_at = models.DateTimeField(auto_now=True)
     is_official = models.BooleanField(default=True, db_index=True)
-    
\ No newline at end of file
+    # maintained by posting.hooks, repaired by `manage.py recount_title_postings`
+    public_postings_count = models.PositiveIntegerField(default=0)
+    all_postings_count = models.PositiveIntegerField(default=0)
+
+    COUNTERS = ('public_postings_count', 'all_postings_count')
+
+    class Meta:
+        indexes = [
+            # GET /titles/?only_official=true&time=... in created_at order
+            models.Index(fields=['is_official', 'created_at', 'id'], name='title_official_created_id'),
+        ]
+
+    _indexed_name = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        title = super().from_db(db, field_names, values)
+        title._indexed_name = title.__dict__.get('name')
+        return title
+
+    def save(self, *args, **kwargs):
+        # A loaded title saved whole (a rename in the admin) leaves the counters alone:
+        # posting.hooks may have moved them since it was read.
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.COUNTERS]
+        super().save(*args, **kwargs)
+        if self.name != self._indexed_name:
+            TitleNgram.index_titles([self])
+            self._indexed_name = self.name
+
+
+class DailyTitle(models.Model):
+    # the title GET /titles/today/ shows on `date` (see title.schedule)
+    date = models.DateField(unique=True)
+    title = models.ForeignKey(Title, related_name='days', on_delete=models.CASCADE)
+
+
+class TitleActivity(models.Model):
+    # public postings and scraps gained (less those taken back) by a title in an hour,
+    # for GET /titles/?order=popular (see title.activity)
+    title = models.ForeignKey(Title, related_name='activity', on_delete=models.CASCADE)
+    hour = models.DateTimeField()
+    postings = models.IntegerField(default=0)
+    scraps = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['title', 'hour'], name='unique_title_activity')
+        ]
+        indexes = [
+            # the buckets of a window, read whole
+            models.Index(fields=['hour', 'title'], name='title_activity_hour_title'),
+        ]
+
+
+class TitleNgram(models.Model):
+    # search index for Title.name, see title.search
+    title = models.ForeignKey(Title, related_name='ngrams', on_delete=models.CASCADE)
+    gram = models.CharField(max_length=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['gram', 'title'], name='unique_title_ngram')
+        ]
+
+    @classmethod
+    def index_titles(cls, titles):
+        # (re)build the grams of the given saved titles
+        cls.objects.filter(title__in=[title.id for title in titles]).delete()
+        cls.objects.bulk_create(
+            [cls(title_id=title.id, gram=gram) for title in titles for gram in name_grams(title.name)],
+            ignore_conflicts=True,
+        )
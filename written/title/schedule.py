@@ -0,0 +1,55 @@
+import threading
+
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from title.models import DailyTitle, Title
+
+# GET /titles/today/ shows the title DailyTitle schedules for the day, '첫 눈' on days
+# without one. The day's title id is resolved once per process and held in memory;
+# schedule changes made through the ORM drop it here, other workers pick them up the next day.
+
+FALLBACK_TITLE = '첫 눈'
+
+
+class TodayTitle:
+    def __init__(self):
+        self.resolved = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        # today's Title, read fresh: its updated_at validates the feed. None when there is none
+        today = timezone.localdate()
+        with self.lock:
+            resolved = self.resolved
+        if resolved is not None and resolved[0] == today:
+            title = Title.objects.filter(pk=resolved[1]).first()
+            if title is not None:
+                return title
+
+        title = self.lookup(today)
+        if title is not None:
+            with self.lock:
+                self.resolved = (today, title.id)
+        return title
+
+    def lookup(self, date):
+        scheduled = DailyTitle.objects.select_related('title').filter(date=date).first()
+        if scheduled is not None:
+            return scheduled.title
+        return Title.objects.filter(name=FALLBACK_TITLE).order_by('id').first()
+
+    def clear(self):
+        with self.lock:
+            self.resolved = None
+
+
+today_title = TodayTitle()
+
+
+def schedule_changed(sender, **kwargs):
+    today_title.clear()
+
+
+post_save.connect(schedule_changed, sender=DailyTitle, dispatch_uid='today_title_scheduled')
+post_delete.connect(schedule_changed, sender=DailyTitle, dispatch_uid='today_title_unscheduled')
@@ -0,0 +1,46 @@
+# Substring search over Title.name through the TitleNgram table.
+#
+# Every character of a (lowercased) name starts exactly one indexed gram: the
+# 2-gram beginning at it, or the character alone when it is the last one.
+# A query of two or more characters then needs titles holding all of its
+# 2-grams, and a single character is a prefix range scan over the grams.
+
+GRAM_SIZE = 2
+LIKE_ESCAPE = '!'
+
+
+def normalize(text):
+    return text.lower()
+
+
+def name_grams(name):
+    name = normalize(name)
+    grams = {name[i:i + GRAM_SIZE] for i in range(len(name) - GRAM_SIZE + 1)}
+    if name:
+        grams.add(name[-1])
+    return grams
+
+
+def escape_like(text):
+    for char in (LIKE_ESCAPE, '%', '_'):
+        text = text.replace(char, LIKE_ESCAPE + char)
+    return text
+
+
+def search_condition(query):
+    # Return (sql, params) restricting title_title rows to names containing query
+    query = normalize(query)
+    if len(query) < GRAM_SIZE:
+        sql = f'''id IN (
+            SELECT title_id FROM title_titlengram WHERE gram LIKE %s ESCAPE '{LIKE_ESCAPE}'
+        )'''
+        return sql, [escape_like(query) + '%']
+
+    grams = sorted({query[i:i + GRAM_SIZE] for i in range(len(query) - GRAM_SIZE + 1)})
+    placeholders = ', '.join(['%s'] * len(grams))
+    # grams only prove the pieces are there, LIKE on the few candidates checks they are contiguous
+    sql = f'''id IN (
+            SELECT title_id FROM title_titlengram WHERE gram IN ({placeholders})
+            GROUP BY title_id HAVING COUNT(*) = %s
+        ) AND name LIKE %s ESCAPE '{LIKE_ESCAPE}\''''
+    return sql, grams + [len(grams), '%' + escape_like(query) + '%']
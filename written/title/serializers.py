@@ -32,15 +32,15 @@ class TitleSerializer(serializers.ModelSerializer):
         return data
 
     def get_postings(self, title):            
-        postings = title.postings.filter(is_public=True)
+        postings = title.postings.filter(is_public=True).select_related('title', 'writer__userprofile')
         return PostingRetrieveSerializer(postings, many=True).data
 
 
 class TitleSmallSerializer(serializers.ModelSerializer):
     name = serializers.CharField()
     # is_official = serializers.BooleanField(default=False)
-    count_public_postings = serializers.SerializerMethodField()
-    count_all_postings = serializers.SerializerMethodField()
+    count_public_postings = serializers.IntegerField(source='public_postings_count', read_only=True)
+    count_all_postings = serializers.IntegerField(source='all_postings_count', read_only=True)
     class Meta:
         model = Title
         fields = (
@@ -59,13 +59,3 @@ class TitleSmallSerializer(serializers.ModelSerializer):
             if Title.objects.filter(name=name):
                 raise TitleNameIsDuplicateException()
         return data
-
-    def get_count_public_postings(self, title):
-        if type(title) == dict:
-            title = Title.objects.get(pk=title['id'])            
-        return title.postings.filter(is_public=True).count()
-
-    def get_count_all_postings(self, title):
-        if type(title) == dict:
-            title = Title.objects.get(pk=title['id'])
-        return title.postings.count()
@@ -1,14 +1,23 @@
+import re
 from django.contrib.auth.models import User
-from django.test import Client, TestCase
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 import json
 from unittest.mock import patch
 from user.token import mocked_check_token
 from user.models import UserProfile
-from title.models import Title
+from title.models import DailyTitle, Title, TitleActivity, TitleNgram
+from title import activity
+from title.activity import current_hour
 from title.views import TitleViewSet
 from posting.models import Posting
+from written.queries import QueryBudgetMixin
 
 class PostTitleTestCase(TestCase):
     client = Client()
@@ -120,8 +129,8 @@ class GetTitleTestCase(TestCase):
         data = response.json()
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(data['titles']), TitleViewSet.TITLES_PAGE_SIZE_DEFAULT)
-        self.assertEqual(data['cursor'], cursor-4)
-        self.assertEqual(has_next, True)
+        self.assertEqual(data['titles'][0]['id'], last_title.id - 4)
+        self.assertEqual(data['has_next'], True)
 
         page_size = 5
         response = self.client.get(
@@ -132,7 +141,7 @@ class GetTitleTestCase(TestCase):
         data = response.json()
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(data['titles']), 5)
-        self.assertEqual(data['cursor'], cursor-5)
+        self.assertEqual(data['titles'][-1]['id'], last_title.id - 8)
 
         response = self.client.get(
             '/titles/?order=oldest',
@@ -145,6 +154,15 @@ class GetTitleTestCase(TestCase):
         first_title = Title.objects.first()
         self.assertEqual(data['titles'][0]['id'], first_title.id)
 
+        response = self.client.get(
+            f'/titles/?order=oldest&cursor={data["cursor"]}',
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        data = response.json()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['titles'][0]['id'], first_title.id + 4)
+
     def test_invalid_get_titles(self):
         response = self.client.get(
             f'/titles/?time=invalid',
@@ -235,6 +253,68 @@ class GetTitleTodayTestCase(TestCase):
             HTTP_AUTHORIZATION=self.token
         )
         self.assertNotEqual(response.status_code, status.HTTP_200_OK)
+
+    def post_public(self, title, content):
+        response = self.client.post(
+            '/postings/',
+            json.dumps({
+                "title": title,
+                "content": content,
+                "alignment": "LEFT",
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.put(
+            f'/postings/{response.json()["id"]}/',
+            json.dumps({"is_public": True}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def get_today(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/titles/today/', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json(), [query['sql'] for query in queries.captured_queries]
+
+    def test_scheduled_title(self):
+        self.post_public("title3", "scheduled")
+        DailyTitle.objects.create(date=timezone.localdate(), title=Title.objects.get(name="title3"))
+        # a day in the past does not count
+        DailyTitle.objects.create(date=timezone.localdate() - timezone.timedelta(days=1),
+                                  title=Title.objects.get(name="title4"))
+
+        data, _ = self.get_today()
+        self.assertEqual(data['title'], 'title3')
+        self.assertEqual([posting['content'] for posting in data['postings']], ['scheduled'])
+
+        # rescheduling drops the resolved title
+        DailyTitle.objects.filter(date=timezone.localdate()).update(title=Title.objects.get(name="title5"))
+        DailyTitle.objects.get(date=timezone.localdate()).save()
+        data, _ = self.get_today()
+        self.assertEqual(data['title'], 'title5')
+
+    def test_first_page_kept_until_a_new_posting(self):
+        self.post_public("첫 눈", "first")
+        data, _ = self.get_today()
+        self.assertEqual([posting['content'] for posting in data['postings']], ['first'])
+
+        # resolved for the day and the page cached: only the title row is read, for its ETag
+        cached, queries = self.get_today()
+        self.assertEqual(cached, data)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('title_dailytitle', queries[0])
+
+        self.post_public("첫 눈", "second")
+        data, _ = self.get_today()
+        self.assertEqual([posting['content'] for posting in data['postings']], ['second', 'first'])
+
+        # other pages are not kept
+        response = self.client.get('/titles/today/', {'page_size': 1}, HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.json()['has_next'], True)
         
 class GetTitlePostingsTestCase(TestCase):
     client = Client()
@@ -308,7 +388,7 @@ class GetTitlePostingsTestCase(TestCase):
 
         last_posting_id = Posting.objects.last().id
         self.assertEqual(data['postings'][0]['id'], last_posting_id)
-        self.assertLess(data['cursor'], last_posting_id)
+        last_id_of_page = data['postings'][-1]['id']
         cursor = data['cursor']
 
         response = self.client.get(
@@ -323,7 +403,28 @@ class GetTitlePostingsTestCase(TestCase):
 
         last_posting_id = Posting.objects.last().id
         self.assertNotEqual(data['postings'][0]['id'], last_posting_id)
-        self.assertLess(data['cursor'], cursor)
+        self.assertLess(data['postings'][0]['id'], last_id_of_page)
+        self.assertNotEqual(data['cursor'], cursor)
+
+    def test_title_postings_etag(self):
+        path = f'/titles/{Title.objects.get(name="title1").id}/postings/'
+        response = self.client.get(path, HTTP_AUTHORIZATION=self.token)
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, HTTP_AUTHORIZATION=self.token, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # the title, not its postings
+        self.assertEqual(len(queries.captured_queries), 1)
+
+        # an edit moves the title's updated_at with it
+        response = self.client.put(f'/postings/{Posting.objects.last().id}/', json.dumps({"content": "changed"}),
+                                   content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(path, HTTP_AUTHORIZATION=self.token, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['postings'][0]['content'], 'changed')
+        self.assertNotEqual(response['ETag'], etag)
 
     def test_invalid_title_postings(self):
         title1_id = Title.objects.last().id
@@ -336,4 +437,500 @@ class GetTitlePostingsTestCase(TestCase):
         )
         data = response.json()
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(data['errorcode'], 20002)
\ No newline at end of file
+        self.assertEqual(data['errorcode'], 20002)
+
+class GetTitleCountsTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        response = self.client.post(
+            '/users/',
+            json.dumps({
+                "facebookid": "1",
+                "access_token": "1",
+                "nickname": "1",
+            }),
+            content_type='application/json'
+        )
+        data = response.json()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = "Token " + data["access_token"]
+
+        for i in range(10):
+            Title.objects.create(name="title" + str(i))
+
+        for i in range(3):
+            response = self.client.post(
+                '/postings/',
+                json.dumps({
+                    "title": "title9",
+                    "content": "This is content " + str(i),
+                    "alignment": "LEFT",
+                }),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.token
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        posting_id = response.json()['id']
+        response = self.client.put(
+            f'/postings/{posting_id}/',
+            json.dumps({
+                "is_public": True
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_valid_get_titles_counts(self):
+        response = self.client.get('/titles/?page_size=10')
+        data = response.json()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = {title['name']: title for title in data['titles']}
+        self.assertEqual(titles['title9']['count_public_postings'], 1)
+        self.assertEqual(titles['title9']['count_all_postings'], 3)
+        self.assertEqual(titles['title0']['count_public_postings'], 0)
+        self.assertEqual(titles['title0']['count_all_postings'], 0)
+
+    def test_get_titles_query_count_is_flat(self):
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get('/titles/?page_size=2')
+        with CaptureQueriesContext(connection) as large_page:
+            self.client.get('/titles/?page_size=10')
+        self.assertEqual(len(small_page.captured_queries), len(large_page.captured_queries))
+
+    def test_counts_follow_private_and_delete(self):
+        posting = Posting.objects.filter(is_public=True).last()
+        response = self.client.put(
+            f'/postings/{posting.id}/',
+            json.dumps({
+                "is_public": False
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        title = Title.objects.get(name='title9')
+        self.assertEqual(title.public_postings_count, 0)
+        self.assertEqual(title.all_postings_count, 3)
+
+        response = self.client.delete(
+            f'/postings/{posting.id}/',
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        title.refresh_from_db()
+        self.assertEqual(title.public_postings_count, 0)
+        self.assertEqual(title.all_postings_count, 2)
+
+    def test_rename_keeps_counts(self):
+        title = Title.objects.get(name='title9')
+        Posting.objects.filter(is_public=True).delete()
+        Title.objects.filter(id=title.id).update(public_postings_count=0, all_postings_count=2)
+        title.name = 'renamed'
+        title.save()
+        title.refresh_from_db()
+        self.assertEqual(title.name, 'renamed')
+        self.assertEqual(title.public_postings_count, 0)
+        self.assertEqual(title.all_postings_count, 2)
+
+    def test_recount_title_postings(self):
+        Title.objects.update(public_postings_count=7, all_postings_count=7)
+        call_command('recount_title_postings', chunk_size=3, stdout=StringIO())
+        title = Title.objects.get(name='title9')
+        self.assertEqual(title.public_postings_count, 1)
+        self.assertEqual(title.all_postings_count, 3)
+        self.assertFalse(Title.objects.exclude(name='title9').exclude(all_postings_count=0).exists())
+
+
+class SearchTitleTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        for name in ['첫 눈', '눈사람', '첫사랑', 'Snow White', 'wonder', '100%', '눈']:
+            Title.objects.create(name=name)
+
+    def search(self, query, **params):
+        response = self.client.get('/titles/', dict(query=query, page_size=20, **params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(title['name'] for title in response.json()['titles'])
+
+    def test_valid_search_titles(self):
+        self.assertEqual(self.search('첫'), ['첫 눈', '첫사랑'])
+        self.assertEqual(self.search('눈'), ['눈', '눈사람', '첫 눈'])
+        self.assertEqual(self.search('사람'), ['눈사람'])
+        self.assertEqual(self.search('snow'), ['Snow White'])
+        self.assertEqual(self.search('0%'), ['100%'])
+        self.assertEqual(self.search('%'), ['100%'])
+
+    def test_search_checks_contiguous_grams(self):
+        # 'wo' and 'on' are both in 'wonder' but 'won' is not a substring of 'snow white'
+        self.assertEqual(self.search('won'), ['wonder'])
+        self.assertEqual(self.search('now w'), ['Snow White'])
+        self.assertEqual(self.search('nowo'), [])
+
+    def test_search_keeps_filters(self):
+        Title.objects.filter(name='첫사랑').update(is_official=False)
+        self.assertEqual(self.search('첫', only_official='true'), ['첫 눈'])
+
+    def test_search_follows_rename_and_rebuild(self):
+        title = Title.objects.get(name='wonder')
+        title.name = '겨울'
+        title.save()
+        self.assertEqual(self.search('won'), [])
+        self.assertEqual(self.search('겨울'), ['겨울'])
+
+        TitleNgram.objects.all().delete()
+        call_command('rebuild_title_ngrams', chunk_size=2, stdout=StringIO())
+        self.assertEqual(self.search('눈사'), ['눈사람'])
+
+
+class TitlePaginationTestCase(TestCase):
+    client = Client()
+
+    def setUp(self):
+        for i in range(6):
+            Title.objects.create(name="title" + str(i))
+        # same created_at for every title: the id tie-breaker alone keeps pages apart
+        Title.objects.update(created_at=timezone.now())
+
+    def test_pages_with_equal_sort_keys(self):
+        for order in ('recent', 'oldest'):
+            ids = []
+            cursor = None
+            while True:
+                params = {'order': order, 'page_size': 4}
+                if cursor:
+                    params['cursor'] = cursor
+                response = self.client.get('/titles/', params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                data = response.json()
+                ids += [title['id'] for title in data['titles']]
+                cursor = data['cursor']
+                if not data['has_next']:
+                    break
+            expected = sorted(Title.objects.values_list('id', flat=True), reverse=(order == 'recent'))
+            self.assertEqual(ids, expected)
+
+    def test_page_size_ceiling(self):
+        response = self.client.get('/titles/', {'page_size': 100000})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['titles']), 6)
+
+    def test_invalid_pagination(self):
+        response = self.client.get('/titles/', {'cursor': 'not a cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['errorcode'], 50001)
+
+        response = self.client.get('/titles/', {'page_size': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['errorcode'], 50002)
+
+    def test_first_page_without_extra_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/titles/')
+        self.assertEqual(len(queries.captured_queries), 1)
+
+
+class TitleQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        self.tokens = []
+        for i in range(3):
+            response = self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": str(i),
+                    "access_token": str(i),
+                    "nickname": str(i),
+                }),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.tokens.append("Token " + response.json()["access_token"])
+        self.token = self.tokens[0]
+
+        # a full page of public postings by different writers under one title
+        for token in self.tokens:
+            for i in range(2):
+                response = self.client.post(
+                    '/postings/',
+                    json.dumps({
+                        "title": "첫 눈",
+                        "content": "content",
+                        "alignment": "LEFT",
+                    }),
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=token
+                )
+                self.client.put(
+                    f'/postings/{response.json()["id"]}/',
+                    json.dumps({"is_public": True}),
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=token
+                )
+        self.title_id = Title.objects.get(name='첫 눈').id
+        for i in range(6):
+            Title.objects.create(name=f'title{i}')
+
+    def test_read_endpoints(self):
+        response = self.assertQueryBudget(self.client.get, '/titles/', {'page_size': 10})
+        self.assertEqual(len(response.json()['titles']), 7)
+        response = self.assertQueryBudget(self.client.get, '/titles/', {'query': 'title', 'only_official': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertQueryBudget(self.client.get, '/titles/', {'order': 'popular', 'query': '눈'})
+        self.assertEqual(response.json()['titles'][0]['activity'], 6)
+        response = self.assertQueryBudget(self.client.get, '/titles/today/', {'page_size': 10},
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(len(response.json()['postings']), 6)
+        response = self.assertQueryBudget(self.client.get, f'/titles/{self.title_id}/postings/', {'page_size': 10},
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(len(response.json()['postings']), 6)
+        self.assertEqual(response.json()['postings'][0]['writer']['nickname'], '2')
+
+    def test_create_title(self):
+        response = self.assertQueryBudget(
+            self.client.post, '/titles/',
+            json.dumps({
+                "name": "new title"
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+@override_settings(TITLE_LIST_CACHE_TIMEOUT=60, TITLE_POSTINGS_CACHE_TIMEOUT=60)
+class TitleResponseCacheTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        response = self.client.post(
+            '/users/',
+            json.dumps({
+                "facebookid": "1",
+                "access_token": "1",
+                "nickname": "1",
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = "Token " + response.json()["access_token"]
+        self.post("first")
+        self.title_id = Title.objects.get(name='title').id
+
+    def post(self, content):
+        response = self.client.post(
+            '/postings/',
+            json.dumps({
+                "title": "title",
+                "content": content,
+                "alignment": "LEFT",
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.put(
+            f'/postings/{response.json()["id"]}/',
+            json.dumps({"is_public": True}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def get(self, path, params=None, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params or {}, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries.captured_queries)
+
+    def test_list_served_from_cache_until_a_change(self):
+        first, _ = self.get('/titles/')
+        cached, count = self.get('/titles/', {'order': 'recent', 'time': 'all', 'unknown': '1'})
+        self.assertEqual(count, 0)
+        self.assertEqual(cached.json(), first.json())
+
+        # another page is another entry
+        _, count = self.get('/titles/', {'page_size': 1})
+        self.assertEqual(count, 1)
+
+        self.post("second")
+        response, count = self.get('/titles/')
+        self.assertEqual(count, 1)
+        self.assertEqual(response.json()['titles'][0]['count_public_postings'], 2)
+
+        self.client.post('/titles/', json.dumps({"name": "new title"}), content_type='application/json',
+                         HTTP_AUTHORIZATION=self.token)
+        response, _ = self.get('/titles/')
+        self.assertEqual(response.json()['titles'][0]['name'], 'new title')
+
+    def test_postings_served_from_cache_until_a_change(self):
+        path = f'/titles/{self.title_id}/postings/'
+        first, _ = self.get(path, HTTP_AUTHORIZATION=self.token)
+        cached, count = self.get(path, HTTP_AUTHORIZATION=self.token)
+        # the token is cached too
+        self.assertEqual(count, 0)
+        self.assertEqual(cached.json(), first.json())
+        self.assertEqual(cached['ETag'], first['ETag'])
+
+        response = self.client.get(path, HTTP_AUTHORIZATION=self.token, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # permissions still run before the cache
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.post("second")
+        response, _ = self.get(path, HTTP_AUTHORIZATION=self.token)
+        self.assertEqual([posting['content'] for posting in response.json()['postings']], ['second', 'first'])
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    @override_settings(TITLE_LIST_CACHE_TIMEOUT=0)
+    def test_off(self):
+        self.get('/titles/')
+        _, count = self.get('/titles/')
+        self.assertEqual(count, 1)
+
+
+class PopularTitlesTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        response = self.client.post(
+            '/users/',
+            json.dumps({
+                "facebookid": "1",
+                "access_token": "1",
+                "nickname": "1",
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = "Token " + response.json()["access_token"]
+
+        self.write("quiet", True)
+        self.busy_ids = [self.write("busy", True), self.write("busy", True)]
+        self.write("hidden", False)
+        response = self.client.post(f'/postings/{self.busy_ids[0]}/scrap/', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.titles = dict(Title.objects.values_list('name', 'id'))
+        # titles first named by a posting are not official
+        Title.objects.filter(name="busy").update(is_official=True)
+
+    def write(self, title, is_public):
+        response = self.client.post(
+            '/postings/',
+            json.dumps({"title": title, "content": "content", "alignment": "LEFT"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        posting_id = response.json()['id']
+        if is_public:
+            response = self.client.put(f'/postings/{posting_id}/', json.dumps({"is_public": True}),
+                                       content_type='application/json', HTTP_AUTHORIZATION=self.token)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return posting_id
+
+    def popular(self, **params):
+        response = self.client.get('/titles/', dict(order='popular', **params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(title['name'], title['activity']) for title in response.json()['titles']], response.json()
+
+    def test_ranked_by_activity_in_window(self):
+        ranked, data = self.popular(time='week')
+        self.assertEqual(ranked, [('busy', 3), ('quiet', 1)])
+        self.assertEqual(data['titles'][0]['count_public_postings'], 2)
+
+        TitleActivity.objects.create(title_id=self.titles['quiet'], hour=current_hour() - timezone.timedelta(days=2),
+                                     postings=5)
+        # written past the hooks: seen once the merged windows expire
+        self.assertEqual(self.popular(time='week')[0], [('busy', 3), ('quiet', 1)])
+        activity.windows.changed()
+        self.assertEqual(self.popular(time='day')[0], [('busy', 3), ('quiet', 1)])
+        self.assertEqual(self.popular(time='week')[0], [('quiet', 6), ('busy', 3)])
+        self.assertEqual(self.popular()[0], [('quiet', 6), ('busy', 3)])
+
+    def test_taking_back(self):
+        self.client.post(f'/postings/{self.busy_ids[0]}/unscrap/', HTTP_AUTHORIZATION=self.token)
+        self.client.put(f'/postings/{self.busy_ids[1]}/', json.dumps({"is_public": False}),
+                        content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        # ties go to the newer title
+        self.assertEqual(self.popular(time='day')[0], [('busy', 1), ('quiet', 1)])
+
+        self.client.delete(f'/postings/{self.busy_ids[0]}/', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(self.popular(time='day')[0], [('quiet', 1)])
+
+    def test_scraps_go_with_their_posting(self):
+        # the scrap of busy_ids[0] is not credited once the posting is gone or private
+        self.client.put(f'/postings/{self.busy_ids[0]}/', json.dumps({"is_public": False}),
+                        content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(self.popular(time='day')[0], [('busy', 1), ('quiet', 1)])
+
+        response = self.client.post(f'/postings/{self.busy_ids[1]}/scrap/', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.popular(time='day')[0], [('busy', 2), ('quiet', 1)])
+        self.client.delete(f'/postings/{self.busy_ids[1]}/', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(self.popular(time='day')[0], [('quiet', 1)])
+
+    def test_pages_and_filters(self):
+        ranked, data = self.popular(page_size=1)
+        self.assertEqual(ranked, [('busy', 3)])
+        self.assertTrue(data['has_next'])
+        ranked, data = self.popular(page_size=1, cursor=data['cursor'])
+        self.assertEqual(ranked, [('quiet', 1)])
+        self.assertFalse(data['has_next'])
+
+        self.assertEqual(self.popular(only_official='true')[0], [('busy', 3)])
+        self.assertEqual(self.popular(query='qui')[0], [('quiet', 1)])
+
+    def test_windows_kept(self):
+        self.popular()
+        with CaptureQueriesContext(connection) as queries:
+            self.popular()
+        self.assertFalse(any('title_titleactivity' in query['sql'] for query in queries.captured_queries))
+        # a change in this process is seen at once
+        self.write("quiet", True)
+        self.assertEqual(self.popular()[0], [('busy', 3), ('quiet', 2)])
+
+    def test_filters_look_up_a_page_at_a_time(self):
+        for i in range(6):
+            self.write(f"loud{i}", True)
+            self.write(f"loud{i}", True)
+        with CaptureQueriesContext(connection) as queries:
+            ranked, data = self.popular(query='qui', page_size=1)
+        self.assertEqual(ranked, [('quiet', 1)])
+        lookups = [query['sql'] for query in queries.captured_queries if re.search(r'FROM title_title\b', query['sql'])]
+        # 8 ranked titles, looked up 2 (page_size + 1) at a time until quiet turns up last
+        self.assertEqual(len(lookups), 4)
+        for lookup in lookups:
+            self.assertLessEqual(len(re.search(r'id IN \(([^)]*)\)', lookup).group(1).split(',')), 2)
+
+    def test_old_buckets_pruned_hourly(self):
+        TitleActivity.objects.create(title_id=self.titles['quiet'], hour=current_hour() - timezone.timedelta(days=40),
+                                     postings=5)
+        activity.windows.clear()
+        self.write("quiet", True)
+        self.assertFalse(TitleActivity.objects.filter(hour__lt=current_hour() - timezone.timedelta(days=30)).exists())
+
+    def test_rebuild(self):
+        expected = self.popular()[0]
+        TitleActivity.objects.all().delete()
+        TitleActivity.objects.create(title_id=self.titles['quiet'], hour=current_hour() - timezone.timedelta(days=40),
+                                     postings=5)
+
+        call_command('rebuild_title_activity', stdout=StringIO())
+        self.assertEqual(self.popular()[0], expected)
+
+        TitleActivity.objects.create(title_id=self.titles['quiet'], hour=current_hour() - timezone.timedelta(days=40),
+                                     postings=5)
+        call_command('rebuild_title_activity', '--prune', stdout=StringIO())
+        self.assertEqual(TitleActivity.objects.filter(hour__lt=current_hour() - timezone.timedelta(days=30)).count(), 0)
+        self.assertEqual(self.popular()[0], expected)
@@ -3,12 +3,18 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
 
+from title import activity as title_activity
+from title import cache
 from title.models import Title
-from title.serializers import TitleSerializer, TitleSmallSerializer
-from posting.models import Posting
-from posting.serializers import PostingRetrieveSerializer, PostingDictSerializer
+from title.schedule import today_title
+from title.search import search_condition
+from title.serializers import TitleSerializer
+from django.conf import settings
 from django.utils import timezone
+from written import projection
+from written.conditional import etag, is_fresh, not_modified, page_parts
 from written.error_codes import *
+from written.pagination import DATETIME, Keyset
 from django.db import connection
 
 # API Titles
@@ -18,18 +24,21 @@ from django.db import connection
 # DELETE /titles/{title_id}/
 
 
-# from shchoi94
-def dict_fetch_all(cursor):
-    # Return all rows from a cursor as a dict
-    columns = [col[0] for col in cursor.description]
-    return [
-        dict(zip(columns, row))
-        for row in cursor.fetchall()
-    ]
-
 class TitleViewSet(viewsets.GenericViewSet):
     TITLES_PAGE_SIZE_DEFAULT = 4
     POSTINGS_PAGE_SIZE_DEFAULT = 4
+    TITLES_KEYSET = Keyset(('created_at', 'created_at', DATETIME), ('id', 'id'),
+                           default_page_size=TITLES_PAGE_SIZE_DEFAULT)
+    POSTINGS_KEYSET = Keyset(('posting.id', 'id'), default_page_size=POSTINGS_PAGE_SIZE_DEFAULT)
+    POPULAR_KEYSET = Keyset(('activity', 'activity'), ('id', 'id'), default_page_size=TITLES_PAGE_SIZE_DEFAULT)
+    # most queries an action may run, whatever the page size (see written.queries)
+    QUERY_BUDGETS = {
+        'list': 2,
+        'create': 8,
+        # 4 only on a process's first request of a day without a schedule (see title.schedule)
+        'today': 4,
+        'postings': 3,
+    }
     queryset = Title.objects.all()
     permission_classes = (IsAuthenticated(), )
     serializer_class = TitleSerializer
@@ -43,6 +52,7 @@ class TitleViewSet(viewsets.GenericViewSet):
         return self.serializer_class
 
     # GET /titles/
+    @cache.shared_response('list', 'TITLE_LIST_CACHE_TIMEOUT', cache.list_params, cache.list_generations)
     def list(self, request):
         # query with time, official, name, order
         time = request.query_params.get('time', 'all')
@@ -73,25 +83,23 @@ class TitleViewSet(viewsets.GenericViewSet):
                 raise TitleDoesNotExistException()
             
         
-        # concatenate MySQL statements and params for SQL statements
-        try:
-            my_cursor = int(request.GET['cursor'])
-        except KeyError:
-            if Title.objects.exists():
-                my_cursor = Title.objects.last().id + 1
-            else:
-                my_cursor = 0
-        try:
-            page_size = int(request.GET['page_size'])
-        except KeyError:
-            page_size = self.TITLES_PAGE_SIZE_DEFAULT
+        # order
+        if order == 'popular':
+            return self.popular(request, time, only_official, query)
+        if order == 'recent':
+            page = self.TITLES_KEYSET.page(request, descending=True)
+        elif order == 'oldest':
+            page = self.TITLES_KEYSET.page(request, descending=False)
+        else:
+            raise TitleDoesNotExistException()
 
-        raw_query = '''
-            SELECT * 
+        # concatenate MySQL statements and params for SQL statements
+        seek, params = page.seek()
+        raw_query = f'''
+            SELECT id, name, created_at, public_postings_count, all_postings_count
             FROM title_title
-            WHERE id < %s
+            WHERE {seek}
         '''
-        params = [my_cursor]
 
         # time
         if time != 'all':
@@ -104,154 +112,137 @@ class TitleViewSet(viewsets.GenericViewSet):
             raw_query += ' AND is_official = %s'
             params.append(only_official)
         
-        # name
-        # this query should be improved
-        # I've heard LIKE is inefficient but haven't found good alternatives
+        # name: looked up through the n-gram index instead of scanning with LIKE '%query%'
         if query != '':
-            raw_query += ' AND name LIKE %s'
-            query = '%' + query + '%'
-            params.append(query)
-        
-        # order
-        if order == 'recent':
-            raw_query += ' ORDER BY created_at DESC'
-        elif order == 'oldest':
-            raw_query += ' ORDER BY created_at ASC'
-        else:
-            raise TitleDoesNotExistException()
+            condition, condition_params = search_condition(query)
+            raw_query += ' AND ' + condition
+            params += condition_params
 
-        params.append(page_size+1)
-        raw_query += ' LIMIT %s'
+        raw_query += f' ORDER BY {page.order_by()} LIMIT %s'
+        params.append(page.limit)
 
         with connection.cursor() as cursor:
             cursor.execute(raw_query, params)
-            titles = dict_fetch_all(cursor)
+            titles = projection.dict_fetch_all(cursor)
         
-        # SET RETURN VALUE: 'has_next'
-        if len(titles) == page_size+1:
-            has_next = True
-            del titles[-1]
-        else:
-            has_next = False
+        titles, has_next, next_cursor = page.paginate(titles)
 
-        # SET RETURN VALUE: 'cursor'
-        if has_next:
-            next_cursor = titles[-1]['id']
-        else:
-            next_cursor = None
-
-        titles_data = TitleSmallSerializer(titles, many=True).data
+        titles_data = projection.project(titles, projection.title)
         return_data = {'titles': titles_data, 'has_next': has_next, 'cursor': next_cursor}
         return Response(return_data)
 
+    def popular(self, request, time, only_official, query):
+        # titles ranked by activity in the window (see title.activity), the filters applied to the ranked titles
+        page = self.POPULAR_KEYSET.page(request)
+        activity = title_activity.activity_in(time)
+        filtered = only_official or query != ''
+        # without filters every ranked title is shown: only the page is looked up
+        ranked = title_activity.top(activity, len(activity) if filtered else page.limit, page.after)
+
+        # with filters the ranked titles are looked up a page at a time until the page is full
+        rows = []
+        for start in range(0, len(ranked), page.limit):
+            chunk = ranked[start:start + page.limit]
+            titles = self.popular_titles([title_id for _, title_id in chunk], only_official, query)
+            rows += [dict(titles[title_id], activity=count) for count, title_id in chunk if title_id in titles]
+            if len(rows) >= page.limit:
+                break
+        rows, has_next, next_cursor = page.paginate(rows[:page.limit])
+
+        titles_data = [dict(projection.title(row), activity=row['activity']) for row in rows]
+        return Response({'titles': titles_data, 'has_next': has_next, 'cursor': next_cursor})
+
+    def popular_titles(self, title_ids, only_official, query):
+        # {id: row} of the given titles that pass the filters
+        placeholders = ', '.join(['%s'] * len(title_ids))
+        raw_query = f'''
+            SELECT id, name, created_at, public_postings_count, all_postings_count
+            FROM title_title
+            WHERE id IN ({placeholders})
+        '''
+        params = list(title_ids)
+        if only_official:
+            raw_query += ' AND is_official = %s'
+            params.append(only_official)
+        if query != '':
+            condition, condition_params = search_condition(query)
+            raw_query += ' AND ' + condition
+            params += condition_params
+        with connection.cursor() as cursor:
+            cursor.execute(raw_query, params)
+            return {row['id']: row for row in projection.dict_fetch_all(cursor)}
+
+    def public_postings_page(self, request, title, fields):
+        # newest public postings of a title, for postings() and today()
+        page = self.POSTINGS_KEYSET.page(request)
+        seek, params = page.seek()
+        # writer and title are joined in here, not fetched per row
+        raw_query = f'''
+            SELECT {fields.columns}
+            FROM posting_posting AS posting
+            INNER JOIN title_title AS title ON posting.title_id = title.id
+            LEFT JOIN user_userprofile AS profile ON posting.writer_id = profile.user_id
+            WHERE {seek}
+            AND posting.title_id = %s
+            AND posting.is_public = 1
+            ORDER BY {page.order_by()}
+            LIMIT %s;
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(raw_query, params + [title.id, page.limit])
+            postings = projection.dict_fetch_all(cursor)
+        return page.paginate(postings)
+
+    def public_postings_response(self, request, title, first_page_timeout=0):
+        # title.updated_at moves with every change to its postings (see posting.hooks)
+        fields = projection.PostingFields.from_request(request)
+        tag = etag('title postings', title.id, title.updated_at, page_parts(request))
+        if is_fresh(request, tag):
+            return not_modified(tag)
+
+        # the default first page is kept under its ETag, the next change to the postings moves it
+        first_page = bool(first_page_timeout) and not request.query_params
+        if first_page:
+            return_data = cache.get_first_page(tag)
+            if return_data is not None:
+                return Response(return_data, headers={'ETag': tag})
+
+        postings, has_next, next_cursor = self.public_postings_page(request, title, fields)
+
+        postings_data = fields.project(postings)
+        return_data = {'title': title.name, 'postings': postings_data, 'has_next': has_next, 'cursor': next_cursor}
+        if first_page:
+            cache.set_first_page(tag, return_data, first_page_timeout)
+        return Response(return_data, headers={'ETag': tag})
+
     # POST /titles/
     def create(self, request):
         data = request.data
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         title = serializer.save()
+        cache.changed()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     # GET /titles/today/
     @action(detail=False, methods=['GET'], url_path='today')
     def today(self, request):
-        try:
-            title = Title.objects.get(name='첫 눈')
-        except Title.DoesNotExist:
-           raise TitleDoesNotExistException()
-
-        try:
-            my_cursor = int(request.GET['cursor'])
-        except KeyError:
-            if Posting.objects.filter(title=title.id).exists():
-                my_cursor = Posting.objects.last().id + 1
-            else:
-                my_cursor = 0
-        try:
-            page_size = int(request.GET['page_size'])
-        except KeyError:
-            page_size = self.POSTINGS_PAGE_SIZE_DEFAULT
-
-        raw_query = f'''
-            SELECT * 
-            FROM posting_posting AS posting_table
-            WHERE id < {my_cursor}
-            AND title_id={title.id}
-            AND is_public=1
-            ORDER BY id DESC
-            LIMIT {page_size + 1};
-        '''
-        with connection.cursor() as cursor:
-            cursor.execute(raw_query)
-            postings = dict_fetch_all(cursor)
-
-        # SET RETURN VALUE: 'has_next'
-        if len(postings) == page_size+1:
-            has_next = True
-            del postings[-1]
-        else:
-            has_next = False
-
-        # SET RETURN VALUE: 'cursor'
-        if has_next:
-            next_cursor = postings[-1]['id']
-        else:
-            next_cursor = None
-                        
-        postings_data = PostingDictSerializer(postings, many=True).data
+        title = today_title.get()
+        if title is None:
+            raise TitleDoesNotExistException()
 
-        return_data = {'title': title.name, 'postings': postings_data, 'has_next': has_next, 'cursor': next_cursor}
-        return Response(return_data)
+        return self.public_postings_response(request, title, settings.TITLE_TODAY_CACHE_TIMEOUT)
 
     # GET /titles/{title_id}/postings/
     @action(detail=True, methods=['GET'], url_path='postings')
+    @cache.shared_response('postings', 'TITLE_POSTINGS_CACHE_TIMEOUT', cache.postings_params,
+                           cache.postings_generations)
     def postings(self, request, pk=None):
         try:
             title = Title.objects.get(pk=pk)
         except Title.DoesNotExist:
            raise TitleDoesNotExistException()
 
-        try:
-            my_cursor = int(request.GET['cursor'])
-        except KeyError:
-            if Posting.objects.filter(title=title.id).exists():
-                my_cursor = Posting.objects.last().id + 1
-            else:
-                my_cursor = 0
-        try:
-            page_size = int(request.GET['page_size'])
-        except KeyError:
-            page_size = self.POSTINGS_PAGE_SIZE_DEFAULT
-
-        raw_query = f'''
-            SELECT * 
-            FROM posting_posting AS posting_table
-            WHERE id < {my_cursor}
-            AND title_id={title.id}
-            AND is_public=1
-            ORDER BY id DESC
-            LIMIT {page_size + 1};
-        '''
-        with connection.cursor() as cursor:
-            cursor.execute(raw_query)
-            postings = dict_fetch_all(cursor)
-
-        # SET RETURN VALUE: 'has_next'
-        if len(postings) == page_size+1:
-            has_next = True
-            del postings[-1]
-        else:
-            has_next = False
-
-        # SET RETURN VALUE: 'cursor'
-        if has_next:
-            next_cursor = postings[-1]['id']
-        else:
-            next_cursor = None
-                        
-        postings_data = PostingDictSerializer(postings, many=True).data
-
-        return_data = {'title': title.name, 'postings': postings_data, 'has_next': has_next, 'cursor': next_cursor}
-        return Response(return_data)
+        return self.public_postings_response(request, title)
 
         
\ No newline at end of file
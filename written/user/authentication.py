@@ -0,0 +1,86 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    # Bounded LRU of token key -> Token (with its user), each entry valid for `ttl` seconds.
+    # It lives in one process: other workers only drop an entry when it expires,
+    # so `ttl` bounds how long a revoked token keeps working there.
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            token, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        # every request gets its own copy, views are free to touch request.user
+        return copy.deepcopy(token)
+
+    def set(self, key, token):
+        with self.lock:
+            self.entries[key] = (copy.deepcopy(token), time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self.lock:
+            for key in [key for key, (token, _) in self.entries.items() if token.user_id == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # TokenAuthentication without the authtoken_token/auth_user query on repeated calls
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token)
+        return (token.user, token)
+
+
+def invalidate_token(sender, instance, **kwargs):
+    # rotated or revoked
+    token_cache.delete(instance.key)
+
+
+def invalidate_user(sender, instance, **kwargs):
+    # deactivated or deleted users must stop authenticating
+    if kwargs.get('signal') is post_delete or not instance.is_active:
+        token_cache.delete_user(instance.id)
+
+
+post_save.connect(invalidate_token, sender=Token, dispatch_uid='token_cache_token_saved')
+post_delete.connect(invalidate_token, sender=Token, dispatch_uid='token_cache_token_deleted')
+post_save.connect(invalidate_user, sender=User, dispatch_uid='token_cache_user_saved')
+post_delete.connect(invalidate_user, sender=User, dispatch_uid='token_cache_user_deleted')
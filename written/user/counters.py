@@ -0,0 +1,66 @@
+from django.db import connection
+from django.db.models import Case, F, When
+
+from user.models import UserProfile
+
+
+def count_postings_by_writer(user_ids):
+    # Return {user_id: (public postings, all postings)} for the given users
+    if not user_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    raw_query = f'''
+        SELECT writer_id, SUM(CASE WHEN is_public THEN 1 ELSE 0 END), COUNT(*)
+        FROM posting_posting
+        WHERE writer_id IN ({placeholders})
+        GROUP BY writer_id
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(raw_query, user_ids)
+        return {
+            user_id: (int(count_public), count_all)
+            for user_id, count_public, count_all in cursor.fetchall()
+        }
+
+
+def count_subscriptions_by(column, user_ids):
+    # Return {user_id: subscriptions} grouped by subscriber_id or writer_id
+    if not user_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    raw_query = f'''
+        SELECT {column}, COUNT(*)
+        FROM subscription_subscription
+        WHERE {column} IN ({placeholders})
+        GROUP BY {column}
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(raw_query, user_ids)
+        return dict(cursor.fetchall())
+
+
+def adjust_postings_count(writer_id, all_delta=0, public_delta=0):
+    # single UPDATE with F expressions, so concurrent writers never lose an increment
+    changes = {}
+    if all_delta:
+        changes['all_postings_count'] = F('all_postings_count') + all_delta
+    if public_delta:
+        changes['public_postings_count'] = F('public_postings_count') + public_delta
+    if changes and writer_id is not None:
+        UserProfile.objects.filter(user_id=writer_id).update(**changes)
+
+
+def adjust_subscriptions_count(subscriber_id, writer_ids, delta):
+    # the subscriber's subscriptions and each writer's subscribers, in one UPDATE
+    if not writer_ids:
+        return
+    UserProfile.objects.filter(user_id__in=[subscriber_id, *writer_ids]).update(
+        subscriptions_count=Case(
+            When(user_id=subscriber_id, then=F('subscriptions_count') + delta * len(writer_ids)),
+            default=F('subscriptions_count'),
+        ),
+        subscribers_count=Case(
+            When(user_id__in=writer_ids, then=F('subscribers_count') + delta),
+            default=F('subscribers_count'),
+        ),
+    )
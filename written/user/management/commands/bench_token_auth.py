@@ -0,0 +1,41 @@
+import json
+import time
+
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from user.authentication import CachedTokenAuthentication, token_cache
+
+
+class Command(BaseCommand):
+    help = 'Compare TokenAuthentication and CachedTokenAuthentication on an existing token'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--key', help='token key to authenticate with, defaults to any token')
+        parser.add_argument('--iterations', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        key = options['key'] or Token.objects.values_list('key', flat=True).first()
+        if key is None:
+            raise CommandError('no token to authenticate with')
+        request = Request(RequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {key}'))
+
+        token_cache.clear()
+        results = {}
+        for name, authentication in (('stock', TokenAuthentication()), ('cached', CachedTokenAuthentication())):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(options['iterations']):
+                    authentication.authenticate(request)
+                elapsed = time.perf_counter() - started
+            results[name] = {
+                'iterations': options['iterations'],
+                'us_per_call': elapsed / options['iterations'] * 1e6,
+                'queries': len(queries.captured_queries),
+            }
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from user.counters import count_postings_by_writer, count_subscriptions_by
+from user.models import UserProfile
+
+COUNTERS = ('public_postings_count', 'all_postings_count', 'subscribers_count', 'subscriptions_count')
+
+
+class Command(BaseCommand):
+    help = 'Recompute the posting and subscription counters of UserProfile from their tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='number of users recounted per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        checked = 0
+        repaired = 0
+        while True:
+            # walk profiles by user id so every chunk is an index range scan
+            with transaction.atomic():
+                profiles = list(
+                    UserProfile.objects.select_for_update()
+                    .filter(user_id__gt=last_id)
+                    .order_by('user_id')
+                    .values_list('user_id', *COUNTERS)[:chunk_size]
+                )
+                if not profiles:
+                    break
+                user_ids = [profile[0] for profile in profiles]
+                postings = count_postings_by_writer(user_ids)
+                subscribers = count_subscriptions_by('writer_id', user_ids)
+                subscriptions = count_subscriptions_by('subscriber_id', user_ids)
+                for user_id, *counts in profiles:
+                    actual = (*postings.get(user_id, (0, 0)), subscribers.get(user_id, 0),
+                              subscriptions.get(user_id, 0))
+                    if actual != tuple(counts):
+                        UserProfile.objects.filter(user_id=user_id).update(**dict(zip(COUNTERS, actual)))
+                        repaired += 1
+            checked += len(profiles)
+            last_id = profiles[-1][0]
+
+        self.stdout.write(f'checked {checked} users, repaired {repaired}')
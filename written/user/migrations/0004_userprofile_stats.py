@@ -0,0 +1,56 @@
+# Generated by Django 3.1 on 2021-01-29 13:20
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_user_stats(apps, schema_editor):
+    UserProfile = apps.get_model('user', 'UserProfile')
+    Posting = apps.get_model('posting', 'Posting')
+    Subscription = apps.get_model('subscription', 'Subscription')
+    postings = Posting.objects.values('writer_id').annotate(
+        count_all=Count('id'),
+        count_public=Count('id', filter=Q(is_public=True)),
+    )
+    for row in postings.iterator():
+        UserProfile.objects.filter(user_id=row['writer_id']).update(
+            all_postings_count=row['count_all'],
+            public_postings_count=row['count_public'],
+        )
+    for row in Subscription.objects.values('writer_id').annotate(count=Count('id')).iterator():
+        UserProfile.objects.filter(user_id=row['writer_id']).update(subscribers_count=row['count'])
+    for row in Subscription.objects.values('subscriber_id').annotate(count=Count('id')).iterator():
+        UserProfile.objects.filter(user_id=row['subscriber_id']).update(subscriptions_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_auto_20210109_0224'),
+        ('posting', '0007_explore_index'),
+        ('subscription', '0004_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='all_postings_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='public_postings_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='subscriptions_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
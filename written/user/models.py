@@ -7,4 +7,9 @@ class UserProfile(models.Model):
     nickname = models.CharField(max_length=16, unique=True)
     description = models.CharField(max_length=100, blank=True, default="")
     first_posted_at = models.DateTimeField(null=True, default=None)
+    # maintained by posting.hooks and subscription.hooks, repaired by `manage.py recount_user_stats`
+    public_postings_count = models.PositiveIntegerField(default=0)
+    all_postings_count = models.PositiveIntegerField(default=0)
+    subscribers_count = models.PositiveIntegerField(default=0)
+    subscriptions_count = models.PositiveIntegerField(default=0)
 
@@ -0,0 +1,163 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from user.models import UserProfile
+
+# Nicknames held in memory for GET /users/nickname/ and GET /users/search/, which the signup
+# form and mention autocomplete call on every keystroke. The index is a sorted list of
+# (casefolded nickname, user id, nickname), read from the profiles along the unique nickname
+# index and read again by the first caller once it is NICKNAME_INDEX_REFRESH seconds old,
+# while the others go on with the old list.
+# Profile saves and deletes in this process apply to it at once, other workers' at the next
+# refill. A nickname not in the index is free without a query; one that is (casefolded, the
+# way MySQL's collation compares) is confirmed against the unique index. So a nickname taken
+# in another worker since the last refill can read as free: UserViewSet lets the unique index
+# have the last word on every write.
+
+FILL_CHUNK = 1000
+
+
+def nickname_key(nickname):
+    return nickname.casefold()
+
+
+class NicknameIndex:
+    def __init__(self, refresh):
+        self.refresh = refresh
+        self.entries = []
+        self.by_user = {}
+        self.filled_at = None
+        # profile changes seen while a refill reads, applied again to what it read
+        self.pending = None
+        # moved by clear(), so a refill started before it is dropped
+        self.version = 0
+        self.lock = threading.Lock()
+        self.filled = threading.Condition(self.lock)
+
+    def fresh(self):
+        # One caller refills, outside the lock: the others keep reading the entries it replaces,
+        # and only wait for it when there are none yet.
+        with self.lock:
+            while True:
+                stale = self.filled_at is None or time.monotonic() - self.filled_at >= self.refresh
+                if not stale:
+                    return
+                if self.pending is None:
+                    break
+                if self.filled_at is not None:
+                    return
+                self.filled.wait()
+            self.pending = []
+            version = self.version
+        entries = None
+        try:
+            entries = self.read()
+        finally:
+            with self.lock:
+                if entries is not None and version == self.version:
+                    self.entries = entries
+                    self.by_user = {entry[1]: entry for entry in entries}
+                    for user_id, nickname in self.pending:
+                        self.apply(user_id, nickname)
+                    self.filled_at = time.monotonic()
+                self.pending = None
+                self.filled.notify_all()
+
+    def read(self):
+        # chunks walked on the nickname index, not one scan of the whole table
+        entries = []
+        profiles = UserProfile.objects.order_by('nickname').values_list('nickname', 'user_id')
+        after = None
+        while True:
+            chunk = profiles.filter(nickname__gt=after) if after is not None else profiles
+            rows = list(chunk[:FILL_CHUNK])
+            entries += [(nickname_key(nickname), user_id, nickname) for nickname, user_id in rows]
+            if len(rows) < FILL_CHUNK:
+                break
+            after = rows[-1][0]
+        entries.sort()
+        return entries
+
+    def contains(self, nickname):
+        # whether some profile may have the nickname
+        key = nickname_key(nickname)
+        self.fresh()
+        with self.lock:
+            i = bisect.bisect_left(self.entries, (key, ))
+            return i < len(self.entries) and self.entries[i][0] == key
+
+    def search(self, prefix, after, limit):
+        # up to `limit` {'key', 'id', 'nickname'} starting with the prefix, after the (key, id) given
+        key = nickname_key(prefix)
+        self.fresh()
+        with self.lock:
+            start = (key, )
+            if after is not None:
+                # past every entry of the (key, id) the last page ended on
+                start = max(start, tuple(after) + (chr(0x10ffff), ))
+            i = bisect.bisect_left(self.entries, start)
+            matches = []
+            for entry in self.entries[i:i + limit]:
+                if not entry[0].startswith(key):
+                    break
+                matches.append({'key': entry[0], 'id': entry[1], 'nickname': entry[2]})
+            return matches
+
+    def saved(self, user_id, nickname):
+        self.changed(user_id, nickname)
+
+    def deleted(self, user_id):
+        self.changed(user_id, None)
+
+    def changed(self, user_id, nickname):
+        # a nickname of None: the profile is gone
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((user_id, nickname))
+            if self.filled_at is not None:
+                self.apply(user_id, nickname)
+
+    def apply(self, user_id, nickname):
+        entry = self.by_user.pop(user_id, None)
+        if entry is not None:
+            i = bisect.bisect_left(self.entries, entry)
+            if i < len(self.entries) and self.entries[i] == entry:
+                del self.entries[i]
+        if nickname is not None:
+            entry = (nickname_key(nickname), user_id, nickname)
+            bisect.insort(self.entries, entry)
+            self.by_user[user_id] = entry
+
+    def clear(self):
+        with self.lock:
+            self.entries = []
+            self.by_user = {}
+            self.filled_at = None
+            self.version += 1
+
+
+nickname_index = NicknameIndex(settings.NICKNAME_INDEX_REFRESH)
+
+
+def is_available(nickname):
+    if not nickname:
+        return False
+    if not nickname_index.contains(nickname):
+        return True
+    return not UserProfile.objects.filter(nickname=nickname).exists()
+
+
+def profile_saved(sender, instance, **kwargs):
+    nickname_index.saved(instance.user_id, instance.nickname)
+
+
+def profile_deleted(sender, instance, **kwargs):
+    nickname_index.deleted(instance.user_id)
+
+
+post_save.connect(profile_saved, sender=UserProfile, dispatch_uid='nickname_index_saved')
+post_delete.connect(profile_deleted, sender=UserProfile, dispatch_uid='nickname_index_deleted')
@@ -33,13 +33,13 @@ class UserSerializer(serializers.ModelSerializer):
         if data.get('description'):
             profile = user.userprofile
             profile.description = data.get('description')
-            profile.save()
+            profile.save(update_fields=['description'])
         if data.get('nickname'):
             if UserProfile.objects.filter(nickname=data.get('nickname')).count() != 0:
                 raise serializers.ValidationError("Nickname duplicate")
             profile = user.userprofile
             profile.nickname = data.get('nickname')
-            profile.save()
+            profile.save(update_fields=['nickname'])
         return
 
     def get_nickname(self, user):
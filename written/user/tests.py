@@ -1,12 +1,24 @@
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 import json
+from io import StringIO
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 from unittest.mock import patch
 from user.token import mocked_check_token
+from user.authentication import token_cache
 from user.models import UserProfile
+from user.nicknames import nickname_index
+from subscription.models import Subscription
 from title.models import Title
+from written.queries import QueryBudgetMixin
 
 
 @patch("user.views.check_token", mocked_check_token)
@@ -599,3 +611,637 @@ class GetUsersSubscriberTestCase(TestCase):
         self.assertEqual(len(data["subscribers"]), 4)
         self.assertEqual(data["has_next"], False)
         self.assertEqual(data["cursor"], None)
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        response = self.client.post(
+            '/users/',
+            json.dumps({
+                "facebookid": "1",
+                "access_token": "1",
+                "nickname": "1",
+            }),
+            content_type='application/json'
+        )
+        data = response.json()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.key = data["access_token"]
+        self.token = "Token " + self.key
+        self.id = data["user"]["id"]
+
+    def get_me(self):
+        return self.client.get('/users/me/', HTTP_AUTHORIZATION=self.token)
+
+    def test_token_lookup_is_cached(self):
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.get_me().status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.get_me().status_code, status.HTTP_200_OK)
+        self.assertEqual(len(second.captured_queries), len(first.captured_queries) - 1)
+        self.assertFalse(any('authtoken_token' in query['sql'] for query in second.captured_queries))
+
+    def test_logout_and_rotation_invalidate(self):
+        self.get_me()
+        response = self.client.post('/users/logout/', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(token_cache.get(self.key))
+
+        self.get_me()
+        Token.objects.filter(key=self.key).get().delete()
+        Token.objects.create(user_id=self.id)
+        self.assertEqual(self.get_me().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_is_rejected(self):
+        self.get_me()
+        user = User.objects.get(pk=self.id)
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.get_me().status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class StubGraphHandler(BaseHTTPRequestHandler):
+    # stands in for graph.facebook.com: token "valid-<id>" belongs to <id>, "slow" never answers in time
+    requests = 0
+
+    def do_GET(self):
+        StubGraphHandler.requests += 1
+        access_token = parse_qs(urlparse(self.path).query).get('access_token', [''])[0]
+        if access_token == 'slow':
+            # the client has given up by now, nothing to answer
+            time.sleep(1)
+            return
+        if access_token.startswith('valid-'):
+            body = json.dumps({"id": access_token[len('valid-'):], "name": "stub"}).encode()
+            self.send_response(status.HTTP_200_OK)
+        else:
+            body = json.dumps({"error": {"message": "Invalid OAuth access token."}}).encode()
+            self.send_response(status.HTTP_400_BAD_REQUEST)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FacebookTokenVerifierTestCase(TestCase):
+    client = Client()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubGraphHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.graph_url = f'http://127.0.0.1:{cls.server.server_address[1]}/v7.0'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubGraphHandler.requests = 0
+
+    def sign_up(self, facebookid, access_token):
+        with self.settings(FACEBOOK_GRAPH_URL=self.graph_url, FACEBOOK_READ_TIMEOUT=0.2):
+            return self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": facebookid,
+                    "access_token": access_token,
+                    "nickname": facebookid,
+                }),
+                content_type='application/json'
+            )
+
+    def test_valid_token(self):
+        response = self.sign_up("1423", "valid-1423")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.settings(FACEBOOK_GRAPH_URL=self.graph_url):
+            response = self.client.put(
+                '/users/login/',
+                json.dumps({
+                    "facebookid": "1423",
+                    "access_token": "valid-1423",
+                }),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # the second check was answered from the cache
+        self.assertEqual(StubGraphHandler.requests, 1)
+
+    def test_invalid_token(self):
+        response = self.sign_up("1423", "valid-9999")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["errorcode"], 10001)
+
+        response = self.sign_up("1423", "expired")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["errorcode"], 10001)
+        self.assertEqual(User.objects.count(), 0)
+
+    def test_slow_graph_api_times_out(self):
+        started = time.monotonic()
+        response = self.sign_up("slow", "slow")
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["errorcode"], 10001)
+
+
+class UserQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        # user 0 subscribes to, and is subscribed by, everyone else
+        self.users = []
+        for i in range(4):
+            response = self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": str(i),
+                    "access_token": str(i),
+                    "nickname": str(i),
+                }),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.users.append(("Token " + response.json()["access_token"], response.json()["user"]["id"]))
+        self.token, self.id = self.users[0]
+        for token, user_id in self.users[1:]:
+            self.client.post(f'/users/{user_id}/subscribe/', HTTP_AUTHORIZATION=self.token)
+            self.client.post(f'/users/{self.id}/subscribe/', HTTP_AUTHORIZATION=token)
+            for i in range(2):
+                self.client.post(
+                    '/postings/',
+                    json.dumps({
+                        "title": f"title{i}",
+                        "content": "content",
+                        "alignment": "LEFT",
+                    }),
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=self.token
+                )
+
+    @patch("user.views.check_token", mocked_check_token)
+    def test_account_endpoints(self):
+        response = self.assertQueryBudget(
+            self.client.post, '/users/',
+            json.dumps({
+                "facebookid": "9",
+                "access_token": "9",
+                "nickname": "9",
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.assertQueryBudget(
+            self.client.put, '/users/login/',
+            json.dumps({
+                "facebookid": "9",
+                "access_token": "9",
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = "Token " + response.json()["access_token"]
+        response = self.assertQueryBudget(
+            self.client.put, '/users/me/',
+            json.dumps({
+                "nickname": "renamed",
+                "description": "described",
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertQueryBudget(self.client.post, '/users/logout/', HTTP_AUTHORIZATION=token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_read_endpoints(self):
+        _, other_id = self.users[1]
+        response = self.assertQueryBudget(self.client.get, '/users/me/', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertQueryBudget(self.client.get, f'/users/{other_id}/', HTTP_AUTHORIZATION=self.token)
+        self.assertTrue(response.json()['subscribing'])
+        user_ids = ','.join(str(user_id) for _, user_id in self.users)
+        response = self.assertQueryBudget(self.client.get, '/users/', {'ids': user_ids}, HTTP_AUTHORIZATION=self.token)
+        self.assertEqual([item['user']['subscribing'] for item in response.json()['results']],
+                         [False, True, True, True])
+        response = self.assertQueryBudget(self.client.get, f'/users/{self.id}/postings/', {'page_size': 10},
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(len(response.json()['postings']), 6)
+        response = self.assertQueryBudget(self.client.get, '/users/subscribed/', {'page_size': 10},
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(len(response.json()['writers']), 3)
+        response = self.assertQueryBudget(self.client.get, '/users/subscriber/', {'page_size': 10},
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(len(response.json()['subscribers']), 3)
+        response = self.assertQueryBudget(self.client.get, '/users/nickname/', {'nickname': '1'})
+        self.assertFalse(response.json()['available'])
+        response = self.assertQueryBudget(self.client.get, '/users/search/', {'prefix': '1'},
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.json()['users'], [{'id': self.users[1][1], 'nickname': '1'}])
+
+    def test_subscription_endpoints(self):
+        _, other_id = self.users[1]
+        response = self.assertQueryBudget(self.client.post, f'/users/{other_id}/unsubscribe/',
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertQueryBudget(self.client.post, f'/users/{other_id}/subscribe/',
+                                          HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        writer_ids = [user_id for _, user_id in self.users[1:]]
+        response = self.assertQueryBudget(self.client.post, '/users/unsubscribe/',
+                                          json.dumps({"writer_ids": writer_ids}),
+                                          content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual([item['status_code'] for item in response.json()['results']], [200] * 3)
+        response = self.assertQueryBudget(self.client.post, '/users/subscribe/',
+                                          json.dumps({"writer_ids": writer_ids}),
+                                          content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual([item['status_code'] for item in response.json()['results']], [200] * 3)
+
+
+class SubscribeTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        self.token = {}
+        self.id = {}
+        for i in range(1, 3):
+            response = self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": str(i),
+                    "access_token": str(i),
+                    "nickname": str(i),
+                }),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.token[i] = "Token " + response.json()["access_token"]
+            self.id[i] = response.json()["user"]["id"]
+
+    def post(self, writer_id, action):
+        return self.client.post(f'/users/{writer_id}/{action}/', HTTP_AUTHORIZATION=self.token[1])
+
+    def test_subscribe_twice(self):
+        self.assertEqual(self.post(self.id[2], 'subscribe').status_code, status.HTTP_200_OK)
+        self.assertFalse(Subscription.add(self.id[1], self.id[2]))
+
+        response = self.post(self.id[2], 'subscribe')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['errorcode'], 30001)
+        self.assertEqual(Subscription.objects.count(), 1)
+
+    def test_unsubscribe_twice(self):
+        self.assertEqual(self.post(self.id[2], 'subscribe').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post(self.id[2], 'unsubscribe').status_code, status.HTTP_200_OK)
+
+        response = self.post(self.id[2], 'unsubscribe')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['errorcode'], 30002)
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_missing_writer(self):
+        for action in ('subscribe', 'unsubscribe'):
+            for writer_id in (self.id[2] + 100, 'abc'):
+                response = self.post(writer_id, action)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.json()['errorcode'], 10003)
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_bulk_subscribe(self):
+        self.assertEqual(self.post(self.id[2], 'subscribe').status_code, status.HTTP_200_OK)
+        response = self.client.post(
+            '/users/subscribe/',
+            json.dumps({"writer_ids": [self.id[2], self.id[1], self.id[2] + 100]}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token[1]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(item['id'], item['status_code'], item.get('errorcode')) for item in response.json()['results']],
+                         [(self.id[2], 400, 30001), (self.id[1], 200, None), (self.id[2] + 100, 400, 10003)])
+        self.assertEqual(Subscription.objects.filter(subscriber_id=self.id[1]).count(), 2)
+
+        response = self.client.post(
+            '/users/unsubscribe/',
+            json.dumps({"writer_ids": f"{self.id[2]},{self.id[1]},{self.id[1]}"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token[1]
+        )
+        self.assertEqual([item['status_code'] for item in response.json()['results']], [200, 200])
+        self.assertFalse(Subscription.objects.exists())
+
+        response = self.client.post(
+            '/users/unsubscribe/',
+            json.dumps({"writer_ids": [self.id[2]]}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token[1]
+        )
+        self.assertEqual(response.json()['results'][0]['errorcode'], 30002)
+
+
+class MultiGetUsersTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        self.users = []
+        for i in range(3):
+            response = self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": str(i),
+                    "access_token": str(i),
+                    "nickname": str(i),
+                }),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.users.append(("Token " + response.json()["access_token"], response.json()["user"]["id"]))
+        self.token, self.id = self.users[0]
+        _, self.other_id = self.users[1]
+        self.client.post(f'/users/{self.other_id}/subscribe/', HTTP_AUTHORIZATION=self.token)
+        other_token, _ = self.users[1]
+        response = self.client.post(
+            '/postings/',
+            json.dumps({"title": "title", "content": "content", "alignment": "LEFT"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=other_token
+        )
+        self.client.put(f'/postings/{response.json()["id"]}/', json.dumps({"is_public": True}),
+                        content_type='application/json', HTTP_AUTHORIZATION=other_token)
+
+    def test_results_in_request_order(self):
+        response = self.client.get('/users/', {'ids': f'{self.other_id},0,{self.id}'}, HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['results']
+
+        self.assertEqual([item['id'] for item in results], [self.other_id, 0, self.id])
+        self.assertEqual([item['status_code'] for item in results], [200, 400, 200])
+        self.assertEqual(results[1]['errorcode'], 10003)
+
+        detail = self.client.get(f'/users/{self.other_id}/', HTTP_AUTHORIZATION=self.token).json()
+        self.assertEqual(results[0]['user'], detail)
+        self.assertEqual(results[0]['user']['count_public_postings'], 1)
+        self.assertFalse(results[2]['user']['subscribing'])
+
+    def test_requires_authentication(self):
+        response = self.client.get('/users/', {'ids': str(self.id)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_ids(self):
+        response = self.client.get('/users/', {'ids': 'me'}, HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['errorcode'], 60001)
+
+
+class UserStatsTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        self.users = []
+        for i in range(3):
+            response = self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": str(i),
+                    "access_token": str(i),
+                    "nickname": str(i),
+                }),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.users.append(("Token " + response.json()["access_token"], response.json()["user"]["id"]))
+        self.token, self.id = self.users[0]
+
+    def post(self, is_public):
+        response = self.client.post(
+            '/postings/',
+            json.dumps({"title": "title", "content": "content", "alignment": "LEFT"}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=self.token
+        )
+        posting_id = response.json()['id']
+        if is_public:
+            self.client.put(f'/postings/{posting_id}/', json.dumps({"is_public": True}),
+                            content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        return posting_id
+
+    def counts(self, user_id):
+        profile = UserProfile.objects.get(user_id=user_id)
+        return (profile.public_postings_count, profile.all_postings_count,
+                profile.subscribers_count, profile.subscriptions_count)
+
+    def test_postings_counted(self):
+        public_id = self.post(is_public=True)
+        private_id = self.post(is_public=False)
+        self.post(is_public=True)
+        self.assertEqual(self.counts(self.id), (2, 3, 0, 0))
+
+        self.client.put(f'/postings/{public_id}/', json.dumps({"is_public": False}),
+                        content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(self.counts(self.id), (1, 3, 0, 0))
+        self.client.delete(f'/postings/{private_id}/', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(self.counts(self.id), (1, 2, 0, 0))
+
+        data = self.client.get('/users/me/', HTTP_AUTHORIZATION=self.token).json()
+        self.assertEqual((data['count_public_postings'], data['count_all_postings']), (1, 2))
+
+    def test_subscriptions_counted(self):
+        (_, first_id), (second_token, second_id) = self.users[1:]
+        self.client.post(f'/users/{first_id}/subscribe/', HTTP_AUTHORIZATION=self.token)
+        self.client.post('/users/subscribe/', json.dumps({"writer_ids": [first_id, second_id]}),
+                         content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.client.post(f'/users/{first_id}/subscribe/', HTTP_AUTHORIZATION=second_token)
+        self.assertEqual(self.counts(self.id), (0, 0, 0, 2))
+        self.assertEqual(self.counts(first_id), (0, 0, 2, 0))
+        self.assertEqual(self.counts(second_id), (0, 0, 1, 1))
+
+        self.client.post('/users/unsubscribe/', json.dumps({"writer_ids": [first_id, second_id]}),
+                         content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(self.counts(self.id), (0, 0, 0, 0))
+        self.assertEqual(self.counts(first_id), (0, 0, 1, 0))
+
+        data = self.client.get(f'/users/{first_id}/', HTTP_AUTHORIZATION=self.token).json()
+        self.assertEqual((data['count_subscribers'], data['count_subscriptions']), (1, 0))
+        self.assertFalse(data['subscribing'])
+
+    def test_profile_edit_keeps_counts(self):
+        self.post(is_public=True)
+        _, other_id = self.users[1]
+        self.client.post(f'/users/{other_id}/subscribe/', HTTP_AUTHORIZATION=self.token)
+        response = self.client.put('/users/me/', json.dumps({"description": "changed", "nickname": "renamed"}),
+                                   content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.counts(self.id), (1, 1, 0, 1))
+        self.assertEqual(UserProfile.objects.get(user_id=self.id).nickname, 'renamed')
+
+    def test_retrieve_is_one_profile_read(self):
+        self.post(is_public=True)
+        _, other_id = self.users[1]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/users/{self.id}/', HTTP_AUTHORIZATION=self.users[1][0])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count_public_postings'], 1)
+        self.assertEqual(sum('user_userprofile' in query['sql'] for query in queries.captured_queries), 1)
+        self.assertFalse(any('posting_posting' in query['sql'] for query in queries.captured_queries))
+
+    def test_retrieve_unknown_user(self):
+        for pk in ('0', 'someone'):
+            response = self.client.get(f'/users/{pk}/', HTTP_AUTHORIZATION=self.token)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.json()['errorcode'], 10003)
+
+    def test_recount_user_stats(self):
+        self.post(is_public=True)
+        self.post(is_public=False)
+        _, other_id = self.users[1]
+        self.client.post(f'/users/{other_id}/subscribe/', HTTP_AUTHORIZATION=self.token)
+        expected = {user_id: self.counts(user_id) for _, user_id in self.users}
+
+        UserProfile.objects.update(public_postings_count=7, all_postings_count=7,
+                                   subscribers_count=7, subscriptions_count=7)
+        out = StringIO()
+        call_command('recount_user_stats', chunk_size=2, stdout=out)
+        self.assertEqual({user_id: self.counts(user_id) for _, user_id in self.users}, expected)
+        self.assertEqual(expected[self.id], (1, 2, 0, 1))
+        self.assertIn('checked 3 users, repaired 3', out.getvalue())
+
+
+class NicknameTestCase(TestCase):
+    client = Client()
+
+    @patch("user.views.check_token", mocked_check_token)
+    def setUp(self):
+        self.users = []
+        for i, nickname in enumerate(['snow', 'Snowman', 'snowball', 'rain', '눈사람']):
+            response = self.client.post(
+                '/users/',
+                json.dumps({
+                    "facebookid": str(i),
+                    "access_token": str(i),
+                    "nickname": nickname,
+                }),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.users.append(("Token " + response.json()["access_token"], response.json()["user"]["id"]))
+        self.token, self.id = self.users[0]
+
+    def available(self, nickname):
+        response = self.client.get('/users/nickname/', {'nickname': nickname})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()['available']
+
+    def search(self, prefix, **params):
+        response = self.client.get('/users/search/', dict(prefix=prefix, **params), HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_availability(self):
+        self.assertFalse(self.available('snow'))
+        self.assertFalse(self.available('눈사람'))
+        self.assertTrue(self.available('snowy'))
+        self.assertFalse(self.available(''))
+
+    def test_free_nickname_answered_from_memory(self):
+        self.available('snow')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.available('hail'))
+        self.assertEqual(len(queries), 0)
+        # a hit is only a candidate, the unique index confirms it
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(self.available('rain'))
+        self.assertEqual(len(queries), 1)
+
+    def test_rename_applies_at_once(self):
+        self.assertFalse(self.available('snow'))
+        response = self.client.put('/users/me/', json.dumps({"nickname": "sleet"}),
+                                   content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.available('snow'))
+        self.assertFalse(self.available('sleet'))
+        self.assertEqual(self.search('sle')['users'], [{'id': self.id, 'nickname': 'sleet'}])
+
+    @patch("user.views.check_token", mocked_check_token)
+    def test_unique_index_has_last_word(self):
+        # taken by another worker since this one filled its index
+        self.available('snow')
+        user = User.objects.create(username='other')
+        UserProfile.objects.bulk_create([UserProfile(user=user, facebook_id='other', nickname='hail')])
+        self.assertTrue(self.available('hail'))
+
+        response = self.client.post(
+            '/users/',
+            json.dumps({"facebookid": "9", "access_token": "9", "nickname": "hail"}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['errorcode'], 10002)
+        self.assertFalse(User.objects.filter(username='9').exists())
+
+        response = self.client.put('/users/me/', json.dumps({"nickname": "hail"}),
+                                   content_type='application/json', HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['errorcode'], 10002)
+
+        # the next refill sees it
+        nickname_index.clear()
+        self.assertFalse(self.available('hail'))
+
+    def test_refill_does_not_block_readers(self):
+        self.assertFalse(self.available('snow'))
+        started, release = threading.Event(), threading.Event()
+
+        def slow_read():
+            started.set()
+            release.wait(5)
+            return [('rain', self.users[3][1], 'rain')]
+
+        with patch.object(nickname_index, 'read', slow_read), patch.object(nickname_index, 'refresh', 0):
+            refill = threading.Thread(target=nickname_index.contains, args=('snow', ))
+            refill.start()
+            self.assertTrue(started.wait(5))
+            # the old entries answer meanwhile, and a save now outlives the refill
+            self.assertTrue(nickname_index.contains('snow'))
+            nickname_index.saved(self.id, 'sleet')
+            release.set()
+            refill.join(5)
+        self.assertFalse(nickname_index.contains('snow'))
+        self.assertTrue(nickname_index.contains('sleet'))
+        self.assertTrue(nickname_index.contains('rain'))
+
+    def test_search_prefix(self):
+        data = self.search('sNoW')
+        self.assertEqual([user['nickname'] for user in data['users']], ['snow', 'snowball', 'Snowman'])
+        self.assertFalse(data['has_next'])
+        self.assertEqual(self.search('눈')['users'], [{'id': self.users[4][1], 'nickname': '눈사람'}])
+        self.assertEqual(self.search('hail')['users'], [])
+
+    def test_search_pages(self):
+        first = self.search('snow', page_size=2)
+        self.assertEqual([user['nickname'] for user in first['users']], ['snow', 'snowball'])
+        self.assertTrue(first['has_next'])
+        second = self.search('snow', page_size=2, cursor=first['cursor'])
+        self.assertEqual([user['nickname'] for user in second['users']], ['Snowman'])
+        self.assertFalse(second['has_next'])
+
+        response = self.client.get('/users/search/', {'prefix': 'snow', 'cursor': 'x'},
+                                   HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.json()['errorcode'], 50001)
+
+    def test_search_requires_authentication(self):
+        response = self.client.get('/users/search/', {'prefix': 'snow'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
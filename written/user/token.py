@@ -1,21 +1,98 @@
+import functools
+import hashlib
+import json
+
 import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
 from rest_framework import status
 
+from written.aio import outbound
+
+
+class FacebookTokenVerifier:
+    # Resolves Facebook access tokens to user ids through the Graph API.
+    #
+    # Calls share one pooled session (or any `transport` with the requests.Session
+    # `get` signature), are bounded by connect/read timeouts, and successful
+    # lookups are cached under a hash of the token, never the token itself.
+    # Settings are read per call so tests can point FACEBOOK_GRAPH_URL at a stub.
+
+    def __init__(self, transport=None):
+        self.transport = transport or self.make_session()
+
+    @staticmethod
+    def make_session():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.FACEBOOK_POOL_SIZE, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @staticmethod
+    def cache_key(access_token):
+        return 'facebook:token:' + hashlib.sha256(access_token.encode()).hexdigest()
+
+    def facebook_id(self, access_token):
+        key = self.cache_key(access_token)
+        facebook_id = cache.get(key)
+        if facebook_id is None:
+            facebook_id = self.fetch_facebook_id(access_token)
+            if facebook_id is not None:
+                cache.set(key, facebook_id, settings.FACEBOOK_TOKEN_CACHE_TIMEOUT)
+        return facebook_id
+
+    def fetch_facebook_id(self, access_token):
+        try:
+            response = self.transport.get(
+                f'{settings.FACEBOOK_GRAPH_URL}/me',
+                params={'access_token': access_token},
+                timeout=(settings.FACEBOOK_CONNECT_TIMEOUT, settings.FACEBOOK_READ_TIMEOUT),
+            )
+        except requests.RequestException:
+            return None
+        if response.status_code != status.HTTP_200_OK:
+            return None
+        try:
+            return str(response.json()['id'])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def check(self, data):
+        access_token = data.get('access_token')
+        facebookid = data.get('facebookid')
+        if not access_token or not facebookid:
+            return False
+        if self.facebook_id(access_token) != facebookid:
+            return False
+        data["username"] = facebookid
+        return True
+
+
+verifier = FacebookTokenVerifier()
+
 
 def check_token(data):
-    access_token = data.get('access_token')
-    facebookid = data.get('facebookid')
-    if not access_token or not facebookid:
-        return False
-    url = f"https://graph.facebook.com/v7.0/me?access_token={access_token}"
-    response = requests.get(url)
-    if response.status_code != status.HTTP_200_OK:
-        return False
-    response_data = response.json()
-    if response_data["id"] != facebookid:
-        return False
-    data["username"] = facebookid
-    return True
+    return verifier.check(data)
+
+
+def prefetch_facebook_id(view):
+    # For an async view that calls check_token: the Graph API is asked on the outbound
+    # executor first, so the view finds the id in the cache and holds no database thread
+    # while Facebook answers.
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            access_token = json.loads(request.body).get('access_token')
+        except (ValueError, AttributeError):
+            access_token = None
+        if isinstance(access_token, str) and access_token:
+            await outbound(verifier.facebook_id, access_token)
+        return await view(request, *args, **kwargs)
+
+    return wrapper
 
 
 def mocked_check_token(data):
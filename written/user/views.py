@@ -9,15 +9,25 @@ from user.models import UserProfile
 from user.serializers import UserSerializer
 from rest_framework.authtoken.models import Token
 import requests
+from subscription import hooks as subscription_hooks
 from subscription.models import Subscription
+from written import projection
+from written.bulk import failed, parse_ids, succeeded
 from written.error_codes import *
+from written.pagination import STRING, Keyset
+from user.authentication import token_cache
+from user import nicknames
 from user.token import check_token
-from posting.models import Posting
-from django.db import connection
+from posting import hooks as posting_hooks
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
 
 
 # API User==================================================================
 # POST /users/
+# GET /users/?ids=
+# GET /users/nickname/?nickname=
+# GET /users/search/?prefix=
 # PUT /users/login/
 # GET /users/me/
 # GET /users/{user_id}/
@@ -27,17 +37,11 @@ from django.db import connection
 # API Subscription===========================================================
 # POST /users/{user_id}/subscribe/
 # POST /users/{user_id}/unsubscribe/
+# POST /users/subscribe/
+# POST /users/unsubscribe/
 # GET /users/subscribed/
 # GET /users/subscriber/
 
-def dict_fetch_all(cursor):
-    # Return all rows from a cursor as a dict
-    columns = [col[0] for col in cursor.description]
-    return [
-        dict(zip(columns, row))
-        for row in cursor.fetchall()
-    ]
-
 
 def get_writer(writer_id):
     try:
@@ -46,20 +50,42 @@ def get_writer(writer_id):
         return None
 
 
-def get_subscription(subscriber_id, writer_id):
+def get_writer_id(writer_id):
     try:
-        return Subscription.objects.get(subscriber_id=subscriber_id, writer_id=writer_id)
-    except Subscription.DoesNotExist:
-        return None
+        return int(writer_id)
+    except ValueError:
+        raise UserDoesNotExistException()
 
 
 class UserViewSet(viewsets.GenericViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticated(),)
+    POSTINGS_KEYSET = Keyset(('posting.id', 'id'), default_page_size=10)
+    SUBSCRIPTIONS_KEYSET = Keyset(('subscription.id', 'subscription_id'), default_page_size=10)
+    # pages of the in-memory nickname index, ascending
+    NICKNAMES_KEYSET = Keyset(('key', 'key', STRING), ('id', 'id'), default_page_size=10)
+    # most queries an action may run, whatever the page size (see written.queries)
+    QUERY_BUDGETS = {
+        'list': 2,
+        'create': 10,
+        'login': 10,
+        'logout': 3,
+        'retrieve': 1,
+        'nickname': 2,
+        'search': 1,
+        'update': 7,
+        'postings_of_user': 3,
+        'subscribe': 5,
+        'unsubscribe': 7,
+        'bulk_subscribe': 7,
+        'bulk_unsubscribe': 8,
+        'list_of_subscribed': 2,
+        'list_of_subscriber': 2,
+    }
 
     def get_permissions(self):
-        if self.action in ('create', 'login'):
+        if self.action in ('create', 'login', 'nickname'):
             return (AllowAny(),)
         return self.permission_classes
 
@@ -67,12 +93,7 @@ class UserViewSet(viewsets.GenericViewSet):
     # =======================================================================
 
     def check_nickname(self, data):
-        nickname = data.get("nickname")
-        if not nickname:
-            return False
-        if UserProfile.objects.filter(nickname=nickname).count() != 0:
-            return False
-        return True
+        return nicknames.is_available(data.get("nickname"))
 
     # POST /users/
     def create(self, request):
@@ -87,13 +108,62 @@ class UserViewSet(viewsets.GenericViewSet):
         except IntegrityError:
             raise UserAlreadySignedUpException()
 
-        login(request, user)
         nickname = request.data.get('nickname')
-        UserProfile.objects.create(user=user, nickname=nickname, facebook_id=request.data.get('facebookid'))
+        try:
+            with transaction.atomic():
+                UserProfile.objects.create(user=user, nickname=nickname, facebook_id=request.data.get('facebookid'))
+        except IntegrityError:
+            # taken since the check: the unique index has the last word
+            user.delete()
+            raise NicknameDuplicateException()
+        login(request, user)
         data = {'user': serializer.data, 'access_token': user.auth_token.key}
 
         return Response(data, status=status.HTTP_201_CREATED)
 
+    # GET /users/?ids=
+    def list(self, request):
+        user_ids = parse_ids(request.query_params.get('ids'))
+
+        # what GET /users/{user_id}/ shows of another user, read off the profile rows
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        raw_query = f'''
+            SELECT profile.user_id AS id, profile.nickname, profile.description, profile.first_posted_at,
+                profile.public_postings_count, profile.subscribers_count, profile.subscriptions_count,
+                EXISTS (SELECT 1 FROM subscription_subscription AS subscription
+                        WHERE subscription.writer_id = profile.user_id
+                        AND subscription.subscriber_id = %s) AS subscribing
+            FROM user_userprofile AS profile
+            WHERE profile.user_id IN ({placeholders});
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(raw_query, [request.user.id] + user_ids)
+            rows = {row['id']: row for row in projection.dict_fetch_all(cursor)}
+
+        results = [
+            succeeded(user_id, user=projection.profile(rows[user_id])) if user_id in rows
+            else failed(user_id, UserDoesNotExistException())
+            for user_id in user_ids
+        ]
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    # GET /users/nickname/?nickname=
+    @action(detail=False, methods=['GET'], url_path='nickname')
+    def nickname(self, request):
+        nickname = request.query_params.get('nickname', '')
+        return Response({'nickname': nickname, 'available': nicknames.is_available(nickname)},
+                        status=status.HTTP_200_OK)
+
+    # GET /users/search/?prefix=
+    # users whose nickname starts with the prefix, ignoring case, for mention autocomplete
+    @action(detail=False, methods=['GET'], url_path='search')
+    def search(self, request):
+        page = self.NICKNAMES_KEYSET.page(request, descending=False)
+        rows = nicknames.nickname_index.search(request.query_params.get('prefix', ''), page.after, page.limit)
+        rows, has_next, next_cursor = page.paginate(rows)
+        users = [{'id': row['id'], 'nickname': row['nickname']} for row in rows]
+        return Response({'users': users, 'has_next': has_next, 'cursor': next_cursor}, status=status.HTTP_200_OK)
+
     # PUT /users/login/
     @action(detail=False, methods=['PUT'])
     def login(self, request):
@@ -112,28 +182,28 @@ class UserViewSet(viewsets.GenericViewSet):
     @action(detail=False, methods=['POST'])
     def logout(self, request):
         logout(request)
+        if request.auth is not None:
+            token_cache.delete(request.auth.key)
         return Response()
 
     # GET /users/me/  GET /users/{user_id}/
     def retrieve(self, request, pk=None):
+        # one profile row: the counts are kept on it (see user.counters)
+        profiles = UserProfile.objects.values(
+            'user_id', 'nickname', 'description', 'first_posted_at', 'public_postings_count', 'all_postings_count',
+            'subscribers_count', 'subscriptions_count',
+        )
+        if pk != "me":
+            profiles = profiles.annotate(subscribing=Exists(
+                Subscription.objects.filter(subscriber_id=request.user.id, writer_id=OuterRef('user_id'))
+            ))
         try:
-            if pk == "me":
-                user = request.user
-            else:
-                user = User.objects.get(id=pk)
-        except User.DoesNotExist:
+            row = profiles.get(user_id=request.user.id if pk == "me" else pk)
+        except (UserProfile.DoesNotExist, ValueError):
             raise UserDoesNotExistException()
-        data = self.get_serializer(user).data
-        data["count_public_postings"] = user.postings.filter(is_public=True).count()
+        data = projection.profile(dict(row, id=row['user_id']))
         if pk == "me":
-            data["count_all_postings"] = user.postings.count()
-        else:
-            try:
-                Subscription.objects.get(subscriber=request.user, writer=user)
-                subscribing = True
-            except Subscription.DoesNotExist:
-                subscribing = False
-            data["subscribing"] = subscribing
+            data["count_all_postings"] = row['all_postings_count']
         return Response(data, status=status.HTTP_200_OK)
 
     # PUT /users/me/
@@ -146,68 +216,55 @@ class UserViewSet(viewsets.GenericViewSet):
         if description:
             profile = user.userprofile
             profile.description = description
-            profile.save()
+            # only the field changed: the counters this instance carries may already be stale
+            profile.save(update_fields=['description'])
         if nickname:
             profile = user.userprofile
-            if nickname != profile.nickname and UserProfile.objects.filter(nickname=nickname).count() != 0:
+            if nickname != profile.nickname and not nicknames.is_available(nickname):
                 raise NicknameDuplicateException
-            profile.nickname = nickname
-            profile.save()
+            if nickname != profile.nickname:
+                profile.nickname = nickname
+                try:
+                    with transaction.atomic():
+                        profile.save(update_fields=['nickname'])
+                        posting_hooks.writer_renamed(user.id)
+                except IntegrityError:
+                    raise NicknameDuplicateException
         return Response(self.get_serializer(user).data, status=status.HTTP_200_OK)
 
     # GET /users/{user_id}/postings/
     @action(detail=True, methods=['GET'], url_path='postings')
     def postings_of_user(self, request, pk):
-        try:
-            DEFAULT_CURSOR = Posting.objects.last().id + 1
-        except AttributeError:
-            DEFAULT_CURSOR = 0
         try:
             user = User.objects.get(id=pk)
-        except User.DoseNotExist:
+        except (User.DoesNotExist, ValueError):
             raise UserDoesNotExistException()
 
-        try:
-            cursor = int(request.GET['cursor'])
-        except KeyError:
-            cursor = DEFAULT_CURSOR
-        try:
-            page_size = int(request.GET['page_size'])
-        except KeyError:
-            page_size = 10
+        page = self.POSTINGS_KEYSET.page(request)
+        fields = projection.PostingFields.from_request(request)
+        seek, params = page.seek()
 
         if str(request.user.id) == pk:
             check_public = ''
         else:
             check_public = 'AND posting.is_public = True '
 
-        pagination_query = f'SELECT posting.id AS id, user.id AS user_id, nickname, content, alignment, name, is_public, posting.created_at AS created_at ' \
+        pagination_query = f'SELECT {fields.columns} ' \
                            f'FROM posting_posting AS posting ' \
                            f'INNER JOIN auth_user AS user ' \
                            f'INNER JOIN title_title AS title ' \
                            f'INNER JOIN user_userprofile AS profile ' \
                            f'ON posting.writer_id = user.id AND user.id = profile.user_id AND posting.title_id = title.id ' \
-                           f'WHERE user.id = {user.id} AND posting.id < {cursor} {check_public}' +  \
-                           f'ORDER BY posting.id DESC ' \
-                           f'LIMIT {page_size + 1};'
+                           f'WHERE user.id = %s AND {seek} {check_public}' +  \
+                           f'ORDER BY {page.order_by()} ' \
+                           f'LIMIT %s;'
 
         with connection.cursor() as cursor:
-            cursor.execute(pagination_query)
-            rows = dict_fetch_all(cursor)
-
-        postings = []
-        for i in range(min(len(rows), page_size)):
-            row = rows[i]
-            writer = {"id": row['user_id'], "nickname": row['nickname']}
-            postings.append({"id": row["id"], "title": row["name"], "writer": writer,
-                             "content": row["content"], "alignment": row["alignment"],
-                             "is_public": bool(row["is_public"]), "created_at": row["created_at"]})
-        if len(rows) == page_size + 1:
-            next_cursor = rows[len(rows) - 2]['id']
-            has_next = True
-        else:
-            next_cursor = None
-            has_next = False
+            cursor.execute(pagination_query, [user.id] + params + [page.limit])
+            rows = projection.dict_fetch_all(cursor)
+
+        rows, has_next, next_cursor = page.paginate(rows)
+        postings = fields.project(rows)
 
         return Response({"postings": postings, "has_next": has_next, "cursor": next_cursor}, status=status.HTTP_200_OK)
 
@@ -217,123 +274,132 @@ class UserViewSet(viewsets.GenericViewSet):
     @action(detail=True, methods=['POST'], url_path='subscribe')
     def subscribe(self, request, pk):
         subscriber_id = request.user.id
-        writer = get_writer(pk)
-        if writer is None:
-            raise UserDoesNotExistException()
-        sb = get_subscription(subscriber_id, pk)
-        if sb is None:
-            sb = Subscription.objects.create(subscriber_id=subscriber_id, writer_id=pk)
-        else:
-            raise AlreadySubscribedException()
+        writer_id = get_writer_id(pk)
+        with transaction.atomic():
+            if not Subscription.add(subscriber_id, writer_id):
+                # only a failed write pays for finding out why
+                if get_writer(writer_id) is None:
+                    raise UserDoesNotExistException()
+                raise AlreadySubscribedException()
+            subscription_hooks.subscribed(subscriber_id, writer_id)
         return Response(status=status.HTTP_200_OK)
 
     # POST /users/{user_id}/unsubscribe/
     @action(detail=True, methods=['POST'], url_path='unsubscribe')
     def unsubscribe(self, request, pk):
         subscriber_id = request.user.id
-        writer = get_writer(pk)
-        if writer is None:
-            raise UserDoesNotExistException()
-        sb = get_subscription(subscriber_id, pk)
-        if sb is None:
-            raise AlreadyUnsubscribedException()
-        sb.delete()
+        writer_id = get_writer_id(pk)
+        with transaction.atomic():
+            if not Subscription.remove(subscriber_id, writer_id):
+                if get_writer(writer_id) is None:
+                    raise UserDoesNotExistException()
+                raise AlreadyUnsubscribedException()
+            subscription_hooks.unsubscribed(subscriber_id, writer_id)
         return Response(status=status.HTTP_200_OK)
 
+    def subscription_states(self, subscriber_id, writer_ids):
+        # {writer_id: subscribed} of the writers that exist, in one query.
+        # The writer rows stay locked until the caller's transaction ends, so a concurrent bulk
+        # request, or a subscribe whose insert checks the same rows, cannot change a subscription
+        # between this read and the write the hooks count.
+        subscribed = Subscription.objects.filter(subscriber_id=subscriber_id, writer_id=OuterRef('id'))
+        rows = User.objects.select_for_update().filter(id__in=writer_ids).annotate(subscribed=Exists(subscribed))
+        return dict(rows.values_list('id', 'subscribed'))
+
+    # POST /users/subscribe/ {"writer_ids": [...]}
+    @action(detail=False, methods=['POST'], url_path='subscribe', url_name='bulk-subscribe')
+    def bulk_subscribe(self, request):
+        subscriber_id = request.user.id
+        writer_ids = parse_ids(request.data.get('writer_ids'))
+        with transaction.atomic():
+            states = self.subscription_states(subscriber_id, writer_ids)
+            results, writers = [], []
+            for writer_id in writer_ids:
+                if writer_id not in states:
+                    results.append(failed(writer_id, UserDoesNotExistException))
+                elif states[writer_id]:
+                    results.append(failed(writer_id, AlreadySubscribedException))
+                else:
+                    results.append(succeeded(writer_id))
+                    writers.append(writer_id)
+            if writers:
+                Subscription.add_many(subscriber_id, writers)
+                subscription_hooks.subscribed(subscriber_id, *writers)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    # POST /users/unsubscribe/ {"writer_ids": [...]}
+    @action(detail=False, methods=['POST'], url_path='unsubscribe', url_name='bulk-unsubscribe')
+    def bulk_unsubscribe(self, request):
+        subscriber_id = request.user.id
+        writer_ids = parse_ids(request.data.get('writer_ids'))
+        with transaction.atomic():
+            states = self.subscription_states(subscriber_id, writer_ids)
+            results, writers = [], []
+            for writer_id in writer_ids:
+                if writer_id not in states:
+                    results.append(failed(writer_id, UserDoesNotExistException))
+                elif not states[writer_id]:
+                    results.append(failed(writer_id, AlreadyUnsubscribedException))
+                else:
+                    results.append(succeeded(writer_id))
+                    writers.append(writer_id)
+            if writers:
+                Subscription.remove_many(subscriber_id, writers)
+                subscription_hooks.unsubscribed(subscriber_id, *writers)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
     # GET /users/subscribed/
     # list of writers
     @action(detail=False, methods=['GET'], url_path='subscribed')
     def list_of_subscribed(self, request):
-        try:
-            DEFAULT_CURSOR = Subscription.objects.last().id + 1
-        except AttributeError:
-            DEFAULT_CURSOR = 0
-        DEFAULT_PAGE_SIZE = 10
-
         user_id = request.user.id
-        my_cursor = int(request.query_params.get('cursor')) if request.query_params.get(
-            'cursor') else DEFAULT_CURSOR
-        page_size = int(request.query_params.get('page_size')) if request.query_params.get(
-            'page_size') else DEFAULT_PAGE_SIZE
+        page = self.SUBSCRIPTIONS_KEYSET.page(request)
+        seek, params = page.seek()
 
         # PAGINATION QUERY
         pagination_query = f'''
             SELECT user.id, userprofile.nickname, userprofile.description, subscription.id as 'subscription_id'
             FROM auth_user AS user
-            INNER JOIN subscription_subscription subscription on {user_id} = subscription.subscriber_id
+            INNER JOIN subscription_subscription subscription on %s = subscription.subscriber_id
             INNER JOIN user_userprofile userprofile on user.id = userprofile.user_id
-            WHERE subscription.id < {my_cursor} AND subscription.writer_id = user.id
-            ORDER BY subscription.id DESC
-            LIMIT {page_size + 1};
+            WHERE {seek} AND subscription.writer_id = user.id
+            ORDER BY {page.order_by()}
+            LIMIT %s;
             '''
         with connection.cursor() as cursor:
-            cursor.execute(pagination_query)
-            rows = dict_fetch_all(cursor)
+            cursor.execute(pagination_query, [user_id] + params + [page.limit])
+            rows = projection.dict_fetch_all(cursor)
 
-        # SET RETURN VALUE: 'has_next'
-        if len(rows) == page_size + 1:
-            has_next = True
-            del rows[-1]
-        else:
-            has_next = False
+        # SET RETURN VALUE: 'has_next', 'cursor'
+        rows, has_next, next_cursor = page.paginate(rows)
 
-        # SET RETURN VALUE: 'cursor'
-        if has_next:
-            next_cursor = rows[-1]['subscription_id']
-        else:
-            next_cursor = None
-
-        for i in range(len(rows)):
-            del rows[i]['subscription_id']
-
-        data = {'writers': rows, 'has_next': has_next, 'cursor': next_cursor}
+        data = {'writers': projection.project(rows, projection.user), 'has_next': has_next, 'cursor': next_cursor}
         return Response(data, status=status.HTTP_200_OK)
 
     # GET /users/subscriber/
     # list of subscribers
     @action(detail=False, methods=['GET'], url_path='subscriber')
     def list_of_subscriber(self, request):
-        try:
-            DEFAULT_CURSOR = Subscription.objects.last().id + 1
-        except AttributeError:
-            DEFAULT_CURSOR = 0
-        DEFAULT_PAGE_SIZE = 10
-
         user_id = request.user.id
-        my_cursor = int(request.query_params.get('cursor')) if request.query_params.get(
-            'cursor') else DEFAULT_CURSOR
-        page_size = int(request.query_params.get('page_size')) if request.query_params.get(
-            'page_size') else DEFAULT_PAGE_SIZE
+        page = self.SUBSCRIPTIONS_KEYSET.page(request)
+        seek, params = page.seek()
 
         # PAGINATION QUERY
         pagination_query = f'''
                     SELECT user.id, userprofile.nickname, userprofile.description, subscription.id as 'subscription_id'
                     FROM auth_user AS user
-                    INNER JOIN subscription_subscription subscription on {user_id} = subscription.writer_id
+                    INNER JOIN subscription_subscription subscription on %s = subscription.writer_id
                     INNER JOIN user_userprofile userprofile on user.id = userprofile.user_id
-                    WHERE subscription.id < {my_cursor} AND subscription.subscriber_id = user.id
-                    ORDER BY subscription.id DESC
-                    LIMIT {page_size + 1};
+                    WHERE {seek} AND subscription.subscriber_id = user.id
+                    ORDER BY {page.order_by()}
+                    LIMIT %s;
                     '''
         with connection.cursor() as cursor:
-            cursor.execute(pagination_query)
-            rows = dict_fetch_all(cursor)
-
-        # SET RETURN VALUE: 'has_next'
-        if len(rows) == page_size + 1:
-            has_next = True
-            del rows[-1]
-        else:
-            has_next = False
-
-        # SET RETURN VALUE: 'cursor'
-        if has_next:
-            next_cursor = rows[-1]['subscription_id']
-        else:
-            next_cursor = None
+            cursor.execute(pagination_query, [user_id] + params + [page.limit])
+            rows = projection.dict_fetch_all(cursor)
 
-        for i in range(len(rows)):
-            del rows[i]['subscription_id']
+        # SET RETURN VALUE: 'has_next', 'cursor'
+        rows, has_next, next_cursor = page.paginate(rows)
 
-        data = {'subscribers': rows, 'has_next': has_next, 'cursor': next_cursor}
+        data = {'subscribers': projection.project(rows, projection.user), 'has_next': has_next, 'cursor': next_cursor}
         return Response(data, status=status.HTTP_200_OK)
@@ -0,0 +1,55 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+
+# Under ASGI, Django runs every sync view on one shared thread, a request at a time.
+# The async views here run their viewset action on the default executor instead (sized
+# by ASGI_THREADS), each thread with a database connection of its own, so a single
+# worker has as many requests in flight as it has threads.
+
+# calls to other services wait here, a slow Graph API cannot take every database thread
+outbound_executor = ThreadPoolExecutor(max_workers=settings.FACEBOOK_POOL_SIZE, thread_name_prefix='outbound')
+
+
+def database_sync_to_async(func):
+    # func on an executor thread, whose connection is recycled as at the start and end of a request
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def outbound(func, *args):
+    return await asyncio.get_event_loop().run_in_executor(outbound_executor, functools.partial(func, *args))
+
+
+def rendered(response):
+    # A DRF response rendered on the executor thread. Django would render it on the
+    # shared sync thread otherwise, so it goes back as a plain HttpResponse.
+    response.render()
+    plain = HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        plain[header] = value
+    plain.cookies = response.cookies
+    return plain
+
+
+def async_view(view):
+    # the same view, URL kwargs and responses, as an async view; keeps view.cls and view.actions
+    run = database_sync_to_async(lambda request, *args, **kwargs: rendered(view(request, *args, **kwargs)))
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run(request, *args, **kwargs)
+
+    return wrapper
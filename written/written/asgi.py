@@ -9,8 +9,25 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'written.settings')
 
+
+class WrittenASGIRequest(ASGIRequest):
+    # resolved against the routes with async feeds and login
+    urlconf = 'written.asgi_urls'
+
+
+class WrittenASGIHandler(ASGIHandler):
+    request_class = WrittenASGIRequest
+
+
+def get_asgi_application():
+    # django.core.asgi.get_asgi_application() with our handler
+    django.setup(set_prefix=False)
+    return WrittenASGIHandler()
+
+
 application = get_asgi_application()
@@ -0,0 +1,49 @@
+"""written URL Configuration for ASGI
+
+The same routes as written.urls, with the read-heavy feeds and the Facebook login
+as async views (see written.aio). written.asgi resolves its requests against this.
+"""
+from django.contrib import admin
+from django.urls import include, path, re_path
+
+from posting.urls import router as posting_router
+from title.urls import router as title_router
+from user.token import prefetch_facebook_id
+from user.urls import router as user_router
+from written.aio import async_view
+
+
+def login_view(view):
+    return prefetch_facebook_id(async_view(view))
+
+
+def routes(router, app_name, decorators):
+    # the router's patterns in their order, the views named in `decorators` decorated
+    patterns = []
+    for url in router.urls:
+        decorate = decorators.get(url.name)
+        patterns.append(re_path(str(url.pattern), decorate(url.callback), name=url.name) if decorate else url)
+    return path('', include((patterns, app_name)))
+
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    routes(user_router, 'user', {
+        'users-list': login_view,
+        'users-login': login_view,
+        'users-postings-of-user': async_view,
+        'users-list-of-subscribed': async_view,
+        'users-list-of-subscriber': async_view,
+    }),
+    routes(posting_router, 'posting', {
+        'postings-list': async_view,
+        'postings-detail': async_view,
+        'postings-scrapped': async_view,
+        'postings-subscribed': async_view,
+    }),
+    routes(title_router, 'title', {
+        'titles-list': async_view,
+        'titles-today': async_view,
+        'titles-postings': async_view,
+    }),
+]
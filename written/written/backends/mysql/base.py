@@ -0,0 +1,7 @@
+from django.db.backends.mysql import base
+
+from written.backends.pooling import PooledConnectionMixin
+
+
+class DatabaseWrapper(PooledConnectionMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils.asyncio import async_unsafe
+
+logger = logging.getLogger('written.db')
+
+
+def milliseconds(latencies, quantile):
+    if not latencies:
+        return None
+    return round(latencies[min(len(latencies) - 1, int(len(latencies) * quantile))] * 1000, 3)
+
+
+class PoolStats:
+    # Process-wide numbers for sizing workers against MySQL's max_connections:
+    # how often a request finds a connection it can reuse, and what a new one costs.
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.checkouts = 0
+            self.reused = 0
+            self.broken = 0
+            self.connects = 0
+            self.connect_seconds = 0.0
+            self.latencies = deque(maxlen=self.window)
+
+    def checked_out(self, reused, broken=False):
+        with self.lock:
+            self.checkouts += 1
+            self.reused += reused
+            self.broken += broken
+            checkouts = self.checkouts
+        interval = getattr(settings, 'DB_POOL_STATS_LOG_INTERVAL', 0)
+        if interval and checkouts % interval == 0:
+            logger.info('connection pool %s', self.snapshot())
+
+    def connected(self, seconds):
+        with self.lock:
+            self.connects += 1
+            self.connect_seconds += seconds
+            self.latencies.append(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return {
+                'checkouts': self.checkouts,
+                'reused': self.reused,
+                'broken': self.broken,
+                'connects': self.connects,
+                'reuse_ratio': round(self.reused / self.checkouts, 4) if self.checkouts else None,
+                'connect_ms_avg': round(self.connect_seconds / self.connects * 1000, 3) if self.connects else None,
+                'connect_ms_p95': milliseconds(latencies, 0.95),
+                'connect_ms_max': milliseconds(latencies, 1),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class PooledConnectionMixin:
+    # Mixed into a backend's DatabaseWrapper. With CONN_MAX_AGE > 0 a thread keeps its
+    # connection between requests; the first time a request touches the database
+    # (a checkout), a kept connection is pinged when CONN_HEALTH_CHECKS is on and
+    # replaced if the server dropped it, instead of failing the request.
+
+    checked_out = False
+
+    def get_new_connection(self, conn_params):
+        start = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        pool_stats.connected(time.perf_counter() - start)
+        return connection
+
+    def close_if_unusable_or_obsolete(self):
+        # runs on request_started / request_finished, so the next use is a new checkout;
+        # its own get_autocommit() call is not one
+        self.checked_out = True
+        try:
+            super().close_if_unusable_or_obsolete()
+        finally:
+            self.checked_out = False
+
+    @async_unsafe
+    def ensure_connection(self):
+        if not self.checked_out:
+            self.checked_out = True
+            self.check_out()
+        super().ensure_connection()
+
+    def check_out(self):
+        if self.connection is None:
+            pool_stats.checked_out(reused=False)
+            return
+        if self.settings_dict.get('CONN_HEALTH_CHECKS') and not self.in_atomic_block and not self.is_usable():
+            self.close()
+            pool_stats.checked_out(reused=False, broken=True)
+            return
+        pool_stats.checked_out(reused=True)
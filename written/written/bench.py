@@ -0,0 +1,649 @@
+import asyncio
+import datetime
+import io
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+import timeit
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import accumulate
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from posting.models import Posting
+from posting.serializers import PostingDictSerializer
+from scrap.models import Scrap
+from subscription.models import Subscription
+from title.models import Title
+from title.serializers import TitleSmallSerializer
+from user import token
+from user.authentication import token_cache
+from user.models import UserProfile
+from written import projection
+from written.asgi import WrittenASGIHandler
+from written.queries import view_action
+
+TODAY_TITLE = '첫 눈'
+SYLLABLES = '가나다라마바사아자차카타파하눈비물불꽃별달밤낮길숲강산바람구름하늘'
+
+
+class StubGraphTransport:
+    # stands in for the Graph API: an access token 'bench:<facebookid>' belongs to <facebookid>,
+    # told after `latency` seconds
+
+    class Response:
+        status_code = 200
+
+        def __init__(self, facebook_id):
+            self.facebook_id = facebook_id
+
+        def json(self):
+            return {'id': self.facebook_id}
+
+    def __init__(self, latency=0):
+        self.latency = latency
+
+    def get(self, url, params=None, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.Response(params['access_token'].split(':', 1)[1])
+
+
+def access_token(facebook_id):
+    return f'bench:{facebook_id}'
+
+
+def skewed(population, exponent, rng):
+    # Zipf-like: the i-th element is picked with weight 1 / (i + 1) ** exponent
+    population = list(population)
+    rng.shuffle(population)
+    weights = list(accumulate(1 / (rank + 1) ** exponent for rank in range(len(population))))
+    return lambda k=1: rng.choices(population, cum_weights=weights, k=k)
+
+
+def seed(users=1000, titles=200, postings=20000, scraps=20000, subscriptions=10000,
+         public_ratio=0.7, exponent=1.1, batch_size=1000, rng=None):
+    rng = rng or random.Random(0)
+
+    User.objects.bulk_create(
+        [User(username=f'bench{i}') for i in range(users)], batch_size=batch_size)
+    usernames = dict(User.objects.filter(username__startswith='bench').values_list('id', 'username'))
+    user_ids = list(usernames)
+    # signing up makes the Facebook id the username, login looks it up that way
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=user_id, facebook_id=username, nickname=username)
+         for user_id, username in usernames.items()], batch_size=batch_size)
+    Token.objects.bulk_create(
+        [Token(user_id=user_id, key=secrets.token_hex(20)) for user_id in user_ids], batch_size=batch_size)
+
+    names = {TODAY_TITLE}
+    while len(names) < titles:
+        names.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    Title.objects.bulk_create(
+        [Title(name=name, is_official=rng.random() < 0.5) for name in names], batch_size=batch_size)
+    title_ids = list(Title.objects.values_list('id', flat=True))
+
+    # a few prolific writers and hot titles, a long tail of the rest
+    writer = skewed(user_ids, exponent, rng)
+    title = skewed(title_ids, exponent, rng)
+    new_postings = [
+        Posting(writer_id=writer_id, title_id=title_id, content=f'bench posting {i}\n' * rng.randint(1, 20),
+                is_public=rng.random() < public_ratio)
+        for i, (writer_id, title_id) in enumerate(zip(writer(postings), title(postings)))]
+    for new_posting in new_postings:
+        new_posting.summarize()
+    Posting.objects.bulk_create(new_postings, batch_size=batch_size)
+
+    public_ids = list(Posting.objects.filter(is_public=True).values_list('id', flat=True))
+    if public_ids:
+        posting = skewed(public_ids, exponent, rng)
+        pairs = set(zip(rng.choices(user_ids, k=scraps), posting(scraps)))
+        Scrap.objects.bulk_create(
+            [Scrap(user_id=user_id, posting_id=posting_id) for user_id, posting_id in pairs],
+            batch_size=batch_size, ignore_conflicts=True)
+
+    pairs = {(subscriber_id, writer_id)
+             for subscriber_id, writer_id in zip(rng.choices(user_ids, k=subscriptions), writer(subscriptions))
+             if subscriber_id != writer_id}
+    Subscription.objects.bulk_create(
+        [Subscription(subscriber_id=subscriber_id, writer_id=writer_id) for subscriber_id, writer_id in pairs],
+        batch_size=batch_size, ignore_conflicts=True)
+
+    # bulk_create skips save() and the hooks, rebuild what they maintain
+    for command in ('recount_title_postings', 'rebuild_title_ngrams', 'rebuild_timeline', 'rebuild_title_activity',
+                    'recount_user_stats'):
+        call_command(command, stdout=io.StringIO())
+
+
+def add_dataset_arguments(parser):
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--titles', type=int, default=200)
+    parser.add_argument('--postings', type=int, default=20000)
+    parser.add_argument('--scraps', type=int, default=20000)
+    parser.add_argument('--subscriptions', type=int, default=10000)
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help='Zipf exponent for how writers, titles and postings are picked')
+    parser.add_argument('--seed', type=int, default=0, help='random seed, for comparable runs')
+    parser.add_argument('--keepdb', action='store_true',
+                        help='keep the benchmark database, and its data, for the next run')
+
+
+@contextmanager
+def seeded_database(options):
+    # Never seeds into the configured database: runs against the test database next
+    # to it, seeded from add_dataset_arguments() options, with Facebook stubbed out.
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+    transport = stub_facebook()
+    try:
+        rng = random.Random(options['seed'])
+        if not UserProfile.objects.exists():
+            seed(users=options['users'], titles=options['titles'], postings=options['postings'],
+                 scraps=options['scraps'], subscriptions=options['subscriptions'],
+                 exponent=options['skew'], rng=rng)
+        yield rng
+    finally:
+        stub_facebook(transport)
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+
+def dataset():
+    return {
+        'users': User.objects.count(),
+        'titles': Title.objects.count(),
+        'postings': Posting.objects.count(),
+        'public_postings': Posting.objects.filter(is_public=True).count(),
+        'scraps': Scrap.objects.count(),
+        'subscriptions': Subscription.objects.count(),
+    }
+
+
+def percentile(values, quantile):
+    # nearest rank on a sorted list
+    return values[min(len(values) - 1, max(0, round(quantile * len(values)) - 1))]
+
+
+class Bench:
+    def __init__(self, iterations=200, warmup=20, exponent=1.1, rng=None):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.rng = rng or random.Random(0)
+        self.client = Client(HTTP_HOST='localhost')
+        self.samples = {}
+        # endpoint: 'ViewSet.action' it was routed to
+        self.actions = {}
+        self.measuring = False
+
+        users = list(UserProfile.objects.values_list('user_id', 'facebook_id'))
+        self.facebook_ids = dict(users)
+        self.keys = dict(Token.objects.values_list('user_id', 'key'))
+        self.user_ids = [user_id for user_id, _ in users if user_id in self.keys]
+        self.writer = skewed(self.user_ids, exponent, self.rng)
+        self.title = skewed(Title.objects.values_list('id', flat=True), exponent, self.rng)
+        self.title_names = list(Title.objects.values_list('name', flat=True))
+        self.public_posting = skewed(Posting.objects.filter(is_public=True).values_list('id', flat=True),
+                                     exponent, self.rng)
+
+    def user(self):
+        return self.rng.choice(self.user_ids)
+
+    def request(self, user_id, method, path, data=None):
+        headers = {'HTTP_AUTHORIZATION': f'Token {self.keys[user_id]}'} if user_id else {}
+        body = json.dumps(data) if data is not None else ''
+        return self.client.generic(method, path, body, content_type='application/json', **headers)
+
+    def measure(self, endpoint, user_id, method, path, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = self.request(user_id, method, path, data)
+            elapsed = time.perf_counter() - started
+        if self.measuring:
+            self.samples.setdefault(endpoint, []).append((elapsed, len(queries), response.status_code))
+            cls, action = view_action(response.resolver_match, method)
+            self.actions[endpoint] = f'{cls.__name__}.{action}' if cls else action
+        return response
+
+    def run(self, scenarios=None, only=None):
+        for scenario in scenarios or SCENARIOS:
+            if only and not any(name in scenario.__name__ for name in only):
+                continue
+            self.measuring = False
+            for _ in range(self.warmup):
+                scenario(self)
+            self.measuring = True
+            for _ in range(self.iterations):
+                scenario(self)
+        return self.report()
+
+    def report(self):
+        report = {}
+        for endpoint, samples in self.samples.items():
+            latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+            queries = [count for _, count, _ in samples]
+            statuses = {}
+            for _, _, status_code in samples:
+                statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+            report[endpoint] = {
+                'samples': len(samples),
+                'p50_ms': round(percentile(latencies, 0.50), 3),
+                'p95_ms': round(percentile(latencies, 0.95), 3),
+                'p99_ms': round(percentile(latencies, 0.99), 3),
+                'mean_ms': round(sum(latencies) / len(latencies), 3),
+                'queries_mean': round(sum(queries) / len(queries), 2),
+                'queries_max': max(queries),
+                'status': statuses,
+                'action': self.actions[endpoint],
+            }
+        return report
+
+
+# Scenarios: one call per iteration, named after what they exercise so --only can pick them.
+# Writes are paired with their inverse so the dataset stays the same size over a run.
+
+def users_signup_login_logout(bench):
+    facebook_id = uuid.uuid4().hex[:20]
+    response = bench.measure('POST /users/', None, 'POST', '/users/', {
+        'access_token': access_token(facebook_id), 'facebookid': facebook_id,
+        'nickname': uuid.uuid4().hex[:16]})
+    key = response.json()['access_token']
+    user_id = response.json()['user']['id']
+    bench.keys[user_id] = key
+    bench.measure('PUT /users/login/', None, 'PUT', '/users/login/', {
+        'access_token': access_token(facebook_id), 'facebookid': facebook_id})
+    bench.measure('POST /users/logout/', user_id, 'POST', '/users/logout/')
+    del bench.keys[user_id]
+    User.objects.filter(id=user_id).delete()
+
+
+def users_login_existing(bench):
+    facebook_id = bench.facebook_ids[bench.user()]
+    bench.measure('PUT /users/login/', None, 'PUT', '/users/login/', {
+        'access_token': access_token(facebook_id), 'facebookid': facebook_id})
+
+
+def users_retrieve(bench):
+    bench.measure('GET /users/me/', bench.user(), 'GET', '/users/me/')
+    bench.measure('GET /users/{id}/', bench.user(), 'GET', f'/users/{bench.writer()[0]}/')
+
+
+def users_update(bench):
+    bench.measure('PUT /users/me/', bench.user(), 'PUT', '/users/me/', {'description': uuid.uuid4().hex})
+
+
+def users_postings(bench):
+    bench.measure('GET /users/{id}/postings/', bench.user(), 'GET', f'/users/{bench.writer()[0]}/postings/')
+
+
+def users_subscribe_unsubscribe(bench):
+    subscriber_id, writer_id = bench.user(), bench.writer()[0]
+    if subscriber_id == writer_id or Subscription.objects.filter(
+            subscriber_id=subscriber_id, writer_id=writer_id).exists():
+        return
+    bench.measure('POST /users/{id}/subscribe/', subscriber_id, 'POST', f'/users/{writer_id}/subscribe/')
+    bench.measure('POST /users/{id}/unsubscribe/', subscriber_id, 'POST', f'/users/{writer_id}/unsubscribe/')
+
+
+def users_bulk_subscribe_unsubscribe(bench):
+    subscriber_id = bench.user()
+    writer_ids = set(bench.writer(10)) - {subscriber_id} - set(
+        Subscription.objects.filter(subscriber_id=subscriber_id).values_list('writer_id', flat=True))
+    if not writer_ids:
+        return
+    data = {'writer_ids': sorted(writer_ids)}
+    bench.measure('POST /users/subscribe/', subscriber_id, 'POST', '/users/subscribe/', data)
+    bench.measure('POST /users/unsubscribe/', subscriber_id, 'POST', '/users/unsubscribe/', data)
+
+
+def users_multi_get(bench):
+    user_ids = ','.join(map(str, bench.writer(20)))
+    bench.measure('GET /users/?ids=', bench.user(), 'GET', f'/users/?ids={user_ids}')
+
+
+def users_nicknames(bench):
+    # a nickname in use costs the lookup confirming it, a free one nothing past the index
+    nickname = UserProfile.objects.values_list('nickname', flat=True).get(user_id=bench.user())
+    bench.measure('GET /users/nickname/', None, 'GET', f'/users/nickname/?nickname={nickname}')
+    bench.measure('GET /users/nickname/', None, 'GET', f'/users/nickname/?nickname={uuid.uuid4().hex[:16]}')
+    bench.measure('GET /users/search/', bench.user(), 'GET', f'/users/search/?prefix={nickname[:-1]}')
+
+
+def users_subscriptions(bench):
+    bench.measure('GET /users/subscribed/', bench.user(), 'GET', '/users/subscribed/')
+    bench.measure('GET /users/subscriber/', bench.writer()[0], 'GET', '/users/subscriber/')
+
+
+def postings_list(bench):
+    bench.measure('GET /postings/', None, 'GET', '/postings/')
+
+
+def postings_write(bench):
+    user_id = bench.writer()[0]
+    response = bench.measure('POST /postings/', user_id, 'POST', '/postings/', {
+        'title': bench.rng.choice(bench.title_names), 'content': 'bench', 'alignment': Posting.LEFT,
+        'is_public': True})
+    posting_id = response.json()['id']
+    bench.measure('PUT /postings/{id}/', user_id, 'PUT', f'/postings/{posting_id}/', {'content': 'bench, edited'})
+    bench.measure('DELETE /postings/{id}/', user_id, 'DELETE', f'/postings/{posting_id}/')
+
+
+def postings_retrieve(bench):
+    bench.measure('GET /postings/{id}/', None, 'GET', f'/postings/{bench.public_posting()[0]}/')
+
+
+def postings_multi_get(bench):
+    posting_ids = ','.join(map(str, bench.public_posting(20)))
+    bench.measure('GET /postings/?ids=', bench.user(), 'GET', f'/postings/?ids={posting_ids}')
+
+
+def postings_scrap_unscrap(bench):
+    user_id, posting_id = bench.user(), bench.public_posting()[0]
+    if Scrap.objects.filter(user_id=user_id, posting_id=posting_id).exists():
+        return
+    bench.measure('POST /postings/{id}/scrap/', user_id, 'POST', f'/postings/{posting_id}/scrap/')
+    bench.measure('POST /postings/{id}/unscrap/', user_id, 'POST', f'/postings/{posting_id}/unscrap/')
+
+
+def postings_bulk_scrap_unscrap(bench):
+    user_id = bench.user()
+    posting_ids = set(bench.public_posting(10)) - set(
+        Scrap.objects.filter(user_id=user_id).values_list('posting_id', flat=True))
+    if not posting_ids:
+        return
+    data = {'posting_ids': sorted(posting_ids)}
+    bench.measure('POST /postings/scrap/', user_id, 'POST', '/postings/scrap/', data)
+    bench.measure('POST /postings/unscrap/', user_id, 'POST', '/postings/unscrap/', data)
+
+
+def postings_feeds(bench):
+    bench.measure('GET /postings/scrapped/', bench.user(), 'GET', '/postings/scrapped/')
+    bench.measure('GET /postings/subscribed/', bench.user(), 'GET', '/postings/subscribed/')
+    bench.measure('GET /postings/subscribed/?fields=excerpt', bench.user(), 'GET',
+                  '/postings/subscribed/?fields=title,writer,excerpt,created_at')
+
+
+def titles_list(bench):
+    bench.measure('GET /titles/', None, 'GET', '/titles/')
+    bench.measure('GET /titles/?time=week&only_official=true', None, 'GET', '/titles/?time=week&only_official=true')
+    name = bench.rng.choice(bench.title_names)
+    bench.measure('GET /titles/?query=', None, 'GET', f'/titles/?query={name[:2]}')
+    bench.measure('GET /titles/?order=popular&time=week', None, 'GET', '/titles/?order=popular&time=week')
+
+
+def titles_create(bench):
+    name = 'bench ' + uuid.uuid4().hex
+    response = bench.measure('POST /titles/', bench.user(), 'POST', '/titles/', {'name': name})
+    Title.objects.filter(id=response.json()['id']).delete()
+
+
+def titles_postings(bench):
+    bench.measure('GET /titles/today/', bench.user(), 'GET', '/titles/today/')
+    bench.measure('GET /titles/{id}/postings/', bench.user(), 'GET', f'/titles/{bench.title()[0]}/postings/')
+
+
+SCENARIOS = (
+    users_signup_login_logout,
+    users_login_existing,
+    users_retrieve,
+    users_update,
+    users_postings,
+    users_subscribe_unsubscribe,
+    users_bulk_subscribe_unsubscribe,
+    users_subscriptions,
+    users_multi_get,
+    users_nicknames,
+    postings_list,
+    postings_write,
+    postings_retrieve,
+    postings_multi_get,
+    postings_scrap_unscrap,
+    postings_bulk_scrap_unscrap,
+    postings_feeds,
+    titles_list,
+    titles_create,
+    titles_postings,
+)
+
+
+def stub_facebook(transport=None):
+    # swaps in `transport` (the stub by default) and returns the one it replaced
+    replaced, token.verifier.transport = token.verifier.transport, transport or StubGraphTransport()
+    return replaced
+
+
+# WSGI against ASGI: the same requests, `concurrency` of them in flight at a time, handed
+# straight to the application callables the way a server with `threads` threads would.
+# Everything shares one process and its GIL, so only waits (the database over the
+# network, the Graph API) can overlap; an in-process SQLite gains nothing from ASGI.
+
+HANDLERS = {
+    # a threaded WSGI server (gunicorn gthread, uwsgi --threads)
+    'wsgi': WSGIHandler,
+    # one ASGI worker, the feeds and login as async views on `threads` threads
+    'asgi': WrittenASGIHandler,
+    # one ASGI worker with Django's own handler, every view on its one sync thread
+    'asgi-sync': ASGIHandler,
+}
+
+
+def concurrent_requests(bench, count):
+    # (method, path, body, token key) of the async feeds and login, picked like the scenarios
+    requests = []
+    for _ in range(count):
+        user_id = bench.user()
+        key = bench.keys[user_id]
+        facebook_id = bench.facebook_ids[user_id]
+        requests.append(bench.rng.choice((
+            ('GET', '/titles/', '', None),
+            ('GET', '/titles/today/', '', key),
+            ('GET', f'/titles/{bench.title()[0]}/postings/', '', key),
+            ('GET', f'/postings/{bench.public_posting()[0]}/', '', None),
+            ('GET', '/postings/scrapped/', '', key),
+            ('GET', '/postings/subscribed/', '', key),
+            ('GET', f'/users/{bench.writer()[0]}/postings/', '', key),
+            ('GET', '/users/subscribed/', '', key),
+            ('PUT', '/users/login/', json.dumps({'access_token': access_token(facebook_id),
+                                                'facebookid': facebook_id}), None),
+        )))
+    return requests
+
+
+def wsgi_environ(method, path, body, key):
+    url = urlsplit(path)
+    body = body.encode()
+    environ = {
+        'REQUEST_METHOD': method, 'PATH_INFO': url.path, 'QUERY_STRING': url.query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'localhost',
+        'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    if key:
+        environ['HTTP_AUTHORIZATION'] = f'Token {key}'
+    return environ
+
+
+def asgi_scope(method, path, body, key):
+    url = urlsplit(path)
+    headers = [(b'host', b'localhost'), (b'content-type', b'application/json'),
+               (b'content-length', str(len(body.encode())).encode())]
+    if key:
+        headers.append((b'authorization', f'Token {key}'.encode()))
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+        'method': method, 'path': url.path, 'query_string': url.query.encode(), 'headers': headers,
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+    }
+
+
+def close_thread_connections(submit, threads):
+    # each pool thread closes its own connections, the barrier keeps every close on a thread of its own
+    barrier = threading.Barrier(threads)
+
+    def close():
+        barrier.wait()
+        connections.close_all()
+
+    return [submit(close) for _ in range(threads)]
+
+
+def run_wsgi(application, requests, concurrency, threads):
+    # `concurrency` clients, each waiting for one of the server's `threads` to serve its request
+    def serve(request):
+        statuses = []
+        response = application(wsgi_environ(*request), lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return int(statuses[0].split()[0])
+
+    pending = iter(requests)
+    lock = threading.Lock()
+
+    def client():
+        results = []
+        while True:
+            with lock:
+                request = next(pending, None)
+            if request is None:
+                return results
+            started = time.perf_counter()
+            status_code = server.submit(serve, request).result()
+            results.append((status_code, time.perf_counter() - started))
+
+    with ThreadPoolExecutor(threads) as server, ThreadPoolExecutor(concurrency) as clients:
+        futures = [clients.submit(client) for _ in range(concurrency)]
+        results = [result for future in futures for result in future.result()]
+        for future in close_thread_connections(server.submit, threads):
+            future.result()
+    return results
+
+
+async def asgi_request(application, method, path, body, key):
+    # (status, body) of one request sent the way an ASGI server would
+    messages = iter([{'type': 'http.request', 'body': body.encode(), 'more_body': False}])
+    response = {}
+
+    async def receive():
+        return next(messages, {'type': 'http.disconnect'})
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        else:
+            response['body'] = response.get('body', b'') + message.get('body', b'')
+
+    await application(asgi_scope(method, path, body, key), receive, send)
+    return response['status'], response.get('body', b'')
+
+
+def run_asgi(application, requests, concurrency, threads):
+    async def call(request):
+        started = time.perf_counter()
+        status_code, _ = await asgi_request(application, *request)
+        return status_code, time.perf_counter() - started
+
+    async def main():
+        loop = asyncio.get_event_loop()
+        loop.set_default_executor(ThreadPoolExecutor(threads))
+        pending = iter(requests)
+        results = []
+
+        async def client():
+            for request in pending:
+                results.append(await call(request))
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        await asyncio.gather(*close_thread_connections(lambda close: loop.run_in_executor(None, close), threads))
+        return results
+
+    return asyncio.run(main())
+
+
+RUNNERS = {
+    'wsgi': run_wsgi,
+    'asgi': run_asgi,
+    'asgi-sync': run_asgi,
+}
+
+
+def concurrency_report(mode, requests, concurrency, threads):
+    # one mode from cold caches: tokens and Facebook ids are looked up again
+    for cache in caches.all():
+        cache.clear()
+    token_cache.clear()
+    started = time.perf_counter()
+    results = RUNNERS[mode](HANDLERS[mode](), requests, concurrency, threads)
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for _, seconds in results)
+    statuses = {}
+    for status_code, _ in results:
+        statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'threads': threads,
+        'requests': len(results),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(results) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'status': statuses,
+    }
+
+
+# Projections against the serializers they replaced, on rows shaped like the list
+# queries hand them: naive UTC datetimes and MySQL's 0 and 1 for booleans.
+
+def projection_rows(count, rng=None):
+    rng = rng or random.Random(0)
+    created_at = datetime.datetime(2021, 1, 1, 12, 30, 15, 123456)
+    postings = [{
+        'id': i, 'title': rng.choice(SYLLABLES) * 2, 'writer_id': i % 50, 'writer_nickname': f'bench{i % 50}',
+        'content': 'bench posting\n' * rng.randint(1, 20), 'alignment': Posting.LEFT,
+        'is_public': rng.randint(0, 1), 'created_at': created_at + datetime.timedelta(seconds=i),
+    } for i in range(count)]
+    titles = [{
+        'id': i, 'name': rng.choice(SYLLABLES) * 2, 'created_at': created_at + datetime.timedelta(seconds=i),
+        'public_postings_count': rng.randint(0, 100), 'all_postings_count': rng.randint(100, 200),
+    } for i in range(count)]
+    return {'posting': postings, 'title': titles}
+
+
+PROJECTED_SERIALIZERS = {
+    'posting': (PostingDictSerializer, projection.posting),
+    'title': (TitleSmallSerializer, projection.title),
+}
+
+
+def projection_report(rows=1000, repeat=5):
+    # best of `repeat` runs over `rows` rows, per kind of row
+    report = {}
+    for kind, kind_rows in projection_rows(rows).items():
+        serializer_class, projector = PROJECTED_SERIALIZERS[kind]
+        serializer = min(timeit.repeat(lambda: serializer_class(kind_rows, many=True).data, number=1, repeat=repeat))
+        projected = min(timeit.repeat(lambda: projection.project(kind_rows, projector), number=1, repeat=repeat))
+        report[kind] = {
+            'rows': rows,
+            'serializer_us_per_row': round(serializer / rows * 1e6, 2),
+            'projection_us_per_row': round(projected / rows * 1e6, 2),
+            'speedup': round(serializer / projected, 1),
+        }
+    return report
@@ -0,0 +1,37 @@
+from rest_framework import status
+
+from written.error_codes import InvalidIdListException
+
+# most ids one request may act on
+MAX_IDS = 100
+
+
+def parse_ids(value, max_ids=MAX_IDS):
+    # A JSON list of ids, or a comma separated string of them, deduplicated in order.
+    if isinstance(value, str):
+        value = [item for item in value.split(',') if item.strip()]
+    if not isinstance(value, list) or not 0 < len(value) <= max_ids:
+        raise InvalidIdListException()
+    ids = []
+    for item in value:
+        if isinstance(item, bool):
+            raise InvalidIdListException()
+        try:
+            item = int(item)
+        except (TypeError, ValueError):
+            raise InvalidIdListException()
+        if item not in ids:
+            ids.append(item)
+    return ids
+
+
+# Per-item results of a bulk request, in the order of its ids, each failure shaped
+# like the error response the single-item endpoint would have given.
+
+def succeeded(item_id, **data):
+    return {'id': item_id, 'status_code': status.HTTP_200_OK, **data}
+
+
+def failed(item_id, exception):
+    return {'id': item_id, 'status_code': exception.status_code, 'errorcode': exception.error_code,
+            'message': exception.message}
@@ -0,0 +1,65 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+# Validators for the reads clients re-poll. An ETag is built from whatever changes
+# the payload (an updated_at, the newest id of a feed, the page asked for), all known
+# before the payload is queried or serialized, so a matching If-None-Match gets an
+# empty 304 instead.
+
+# part of every ETag, bump it when a payload changes shape
+ETAG_VERSION = 1
+
+
+def etag(*parts):
+    # weak: the same parts promise an equivalent payload, not the same bytes
+    digest = hashlib.sha1(repr((ETAG_VERSION,) + parts).encode()).hexdigest()[:20]
+    return 'W/' + quote_etag(digest)
+
+
+def opaque(tag):
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def page_parts(request):
+    # a feed's ETag covers the page asked for
+    return tuple(sorted(request.query_params.items()))
+
+
+def is_fresh(request, tag):
+    # If-None-Match compares weakly
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    tags = parse_etags(header)
+    return '*' in tags or opaque(tag) in {opaque(candidate) for candidate in tags}
+
+
+def not_modified(tag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': tag})
+
+
+# Generations: counters in the cache for changes no column records. Like the posting
+# cache they need a cache shared by every worker. A bump lands right away and again
+# on commit, so a reader in between cannot pair the new generation with old rows.
+
+def generations(*keys):
+    values = cache.get_many(keys)
+    return tuple(values.get(key, 0) for key in keys)
+
+
+def bump(*keys):
+    def incr():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, 0, None)
+                cache.incr(key)
+
+    incr()
+    transaction.on_commit(incr)
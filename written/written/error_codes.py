@@ -148,3 +148,30 @@ class AlreadyUnscrappedException(WrittenException):
     status_code = 400
     error_code = 40002
     message = "Posting is not scrapped"
+
+
+# 50000 Pagination
+class InvalidCursorException(WrittenException):
+    status_code = 400
+    error_code = 50001
+    message = "Invalid cursor"
+
+
+class InvalidPageSizeException(WrittenException):
+    status_code = 400
+    error_code = 50002
+    message = "Invalid page size"
+
+
+# 60000 Id lists
+class InvalidIdListException(WrittenException):
+    status_code = 400
+    error_code = 60001
+    message = "Invalid id list"
+
+
+# 70000 Fields
+class InvalidFieldsException(WrittenException):
+    status_code = 400
+    error_code = 70001
+    message = "Invalid fields"
@@ -0,0 +1,82 @@
+import re
+
+from django.db import connections, DEFAULT_DB_ALIAS
+
+# sqlite's EXPLAIN QUERY PLAN says SCAN for a table read start to end, SEARCH for an index lookup;
+# a SCAN ... USING INDEX walks an index in ORDER BY order and stops at the LIMIT
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\S+)$')
+SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR (.*)')
+
+
+def mysql_plan(cursor, sql, params):
+    cursor.execute('EXPLAIN ' + sql, params)
+    columns = [column[0] for column in cursor.description]
+    lines, problems = [], []
+    for row in cursor.fetchall():
+        row = dict(zip(columns, row))
+        table, access, extra = row['table'], row['type'], row['Extra'] or ''
+        lines.append(f'{table}: type={access} key={row["key"]} rows={row["rows"]} {extra}'.strip())
+        # <derivedN> and <unionN> are our own subqueries, their tables get rows of their own
+        if table and not table.startswith('<'):
+            if access == 'ALL':
+                problems.append(f'full scan of {table}')
+            if 'Using filesort' in extra:
+                problems.append(f'filesort on {table}')
+            if 'Using temporary' in extra:
+                problems.append(f'temporary table for {table}')
+    return lines, problems
+
+
+def sqlite_plan(cursor, sql, params):
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    lines, problems = [], []
+    for row in cursor.fetchall():
+        detail = row[-1]
+        lines.append(detail)
+        match = SQLITE_FULL_SCAN.match(detail)
+        if match:
+            problems.append(f'full scan of {match.group(1)}')
+        match = SQLITE_SORT.search(detail)
+        if match:
+            problems.append(f'sort for {match.group(1).lower()}')
+    return lines, problems
+
+
+# Plans that sort on purpose: the few titles matching every n-gram of a search are
+# sorted, which beats walking the whole created_at index to find them.
+SORTS_EXPECTED_WITH = ('title_titlengram',)
+SORT_PROBLEMS = ('sort for', 'filesort on', 'temporary table for')
+
+PLANS = {
+    'mysql': mysql_plan,
+    'sqlite': sqlite_plan,
+}
+
+
+def explain(sql, params, using=DEFAULT_DB_ALIAS):
+    # (plan lines, problems) of one statement
+    connection = connections[using]
+    try:
+        plan = PLANS[connection.vendor]
+    except KeyError:
+        raise NotImplementedError(f'no plan check for {connection.vendor}')
+    with connection.cursor() as cursor:
+        return plan(cursor, sql, params)
+
+
+def explain_queries(queries, using=DEFAULT_DB_ALIAS):
+    # Plans every distinct SELECT a QueryRecorder saw, once per shape.
+    results = {}
+    for query in queries:
+        if query.shape in results or not query.shape.upper().startswith('SELECT'):
+            continue
+        lines, problems = explain(query.sql, query.params, using)
+        if any(table in query.shape for table in SORTS_EXPECTED_WITH):
+            problems = [problem for problem in problems if not problem.startswith(SORT_PROBLEMS)]
+        results[query.shape] = {
+            'shape': query.shape,
+            'origin': query.origin,
+            'plan': lines,
+            'problems': problems,
+        }
+    return list(results.values())
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from written.queries import QueryRecorder, query_budget
+
+logger = logging.getLogger('written.db')
+
+
+class QueryInspectionMiddleware:
+    # With QUERY_INSPECTION on, records the SQL of every request, reports the count
+    # in an X-Query-Count header and logs N+1 patterns and exceeded QUERY_BUDGETS
+    # with the frame that ran them. Off by default, it costs a stack walk per query.
+    # Not used under ASGI, where async views query on connections of other threads;
+    # async_capable only keeps Django from adapting the handler around an unused middleware.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSPECTION', False) or asyncio.iscoroutinefunction(get_response):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        response['X-Query-Count'] = str(recorder.count)
+
+        endpoint = f'{request.method} {request.path}'
+        for repeated in recorder.repeated_shapes():
+            logger.warning('N+1 on %s: %d x %s at %s', endpoint, repeated['count'], repeated['shape'],
+                           ' < '.join(repeated['frames']))
+        budget = query_budget(request.resolver_match, request.method) if request.resolver_match else None
+        if budget is not None and recorder.count > budget:
+            logger.warning('%s ran %d queries, over its budget of %d\n%s', endpoint, recorder.count, budget,
+                           recorder.describe())
+        return response
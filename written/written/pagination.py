@@ -0,0 +1,139 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from written.error_codes import InvalidCursorException, InvalidPageSizeException
+
+MAX_PAGE_SIZE = 100
+
+
+# kinds of key columns: how a cursor value is checked when it comes back from a client
+def INTEGER(value):
+    if type(value) != int:
+        raise ValueError(value)
+    return value
+
+
+def STRING(value):
+    if type(value) != str:
+        raise ValueError(value)
+    return value
+
+
+def DATETIME(value):
+    value = parse_datetime(value)
+    if value is None:
+        raise ValueError(value)
+    return connection.ops.adapt_datetimefield_value(value)
+
+
+def _json_value(value):
+    if isinstance(value, str):
+        value = parse_datetime(value) or value
+    if isinstance(value, datetime.datetime):
+        if timezone.is_naive(value):
+            # raw cursors hand back naive UTC datetimes
+            value = timezone.make_aware(value, timezone.utc)
+        return value.isoformat()
+    return value
+
+
+class Keyset:
+    """
+    Keyset ("seek") pagination for the raw SQL list endpoints.
+
+    Rows are ordered by ``columns``, ``(sql expression, row field[, kind])`` tuples
+    from the most significant key down to a unique tie-breaker such as the
+    primary key, so a page boundary inside a run of equal sort keys stays exact.
+    Instead of an OFFSET, the next page starts strictly after the key of the last
+    row, which an index on the same columns turns into a range scan. The cursor
+    handed to clients is an opaque encoding of that key; the first page needs
+    no cursor and therefore no extra query.
+    """
+
+    def __init__(self, *columns, default_page_size=10, max_page_size=MAX_PAGE_SIZE):
+        self.columns = [column if len(column) == 3 else (*column, INTEGER) for column in columns]
+        self.default_page_size = default_page_size
+        self.max_page_size = max_page_size
+
+    def page(self, request, descending=True):
+        query_params = request.query_params
+        page_size = query_params.get('page_size')
+        if page_size:
+            try:
+                page_size = int(page_size)
+            except ValueError:
+                raise InvalidPageSizeException()
+            if page_size < 1:
+                raise InvalidPageSizeException()
+            page_size = min(page_size, self.max_page_size)
+        else:
+            page_size = self.default_page_size
+
+        cursor = query_params.get('cursor')
+        after = self.decode(cursor) if cursor else None
+        return Page(self, after, page_size, descending)
+
+    def encode(self, row):
+        key = [_json_value(row[field]) for _, field, _ in self.columns]
+        data = json.dumps(key, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode(self, cursor):
+        # bare ids were the cursors before keysets, keep accepting them for single-key lists
+        if cursor.isdigit() and len(self.columns) == 1:
+            return [int(cursor)]
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            key = json.loads(data)
+            if type(key) != list or len(key) != len(self.columns):
+                raise ValueError(key)
+            return [kind(value) for value, (_, _, kind) in zip(key, self.columns)]
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise InvalidCursorException()
+
+
+class Page:
+    def __init__(self, keyset, after, page_size, descending):
+        self.keyset = keyset
+        self.after = after
+        self.page_size = page_size
+        self.descending = descending
+        # one surplus row tells whether there is a next page
+        self.limit = page_size + 1
+
+    def on(self, keyset):
+        # the same position in another keyset encoding the same key, e.g. a second query merged into this page
+        return Page(keyset, self.after, self.page_size, self.descending)
+
+    def seek(self):
+        # Return (sql, params) selecting rows after the cursor, always true on the first page
+        if self.after is None:
+            return '1 = 1', []
+        operator = '<' if self.descending else '>'
+        expressions = [expression for expression, _, _ in self.keyset.columns]
+        alternatives = []
+        params = []
+        # (a, b) < (x, y) spelled out as a < x OR (a = x AND b < y), which MySQL can range-scan
+        for i, expression in enumerate(expressions):
+            terms = [f'{previous} = %s' for previous in expressions[:i]]
+            terms.append(f'{expression} {operator} %s')
+            alternatives.append('(' + ' AND '.join(terms) + ')')
+            params += self.after[:i + 1]
+        return '(' + ' OR '.join(alternatives) + ')', params
+
+    def order_by(self):
+        direction = 'DESC' if self.descending else 'ASC'
+        return ', '.join(f'{expression} {direction}' for expression, _, _ in self.keyset.columns)
+
+    def paginate(self, rows):
+        # Return (rows of this page, has_next, next cursor)
+        has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        next_cursor = self.keyset.encode(rows[-1]) if has_next else None
+        return rows, has_next, next_cursor
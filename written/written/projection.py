@@ -0,0 +1,141 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from written.error_codes import InvalidFieldsException
+
+# Projections of the raw SQL list endpoints: each maps a dict_fetch_all row straight
+# to its response dict, where a DRF serializer would build and run its fields per row.
+# The output matches the serializers it replaces: nested writer, booleans (MySQL hands
+# back 0 and 1) and ISO 8601 datetimes in UTC ending in Z.
+
+# the posting columns posting() reads, selected FROM posting_posting AS posting
+# JOIN title_title AS title, user_userprofile AS profile
+POSTING_COLUMNS = 'posting.id, title.name AS title, posting.writer_id, profile.nickname AS writer_nickname, ' \
+                  'posting.content, posting.alignment, posting.is_public, posting.created_at'
+
+
+def dict_fetch_all(cursor):
+    # Return all rows from a cursor as a dict
+    columns = [col[0] for col in cursor.description]
+    return [
+        dict(zip(columns, row))
+        for row in cursor.fetchall()
+    ]
+
+
+def iso_datetime(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if timezone.is_aware(value):
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    # raw cursors hand back naive UTC datetimes
+    return value.isoformat() + 'Z'
+
+
+def writer(row):
+    if row['writer_id'] is None:
+        return None
+    return {'id': row['writer_id'], 'nickname': row['writer_nickname']}
+
+
+def posting(row):
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'writer': writer(row),
+        'content': row['content'],
+        'alignment': row['alignment'],
+        'is_public': bool(row['is_public']),
+        'created_at': iso_datetime(row['created_at']),
+    }
+
+
+# ?fields= of the posting feeds: each response field with the columns it reads and its value
+POSTING_FIELDS = {
+    'id': (('posting.id', ), lambda row: {'id': row['id']}),
+    'title': (('title.name AS title', ), lambda row: {'title': row['title']}),
+    'writer': (('posting.writer_id', 'profile.nickname AS writer_nickname'), lambda row: {'writer': writer(row)}),
+    'content': (('posting.content', ), lambda row: {'content': row['content']}),
+    # the stored preview, for cards that do not need the whole TEXT column
+    'excerpt': (('posting.excerpt', 'posting.content_length'),
+                lambda row: {'excerpt': row['excerpt'], 'content_length': row['content_length']}),
+    'alignment': (('posting.alignment', ), lambda row: {'alignment': row['alignment']}),
+    'is_public': (('posting.is_public', ), lambda row: {'is_public': bool(row['is_public'])}),
+    'created_at': (('posting.created_at', ), lambda row: {'created_at': iso_datetime(row['created_at'])}),
+}
+
+
+class PostingFields:
+    # The fields a feed request asks for, ?fields=title,excerpt. id is always there, pages
+    # are cut on it; without the parameter a feed answers with POSTING_COLUMNS and posting().
+
+    def __init__(self, fields=None):
+        self.fields = fields
+
+    @classmethod
+    def from_request(cls, request):
+        value = request.query_params.get('fields')
+        if not value:
+            return cls()
+        fields = [field.strip() for field in value.split(',')]
+        if any(field not in POSTING_FIELDS for field in fields):
+            raise InvalidFieldsException()
+        return cls(['id'] + [field for field in POSTING_FIELDS if field != 'id' and field in fields])
+
+    @property
+    def columns(self):
+        if self.fields is None:
+            return POSTING_COLUMNS
+        return ', '.join(column for field in self.fields for column in POSTING_FIELDS[field][0])
+
+    def project(self, rows):
+        if self.fields is None:
+            return project(rows, posting)
+        values = [POSTING_FIELDS[field][1] for field in self.fields]
+        projected = []
+        for row in rows:
+            data = {}
+            for value in values:
+                data.update(value(row))
+            projected.append(data)
+        return projected
+
+
+def title(row):
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'count_public_postings': row['public_postings_count'],
+        'count_all_postings': row['all_postings_count'],
+    }
+
+
+def user(row):
+    return {
+        'id': row['id'],
+        'nickname': row['nickname'],
+        'description': row['description'],
+    }
+
+
+def profile(row):
+    # GET /users/{user_id}/ and GET /users/?ids=: UserSerializer's fields with the counters
+    # kept on the profile row, and whether the caller subscribes when the row says
+    data = {
+        'id': row['id'],
+        'nickname': row['nickname'],
+        'description': row['description'],
+        'first_posted_at': iso_datetime(row['first_posted_at']),
+        'count_public_postings': row['public_postings_count'],
+        'count_subscribers': row['subscribers_count'],
+        'count_subscriptions': row['subscriptions_count'],
+    }
+    if 'subscribing' in row:
+        data['subscribing'] = bool(row['subscribing'])
+    return data
+
+
+def project(rows, projection):
+    return [projection(row) for row in rows]
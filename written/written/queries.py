@@ -0,0 +1,139 @@
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+# a shape executed this many times in one request is reported as an N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+# savepoints are transaction control, and on MySQL a top-level atomic() issues no statement at all
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+ROW_LIST = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+
+
+def shape(sql):
+    # the statement with its values taken out: 'WHERE id = 3' and 'WHERE id = 4' are one shape
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = PLACEHOLDER_LIST.sub('(...)', sql)
+    sql = ROW_LIST.sub('(...)', sql)
+    return ' '.join(sql.split())
+
+
+def project_frames(frame):
+    # innermost first, skipping Django, DRF and this module
+    base_dir = str(settings.BASE_DIR)
+    frames = []
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base_dir) and 'site-packages' not in filename and filename != __file__:
+            frames.append(f'{os.path.relpath(filename, base_dir)}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return frames
+
+
+class Query:
+    def __init__(self, sql, params, duration, frames):
+        self.sql = sql
+        self.params = params
+        self.shape = shape(sql)
+        self.duration = duration
+        self.frames = frames
+
+    @property
+    def origin(self):
+        # the serializer method or view line that ran it
+        return self.frames[0] if self.frames else None
+
+
+class QueryRecorder:
+    # Records every statement run on any connection while active:
+    #
+    #   with QueryRecorder() as recorder:
+    #       ...
+    #   recorder.count, recorder.repeated_shapes()
+
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self.record))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+    def record(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(Query(sql, params, time.perf_counter() - start, project_frames(sys._getframe(1))))
+
+    @property
+    def counted(self):
+        return [query for query in self.queries if not query.shape.upper().startswith(TRANSACTION_CONTROL)]
+
+    @property
+    def count(self):
+        return len(self.counted)
+
+    def repeated_shapes(self, threshold=N_PLUS_ONE_THRESHOLD):
+        counts = Counter(query.shape for query in self.counted)
+        repeated = []
+        for shape_, count in counts.items():
+            if count >= threshold:
+                first = next(query for query in self.counted if query.shape == shape_)
+                repeated.append({'shape': shape_, 'count': count, 'origin': first.origin, 'frames': first.frames})
+        return repeated
+
+    def describe(self):
+        lines = [f'{self.count} queries']
+        for query in self.counted:
+            lines.append(f'  {query.shape}\n    at {query.origin}')
+        for repeated in self.repeated_shapes():
+            lines.append(f'N+1: {repeated["count"]} x {repeated["shape"]}\n    ' + '\n    '.join(repeated['frames']))
+        return '\n'.join(lines)
+
+
+def view_action(resolver_match, method):
+    # (viewset class, action) a request was routed to, the class None for plain views
+    view = resolver_match.func
+    # a handler named after the method (PostingViewSet.delete) is not in the router's actions
+    action = getattr(view, 'actions', {}).get(method.lower()) or method.lower()
+    return getattr(view, 'cls', None), action
+
+
+def query_budget(resolver_match, method):
+    # Viewsets declare QUERY_BUDGETS = {action: max queries per request}, counting
+    # authentication and excluding transaction control. None when undeclared.
+    cls, action = view_action(resolver_match, method)
+    return getattr(cls, 'QUERY_BUDGETS', {}).get(action)
+
+
+class QueryBudgetMixin:
+    # for TestCase: self.assertQueryBudget(self.client.get, path, ...) runs the
+    # request, then fails on a missing or exceeded budget or on an N+1 pattern
+
+    def assertQueryBudget(self, send, path, *args, **kwargs):
+        with QueryRecorder() as recorder:
+            response = send(path, *args, **kwargs)
+        budget = query_budget(response.resolver_match, response.request['REQUEST_METHOD'])
+        endpoint = f'{response.request["REQUEST_METHOD"]} {path}'
+        self.assertIsNotNone(budget, f'{endpoint} declares no query budget')
+        self.assertLessEqual(recorder.count, budget,
+                             f'{endpoint} exceeded its budget of {budget}\n{recorder.describe()}')
+        self.assertEqual(recorder.repeated_shapes(), [], f'{endpoint} has an N+1\n{recorder.describe()}')
+        return response
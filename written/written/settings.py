@@ -52,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'written.middleware.QueryInspectionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,20 +87,88 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'written.wsgi.application'
 
+TEST_RUNNER = 'written.test_runner.WrittenTestRunner'
+
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        # django.db.backends.mysql with connection reuse metrics (see written.backends.pooling)
+        'ENGINE': 'written.backends.mysql',
         'HOST': os.environ.get('WRITTEN_HOST') or '127.0.0.1',
         'PORT': os.environ.get('WRITTEN_PORT') or '3306',
         'NAME': os.environ.get('WRITTEN_NAME') or 'written_waffle',
         'USER': os.environ.get('WRITTEN_USER') or 'written-waffle',
-        'PASSWORD': os.environ.get('WRITTEN_PASSWORD') or 'toyproject'
+        'PASSWORD': os.environ.get('WRITTEN_PASSWORD') or 'toyproject',
+        # seconds a worker thread keeps its connection between requests, 0 closes it after each request
+        'CONN_MAX_AGE': int(os.environ.get('WRITTEN_CONN_MAX_AGE') or 60),
+        # ping a kept connection the first time a request uses it, reconnecting if it went away
+        'CONN_HEALTH_CHECKS': os.environ.get('WRITTEN_CONN_HEALTH_CHECKS', '1') != '0',
     }
 }
 
+# record each request's SQL, log N+1 patterns and exceeded QUERY_BUDGETS (see written.queries)
+QUERY_INSPECTION = os.environ.get('WRITTEN_QUERY_INSPECTION') in ('true', 'True')
+
+# log connection reuse ratio and connect latency to 'written.db' every this many checkouts, 0 disables
+DB_POOL_STATS_LOG_INTERVAL = int(os.environ.get('WRITTEN_DB_POOL_STATS_LOG_INTERVAL') or 1000)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'written': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# local memory by default, point WRITTEN_CACHE_BACKEND/LOCATION at a shared backend in production
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('WRITTEN_CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.environ.get('WRITTEN_CACHE_LOCATION') or 'written',
+    }
+}
+
+# Set WRITTEN_CACHE_SHARED when every worker sees the same cache. Generations (see
+# written.conditional) reach other workers only through a shared cache, so what relies on
+# them to notice changes made in another worker stays off without it.
+CACHE_SHARED = (os.environ.get('WRITTEN_CACHE_SHARED') or '').lower() in ('1', 'true', 'yes')
+
+# seconds a serialized GET /postings/{posting_id}/ payload is kept, with CACHE_SHARED (see posting.cache)
+POSTING_CACHE_TIMEOUT = 60 * 10
+
+# seconds GET /titles/ and GET /titles/{title_id}/postings/ responses are shared between
+# callers (see title.cache), 0 turns it off. Opt in where the cache is shared by every
+# worker: a locmem cache only sees the invalidations of its own process.
+TITLE_LIST_CACHE_TIMEOUT = int(os.environ.get('WRITTEN_TITLE_LIST_CACHE_TIMEOUT') or 0)
+TITLE_POSTINGS_CACHE_TIMEOUT = int(os.environ.get('WRITTEN_TITLE_POSTINGS_CACHE_TIMEOUT') or 0)
+
+# newest public postings each process holds for GET /postings/, with CACHE_SHARED, and
+# seconds before it reads them again whatever the generation says (see posting.explore)
+EXPLORE_BUFFER_SIZE = 200
+EXPLORE_BUFFER_MAX_AGE = 30
+
+# seconds each process reuses the activity windows of GET /titles/?order=popular (see title.activity)
+TITLE_ACTIVITY_WINDOW_TIMEOUT = 60
+
+# seconds the first page of GET /titles/today/ is kept, under its ETag: safe on any cache
+TITLE_TODAY_CACHE_TIMEOUT = 60 * 10
+
+# seconds before a process reads the nicknames it holds again (see user.nicknames)
+NICKNAME_INDEX_REFRESH = 60
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -136,9 +205,28 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# GET /postings/subscribed/: writers with more subscribers than this are read with a join
+# instead of being copied into every subscriber's timeline (see subscription.timeline)
+TIMELINE_FANOUT_MAX_SUBSCRIBERS = int(os.environ.get('WRITTEN_TIMELINE_FANOUT_MAX_SUBSCRIBERS') or 1000)
+
+# newest postings of the writers followed that a subscribe copies into the subscriber's
+# timeline right away, the rest waits for `manage.py rebuild_timeline`
+TIMELINE_FOLLOW_BACKFILL = int(os.environ.get('WRITTEN_TIMELINE_FOLLOW_BACKFILL') or 200)
+
 REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'written.error_codes.custom_exception_handler',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'user.authentication.CachedTokenAuthentication',
     )
 }
+
+# Facebook access token verification (see user.token)
+FACEBOOK_GRAPH_URL = os.environ.get('WRITTEN_FACEBOOK_GRAPH_URL') or 'https://graph.facebook.com/v7.0'
+FACEBOOK_CONNECT_TIMEOUT = 3.05
+FACEBOOK_READ_TIMEOUT = 5
+FACEBOOK_POOL_SIZE = 10
+FACEBOOK_TOKEN_CACHE_TIMEOUT = 60 * 5
+
+# CachedTokenAuthentication keeps up to TOKEN_CACHE_SIZE tokens per process for TOKEN_CACHE_TTL seconds
+TOKEN_CACHE_SIZE = int(os.environ.get('WRITTEN_TOKEN_CACHE_SIZE') or 10000)
+TOKEN_CACHE_TTL = int(os.environ.get('WRITTEN_TOKEN_CACHE_TTL') or 60)
@@ -0,0 +1,35 @@
+import unittest
+
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+
+from posting.explore import explore_buffer
+from title.activity import windows as activity_windows
+from title.schedule import today_title
+from user.authentication import token_cache
+from user.nicknames import nickname_index
+
+
+def reset_caches():
+    for cache in caches.all():
+        cache.clear()
+    token_cache.clear()
+    today_title.clear()
+    activity_windows.clear()
+    explore_buffer.clear()
+    nickname_index.clear()
+
+
+class WrittenTestRunner(DiscoverRunner):
+    # Test transactions roll back, and on SQLite the ids they used are handed out
+    # again, so anything cached by one test would show up in the next one.
+
+    def get_resultclass(self):
+        base = super().get_resultclass() or unittest.TextTestResult
+
+        class WrittenTestResult(base):
+            def startTest(self, test):
+                reset_caches()
+                super().startTest(test)
+
+        return WrittenTestResult
@@ -0,0 +1,309 @@
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import patch
+
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections
+from django.db.backends.sqlite3 import base
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import get_resolver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from posting.models import Posting
+from posting.views import PostingViewSet
+from posting.serializers import PostingDictSerializer
+from title.models import Title
+from title.serializers import TitleSmallSerializer
+from title.views import TitleViewSet
+from user.models import UserProfile
+from user.views import UserViewSet
+from written import bench, projection
+from written.asgi import WrittenASGIHandler
+from written.explain import explain, explain_queries
+from written.queries import QueryRecorder, query_budget, shape
+from written.backends.pooling import PooledConnectionMixin, pool_stats
+
+
+class DatabaseWrapper(PooledConnectionMixin, base.DatabaseWrapper):
+    pass
+
+
+class PooledConnectionTestCase(SimpleTestCase):
+    def setUp(self):
+        pool_stats.reset()
+        # a file, SQLite never closes in-memory connections
+        descriptor, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(descriptor)
+        settings_dict = dict(connections.databases['default'], ENGINE='django.db.backends.sqlite3', NAME=self.path,
+                             CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True)
+        self.connection = DatabaseWrapper(settings_dict, alias='pooled')
+
+    def tearDown(self):
+        self.connection.close()
+        os.remove(self.path)
+        pool_stats.reset()
+
+    def request(self):
+        # what request_started / request_finished do around a view
+        self.connection.close_if_unusable_or_obsolete()
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.execute('SELECT 2')
+        self.connection.close_if_unusable_or_obsolete()
+
+    def test_reuse_connection_between_requests(self):
+        for _ in range(4):
+            self.request()
+
+        stats = pool_stats.snapshot()
+        self.assertEqual(stats['checkouts'], 4)
+        self.assertEqual(stats['reused'], 3)
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['reuse_ratio'], 0.75)
+        self.assertIsNotNone(stats['connect_ms_avg'])
+        self.assertIsNotNone(stats['connect_ms_p95'])
+
+    def test_replace_unusable_connection(self):
+        self.request()
+        stale = self.connection.connection
+        with patch.object(DatabaseWrapper, 'is_usable', return_value=False):
+            self.request()
+
+        self.assertIsNot(self.connection.connection, stale)
+        stats = pool_stats.snapshot()
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['reused'], 0)
+        self.assertEqual(stats['broken'], 1)
+        self.assertEqual(stats['connects'], 2)
+
+    def test_skip_health_check_when_disabled(self):
+        self.connection.settings_dict['CONN_HEALTH_CHECKS'] = False
+        self.request()
+        with patch.object(DatabaseWrapper, 'is_usable', return_value=False) as is_usable:
+            self.request()
+
+        is_usable.assert_not_called()
+        self.assertEqual(pool_stats.snapshot()['reused'], 1)
+
+    def test_close_after_request_without_persistent_connections(self):
+        self.connection.settings_dict['CONN_MAX_AGE'] = 0
+        self.request()
+        self.request()
+
+        self.assertIsNone(self.connection.connection)
+        stats = pool_stats.snapshot()
+        self.assertEqual(stats['reused'], 0)
+        self.assertEqual(stats['connects'], 2)
+
+
+class BenchTestCase(TestCase):
+    def setUp(self):
+        bench.seed(users=20, titles=10, postings=100, scraps=50, subscriptions=40)
+        self.transport = bench.stub_facebook()
+
+    def tearDown(self):
+        bench.stub_facebook(self.transport)
+
+    def test_seed_skewed_dataset(self):
+        dataset = bench.dataset()
+        self.assertEqual(dataset['users'], 20)
+        self.assertEqual(dataset['titles'], 10)
+        self.assertEqual(dataset['postings'], 100)
+        self.assertGreater(dataset['scraps'], 0)
+        self.assertGreater(dataset['subscriptions'], 0)
+
+    def test_report_every_endpoint(self):
+        report = bench.Bench(iterations=3, warmup=0).run()
+
+        # every action with a query budget is exercised by some scenario
+        budgeted = {f'{viewset.__name__}.{action}'
+                    for viewset in (PostingViewSet, TitleViewSet, UserViewSet) for action in viewset.QUERY_BUDGETS}
+        self.assertEqual(budgeted - {numbers['action'] for numbers in report.values()}, set())
+        for endpoint, numbers in report.items():
+            self.assertLessEqual(numbers['p50_ms'], numbers['p95_ms'], endpoint)
+            self.assertLessEqual(numbers['p95_ms'], numbers['p99_ms'], endpoint)
+            for status_code in numbers['status']:
+                self.assertLess(int(status_code), 400, endpoint)
+        self.assertEqual(bench.dataset()['postings'], 100)
+
+    def test_run_only_matching_scenarios(self):
+        report = bench.Bench(iterations=1, warmup=0).run(only=['titles_list'])
+
+        self.assertEqual(set(report), {'GET /titles/', 'GET /titles/?time=week&only_official=true',
+                                       'GET /titles/?query=', 'GET /titles/?order=popular&time=week'})
+
+
+class ProjectionTestCase(SimpleTestCase):
+    def test_match_replaced_serializers(self):
+        rows = bench.projection_rows(20)
+        rows['posting'][0]['writer_id'] = None
+        rows['posting'][1]['created_at'] = timezone.make_aware(rows['posting'][1]['created_at'], timezone.utc)
+
+        self.assertEqual(projection.project(rows['posting'], projection.posting),
+                         PostingDictSerializer(rows['posting'], many=True).data)
+        self.assertEqual(projection.project(rows['title'], projection.title),
+                         TitleSmallSerializer(rows['title'], many=True).data)
+
+    def test_iso_datetime(self):
+        self.assertEqual(projection.iso_datetime(datetime.datetime(2021, 1, 2, 3, 4, 5)), '2021-01-02T03:04:05Z')
+        seoul = datetime.timezone(datetime.timedelta(hours=9))
+        self.assertEqual(projection.iso_datetime(datetime.datetime(2021, 1, 2, 12, 4, 5, 6, tzinfo=seoul)),
+                         '2021-01-02T03:04:05.000006Z')
+        self.assertEqual(projection.iso_datetime('2021-01-02 03:04:05'), '2021-01-02T03:04:05Z')
+        self.assertIsNone(projection.iso_datetime(None))
+
+    def test_report_speedup(self):
+        report = bench.projection_report(rows=10, repeat=1)
+
+        self.assertEqual(set(report), {'posting', 'title'})
+        for numbers in report.values():
+            self.assertGreater(numbers['serializer_us_per_row'], 0)
+            self.assertGreater(numbers['projection_us_per_row'], 0)
+
+
+class QueryRecorderTestCase(TestCase):
+    def test_shape(self):
+        self.assertEqual(shape('SELECT * FROM t WHERE id = 3 AND name = \'it\'\'s\' LIMIT 21'),
+                         'SELECT * FROM t WHERE id = ? AND name = ? LIMIT ?')
+        self.assertEqual(shape('SELECT * FROM t WHERE id IN (%s, %s,\n %s)'), 'SELECT * FROM t WHERE id IN (...)')
+        self.assertEqual(shape('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+                         'INSERT INTO t (a, b) VALUES (...)')
+
+    def test_flag_repeated_shape_with_origin(self):
+        title = Title.objects.create(name='title')
+        rows = [{'id': i, 'title_id': title.id, 'writer_id': None, 'content': '', 'alignment': Posting.LEFT,
+                 'is_public': True, 'created_at': None} for i in range(3)]
+        with QueryRecorder() as recorder:
+            PostingDictSerializer(rows, many=True).data
+
+        self.assertEqual(recorder.count, 3)
+        [repeated] = recorder.repeated_shapes()
+        self.assertEqual(repeated['count'], 3)
+        self.assertIn('FROM "title_title"', repeated['shape'])
+        self.assertRegex(repeated['origin'], r'^posting/serializers.py:\d+ in get_title$')
+
+    def test_every_endpoint_declares_a_budget(self):
+        def routes(patterns):
+            for pattern in patterns:
+                if hasattr(pattern, 'url_patterns'):
+                    yield from routes(pattern.url_patterns)
+                elif hasattr(pattern.callback, 'cls'):
+                    yield pattern
+
+        for pattern in routes(get_resolver().url_patterns):
+            for method in pattern.callback.actions:
+                match = type('Match', (), {'func': pattern.callback})
+                self.assertIsNotNone(query_budget(match, method), f'{method} {pattern.pattern}')
+
+    @override_settings(QUERY_INSPECTION=True, MIDDLEWARE=['written.middleware.QueryInspectionMiddleware'])
+    def test_inspect_requests(self):
+        Title.objects.create(name='title')
+        with patch.dict(TitleViewSet.QUERY_BUDGETS, {'list': 0}), self.assertLogs('written.db', 'WARNING') as logs:
+            response = self.client.get('/titles/', HTTP_HOST='localhost')
+
+        self.assertEqual(response['X-Query-Count'], '1')
+        self.assertIn('GET /titles/ ran 1 queries, over its budget of 0', logs.output[0])
+
+
+class ExplainTestCase(TestCase):
+    def setUp(self):
+        bench.seed(users=50, titles=20, postings=500, scraps=200, subscriptions=150)
+        self.transport = bench.stub_facebook()
+
+    def tearDown(self):
+        bench.stub_facebook(self.transport)
+
+    def test_endpoint_queries_use_indexes(self):
+        runner = bench.Bench(iterations=2, warmup=0)
+        with QueryRecorder() as recorder:
+            runner.run()
+        queries = [query for query in recorder.queries if not query.origin.startswith('written/bench.py')]
+        results = explain_queries(queries)
+
+        self.assertGreater(len(results), 20)
+        for result in results:
+            self.assertEqual(result['problems'], [], f'{result["origin"]}\n{result["shape"]}\n{result["plan"]}')
+
+    def test_detect_scan_and_sort(self):
+        _, problems = explain('SELECT * FROM posting_posting WHERE content = %s ORDER BY created_at', ['content'])
+
+        self.assertEqual(len(problems), 2)
+        self.assertTrue(problems[0].startswith('full scan of posting_posting'))
+        self.assertTrue(problems[1].startswith('sort for order by'))
+
+
+class AsyncViewTestCase(TransactionTestCase):
+    # async views query on executor threads, which cannot see a TestCase's open transaction
+
+    def setUp(self):
+        bench.seed(users=5, titles=3, postings=30, scraps=10, subscriptions=8)
+        self.transport = bench.stub_facebook()
+        self.user_id, self.key = Token.objects.values_list('user_id', 'key').first()
+        self.application = WrittenASGIHandler()
+
+    def tearDown(self):
+        bench.stub_facebook(self.transport)
+
+    def asgi(self, method, path, body='', key=None, application=None):
+        return asyncio.run(bench.asgi_request(application or self.application, method, path, body, key))
+
+    def test_same_responses_as_sync_views(self):
+        title_id = Title.objects.values_list('id', flat=True).first()
+        posting_id = Posting.objects.filter(is_public=True).values_list('id', flat=True).first()
+        for path in ('/titles/', '/titles/today/', f'/titles/{title_id}/postings/', f'/postings/{posting_id}/',
+                     '/postings/scrapped/', '/postings/subscribed/', f'/users/{self.user_id}/postings/',
+                     '/users/subscribed/', '/users/subscriber/', '/titles/0/postings/'):
+            status_code, body = self.asgi('GET', path, key=self.key)
+            response = self.client.get(path, HTTP_AUTHORIZATION=f'Token {self.key}')
+
+            self.assertEqual(status_code, response.status_code, path)
+            self.assertEqual(json.loads(body), response.json(), path)
+
+    def test_serve_requests_concurrently(self):
+        # both requests wait for each other inside the view, on one sync thread they never meet
+        barrier = threading.Barrier(2, timeout=5)
+        today = TitleViewSet.today
+
+        def waiting_today(viewset, request):
+            barrier.wait()
+            return today(viewset, request)
+
+        async def both(application):
+            return await asyncio.gather(*(bench.asgi_request(application, 'GET', '/titles/today/', '', self.key)
+                                          for _ in range(2)))
+
+        with patch.object(TitleViewSet, 'today', waiting_today):
+            responses = asyncio.run(both(self.application))
+            self.assertEqual([status_code for status_code, _ in responses], [200, 200])
+
+            barrier.reset()
+            responses = asyncio.run(both(ASGIHandler()))
+            self.assertEqual([status_code for status_code, _ in responses], [500, 500])
+
+    def test_login_asks_facebook_on_outbound_threads(self):
+        threads = []
+
+        class Transport(bench.StubGraphTransport):
+            def get(self, url, params=None, timeout=None):
+                threads.append(threading.current_thread().name)
+                return super().get(url, params, timeout)
+
+        bench.stub_facebook(Transport())
+        facebook_id = UserProfile.objects.get(user_id=self.user_id).facebook_id
+        body = json.dumps({'access_token': bench.access_token(facebook_id), 'facebookid': facebook_id})
+        status_code, response = self.asgi('PUT', '/users/login/', body)
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual(json.loads(response)['user']['id'], self.user_id)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('outbound'))
+
+        status_code, response = self.asgi('PUT', '/users/login/', json.dumps({'access_token': 'bench:other',
+                                                                              'facebookid': facebook_id}))
+        self.assertEqual(status_code, 400)
+        self.assertEqual(json.loads(response)['errorcode'], 10001)
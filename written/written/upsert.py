@@ -0,0 +1,42 @@
+from django.db import connections, DEFAULT_DB_ALIAS
+
+
+def insert_select_ignore(table, columns, select, params, using=DEFAULT_DB_ALIAS):
+    # INSERT ... SELECT that the database itself skips when the row would break a
+    # unique constraint (INSERT IGNORE / INSERT OR IGNORE / ON CONFLICT DO NOTHING),
+    # so concurrent duplicates neither race nor raise. Returns the rows inserted,
+    # 0 when `select` matched nothing or the row was already there.
+    connection = connections[using]
+    ops = connection.ops
+    sql = '{insert} {table} ({columns}) {select} {suffix}'.format(
+        insert=ops.insert_statement(ignore_conflicts=True),
+        table=ops.quote_name(table),
+        columns=', '.join(ops.quote_name(column) for column in columns),
+        select=select,
+        suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def insert_select_add(table, key_columns, counter_columns, select, params, using=DEFAULT_DB_ALIAS):
+    # INSERT ... SELECT of (keys..., counters...) rows that adds the counters to a row already
+    # holding the keys instead (ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE), one statement
+    # however many writers hit the same row. `select` needs a WHERE clause (SQLite's parser
+    # wants one before ON CONFLICT).
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in key_columns + counter_columns)
+    if connection.vendor == 'mysql':
+        suffix = 'ON DUPLICATE KEY UPDATE ' + ', '.join(
+            f'{quote(column)} = {quote(column)} + VALUES({quote(column)})' for column in counter_columns)
+    else:
+        suffix = 'ON CONFLICT ({keys}) DO UPDATE SET {counters}'.format(
+            keys=', '.join(quote(column) for column in key_columns),
+            counters=', '.join(f'{quote(column)} = {quote(table)}.{quote(column)} + excluded.{quote(column)}'
+                               for column in counter_columns),
+        )
+    sql = f'INSERT INTO {quote(table)} ({columns}) {select} {suffix}'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)